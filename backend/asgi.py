@@ -0,0 +1,263 @@
+"""Optional ASGI entry point: hot read routes served natively async, the rest by the Flask app.
+
+    uvicorn asgi:app [--loop uvloop] [--http httptools]
+
+GET /validate-token and the collection lists (/tasks, /notes, /goals,
+/habits, with the same ETags and keyset pages as the Flask routes) run
+as async handlers on an SQLAlchemy AsyncEngine over aiosqlite, so a
+request waiting on SQLite holds no thread. Every other route goes to the
+Flask app through a2wsgi, which runs it on a thread pool, and so do the
+cases the async handlers leave to Flask: missing or invalid tokens
+(Flask-JWT-Extended writes those errors), ?stream=1 and /notes?folder=.
+bcrypt already runs in passwords.py's process pool and Turso syncs on the
+sync worker thread, so neither blocks the event loop.
+
+Needs the optional packages aiosqlite, greenlet (for SQLAlchemy's asyncio
+extension) and a2wsgi, plus an ASGI server such as uvicorn. `python
+main.py` keeps serving the threaded Flask app without them.
+"""
+import asyncio
+import os
+from time import perf_counter
+from urllib.parse import parse_qsl
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import event, select
+from sqlalchemy.orm import undefer
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags, quote_etag
+
+try:
+    from a2wsgi import WSGIMiddleware
+    import aiosqlite  # noqa: F401  (driver behind sqlite+aiosqlite)
+    import greenlet  # noqa: F401  (SQLAlchemy's asyncio extension runs on it)
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError as e:
+    raise ImportError(f"ASGI mode needs the optional packages aiosqlite, greenlet and a2wsgi: {e}") from e
+
+import autosave
+import compression
+import main
+import metrics
+import passwords
+import serializers
+import user_cache
+import versions
+from config import (app as flask_app, busy_timeout_ms, cors_origins, db_pool_overflow, db_pool_size,
+                    local_db_path, sqlite_pragmas)
+from migrations import migrate
+from models import Goal, Habit, Note, Task, User, user_goal, user_habit, user_id_queries, user_task
+from pagination import DEFAULT_LIMIT, PaginationError, ordered_page, page_of, wants_page, wants_stream
+
+# Flask routes run on this many threads; each may hold a pooled connection
+asgi_wsgi_workers = int(os.getenv("ASGI_WSGI_WORKERS", str(db_pool_size + db_pool_overflow)))
+
+engine = create_async_engine(
+    f"sqlite+aiosqlite:///{local_db_path}",
+    pool_size=db_pool_size,
+    max_overflow=db_pool_overflow,
+    connect_args={"timeout": busy_timeout_ms / 1000, "factory": metrics.connection_factory},
+)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    for name, value in sqlite_pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+    # Same SQL functions as the Flask engine's connections (aiosqlite's create_function is async)
+    dbapi_conn.run_async(lambda conn: conn.create_function("inflate", 1, compression.inflate, deterministic=True))
+
+
+wsgi = WSGIMiddleware(flask_app, workers=asgi_wsgi_workers)
+
+
+class Request:
+    __slots__ = ("headers", "query_string", "args")
+
+    def __init__(self, scope):
+        self.headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        self.query_string = scope["query_string"]
+        self.args = MultiDict(parse_qsl(self.query_string.decode("latin-1"), keep_blank_values=True))
+
+
+def json_response(body, status=200, etag=None):
+    headers = [(b"content-type", b"application/json")]
+    if etag is not None:
+        headers.append((b"etag", quote_etag(etag).encode("latin-1")))
+    return status, headers, serializers.dumps_bytes(body)
+
+
+def not_modified(etag):
+    return 304, [(b"etag", quote_etag(etag).encode("latin-1"))], b""
+
+
+def token_user_id(request):
+    """User id from a valid access token, or None to let Flask-JWT-Extended answer"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme != "Bearer" or not token:
+        return None
+    with flask_app.app_context():
+        try:
+            claims = decode_token(token)
+        except Exception:
+            return None
+        identity = claims.get(flask_app.config["JWT_IDENTITY_CLAIM"])
+    if claims.get("type") != "access":
+        return None
+    try:
+        return int(identity)
+    except (TypeError, ValueError):
+        return None
+
+
+async def user_exists(session, user_id):
+    """Like user_cache.get_user, sharing its process-wide cache"""
+    if user_cache.user_cache.get(user_id) is not None:
+        return True
+    user = await session.get(User, user_id)
+    if user is None:
+        return False
+    user_cache.user_cache.put(user_id, user_cache.row_values(user))
+    return True
+
+
+async def serialize(session, spec, rows):
+    """spec.many(rows), loading the linked user ids with await"""
+    items = spec.items(rows)
+    if spec.link_column is not None:
+        grouped = {item["id"]: [] for item in items}
+        for statement in user_id_queries(spec.link_column, list(grouped)):
+            for item_id, user_id in await session.execute(statement):
+                grouped[item_id].append(user_id)
+        for item in items:
+            item["users"] = grouped[item["id"]]
+    return items
+
+
+async def validate_token(request):
+    user_id = token_user_id(request)
+    if user_id is None:
+        return None
+    async with Session() as session:
+        if not await user_exists(session, user_id):
+            return json_response({"error": "User not found"}, 404)
+    return json_response({"valid": True, "user_id": str(user_id)})
+
+
+def collection_route(collection, model, spec, sort_keys, owned_by, flask_args=()):
+    """Async twin of a GET list route in main.py; `owned_by(user_id)` is its base select().
+
+    Requests using any of `flask_args` (filters only the Flask route implements) go to Flask.
+    """
+    async def handler(request):
+        user_id = token_user_id(request)
+        if user_id is None or wants_stream(request.args) or any(arg in request.args for arg in flask_args):
+            return None
+        async with Session() as session:
+            if not await user_exists(session, user_id):
+                return json_response({"error": "User not found."}, 404)
+
+            version = await session.scalar(versions.version_query(user_id, collection)) or 0
+            etag = versions.format_etag(collection, user_id, version, request.query_string)
+            if parse_etags(request.headers.get("if-none-match")).contains(etag):
+                return not_modified(etag)
+
+            query = owned_by(user_id)
+            if not wants_page(request.args):
+                rows = (await session.scalars(query.order_by(model.id))).all()
+                return json_response(await serialize(session, spec, rows), 200, etag)
+
+            try:
+                query, sort, order, limit = ordered_page(query, model, sort_keys, args=request.args)
+            except PaginationError as e:
+                return json_response({"error": str(e)}, 400, etag)
+            limit = limit or DEFAULT_LIMIT
+            rows = (await session.scalars(query.limit(limit + 1))).all()
+            rows, next_cursor = page_of(rows, limit, sort, order, sort_keys)
+            body = {"items": await serialize(session, spec, rows), "next_cursor": next_cursor}
+            return json_response(body, 200, etag)
+
+    return handler
+
+
+notes_full = collection_route(
+    versions.NOTES, Note, serializers.NOTE, main.NOTE_SORT_KEYS,
+    lambda user_id: select(Note).options(undefer(Note.content)).where(Note.user_id == user_id),
+    flask_args=("folder",))
+notes_summary = collection_route(
+    versions.NOTES, Note, serializers.NOTE_SUMMARY, main.NOTE_SORT_KEYS,
+    lambda user_id: select(Note).where(Note.user_id == user_id), flask_args=("folder",))
+
+
+async def notes_route(request):
+    return await (notes_summary if main.wants_note_summaries(request.args) else notes_full)(request)
+
+
+ROUTES = {
+    "/validate-token": validate_token,
+    "/tasks": collection_route(
+        versions.TASKS, Task, serializers.TASK, main.TASK_SORT_KEYS,
+        lambda user_id: select(Task).join(user_task, user_task.c.task_id == Task.id)
+        .where(user_task.c.user_id == user_id)),
+    "/notes": notes_route,
+    "/goals": collection_route(
+        versions.GOALS, Goal, serializers.GOAL, main.GOAL_SORT_KEYS,
+        lambda user_id: select(Goal).join(user_goal, user_goal.c.goal_id == Goal.id)
+        .where(user_goal.c.user_id == user_id)),
+    "/habits": collection_route(
+        versions.HABITS, Habit, serializers.HABIT, main.HABIT_SORT_KEYS,
+        lambda user_id: select(Habit).join(user_habit, user_habit.c.habit_id == Habit.id)
+        .where(user_habit.c.user_id == user_id)),
+}
+
+
+async def send_response(send, request, status, headers, body):
+    origin = request.headers.get("origin")
+    if origin in cors_origins:
+        # What flask_cors adds for the same origins
+        headers += [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _startup():
+    with flask_app.app_context():
+        migrate()
+    passwords.hasher.start()
+    autosave.buffer.start()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await asyncio.get_running_loop().run_in_executor(None, _startup)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.get_running_loop().run_in_executor(None, autosave.buffer.stop)
+            await engine.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] == "http" and scope["method"] == "GET":
+        handler = ROUTES.get(scope["path"])
+        if handler is not None:
+            started = perf_counter()
+            request = Request(scope)
+            response = await handler(request)
+            if response is not None:
+                await send_response(send, request, *response)
+                if metrics.metrics_enabled:
+                    metrics.request_duration.observe(perf_counter() - started, "GET", scope["path"])
+                    metrics.requests_total.inc("GET", scope["path"], response[0])
+                return
+    await wsgi(scope, receive, send)
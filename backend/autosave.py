@@ -0,0 +1,295 @@
+"""Write-behind buffer for note autosaves.
+
+An editor autosaving every few seconds sends `PUT /notes/<id>` with
+`X-Autosave: true`. The route validates the change, appends it to a log
+file and answers 202 without touching SQLite; the change waits in a
+per-note buffer that keeps only the latest value of each field. A worker
+thread writes everything buffered in one transaction every
+AUTOSAVE_FLUSH_INTERVAL seconds (sooner past AUTOSAVE_MAX_PENDING notes),
+then rewrites the log down to what is still pending. A PUT without the
+header is an explicit save: it is written at once, merged with anything
+buffered for the note, and the log is rewritten without that note.
+Other writes to notes (batch updates, deletes) go through overwriting(),
+which drops the buffered values they replace so a later flush cannot
+undo them.
+
+GET /notes/<id> overlays a note's pending fields, so a client reads its
+own writes; lists and the change feed see them after the flush.
+
+Acknowledged edits survive a crash: the log is replayed on start. Each
+append is flushed to the OS, which survives the process dying, the same
+guarantee SQLite gives with synchronous=NORMAL; AUTOSAVE_FSYNC=1 also
+fsyncs each append, to survive power loss.
+
+The buffer and its log belong to one process (the threaded server or the
+ASGI app). With several worker processes, set AUTOSAVE_ENABLED=0 or route
+each note's traffic to one process.
+"""
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+
+import serializers
+import versions
+from config import app, db, local_db_path
+from models import Note, note_snippet
+
+autosave_enabled = os.getenv("AUTOSAVE_ENABLED", "1") not in ("0", "false", "no")
+autosave_flush_interval = float(os.getenv("AUTOSAVE_FLUSH_INTERVAL", "2"))  # seconds
+autosave_max_pending = int(os.getenv("AUTOSAVE_MAX_PENDING", "1000"))  # notes
+autosave_log = os.getenv("AUTOSAVE_LOG", f"{local_db_path}.autosave.log")
+autosave_fsync = os.getenv("AUTOSAVE_FSYNC", "0") in ("1", "true", "yes")
+
+# Note attributes an autosave may change, and those holding datetimes (ISO 8601 in the log)
+FIELDS = ("title", "content", "folder_id", "date_created", "date_updated")
+DATE_FIELDS = ("date_created", "date_updated")
+
+
+def _encode(note_id, user_id, fields):
+    return serializers.dumps_bytes({"id": note_id, "user_id": user_id, "fields": fields}) + b"\n"
+
+
+def _decode(line):
+    entry = serializers.loads(line)
+    fields = {key: value for key, value in entry["fields"].items() if key in FIELDS}
+    for key in DATE_FIELDS:
+        if fields.get(key) is not None:
+            fields[key] = datetime.fromisoformat(fields[key])
+    return entry["id"], entry["user_id"], fields
+
+
+class AutosaveBuffer:
+    def __init__(self, log_path=autosave_log, interval=autosave_flush_interval,
+                 max_pending=autosave_max_pending, fsync=autosave_fsync, enabled=autosave_enabled):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.interval = interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self._pending = {}  # note id -> (owner's user id, {attribute: latest value})
+        self._lock = threading.Lock()  # guards _pending and the log file
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._wake = threading.Event()
+        self._log = None
+        self._thread = None
+        self._stopping = False
+        self.accepted = 0
+        self.flushes = 0
+        self.flushed_notes = 0
+
+    def put(self, note_id, user_id, fields):
+        """Buffer a change; it is in the log, and safe to acknowledge, when this returns"""
+        self._ensure_started()
+        with self._lock:
+            self._append(_encode(note_id, user_id, fields))
+            _, pending = self._pending.get(note_id, (user_id, {}))
+            self._pending[note_id] = (user_id, {**pending, **fields})
+            self.accepted += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self, note_id):
+        """The note's buffered fields not yet in SQLite, or None"""
+        with self._lock:
+            entry = self._pending.get(note_id)
+            return dict(entry[1]) if entry is not None else None
+
+    def flush(self, note_ids=None):
+        """Write buffered changes (all, or only `note_ids`) in one transaction; returns how many notes"""
+        with self._flush_lock:
+            with self._lock:
+                if note_ids is None:
+                    batch, self._pending = self._pending, {}
+                else:
+                    batch = {note_id: self._pending.pop(note_id) for note_id in note_ids if note_id in self._pending}
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    # Put the batch back under anything buffered since; the log still has it all
+                    for note_id, (user_id, fields) in batch.items():
+                        _, newer = self._pending.get(note_id, (user_id, {}))
+                        self._pending[note_id] = (user_id, {**fields, **newer})
+                raise
+            with self._lock:
+                self._rewrite_log()
+                self.flushes += 1
+                self.flushed_notes += len(batch)
+            return len(batch)
+
+    def save(self, note_id, user_id, fields):
+        """Write a change now (an explicit save), together with anything buffered for the note"""
+        if not self.enabled:
+            # Nothing is ever buffered: write through; replaying an old log is left to start()
+            if fields:
+                try:
+                    self._write({note_id: (user_id, fields)})
+                except Exception:
+                    db.session.rollback()
+                    raise
+            return
+        self._ensure_started()
+        with self._flush_lock:
+            with self._lock:
+                entry = self._pending.pop(note_id, None)
+                merged = {**entry[1], **fields} if entry is not None else fields
+                if not merged:
+                    return
+                if entry is not None:
+                    # Should the process die before the log is rewritten, replay writes what SQLite has
+                    self._append(_encode(note_id, user_id, merged))
+            try:
+                self._write({note_id: (user_id, merged)})
+            except Exception:
+                db.session.rollback()
+                if entry is not None:
+                    with self._lock:
+                        self._append(_encode(note_id, *entry))
+                        _, newer = self._pending.get(note_id, entry)
+                        self._pending[note_id] = (entry[0], {**entry[1], **newer})
+                raise
+            if entry is not None:
+                with self._lock:
+                    self._rewrite_log()
+
+    @contextmanager
+    def overwriting(self, changes):
+        """Wrap a write to notes made outside the buffer, up to its commit; `changes` maps each
+        note id to the attributes written, or None for a delete. Buffered values for those are
+        dropped, and flushes wait, so a later flush cannot overwrite the write or revive a row"""
+        with self._flush_lock:
+            with self._lock:
+                dropped = {}
+                for note_id, attributes in changes.items():
+                    entry = self._pending.pop(note_id, None)
+                    if entry is None:
+                        continue
+                    dropped[note_id] = entry
+                    user_id, fields = entry
+                    kept = {} if attributes is None else \
+                        {key: value for key, value in fields.items() if key not in attributes}
+                    if kept:
+                        self._pending[note_id] = (user_id, kept)
+            try:
+                yield
+            except BaseException:
+                with self._lock:
+                    for note_id, (user_id, fields) in dropped.items():
+                        _, newer = self._pending.get(note_id, (user_id, {}))
+                        self._pending[note_id] = (user_id, {**fields, **newer})
+                raise
+            if dropped:
+                with self._lock:
+                    self._rewrite_log()
+
+    def status(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "enabled": self.enabled,
+            "pending_notes": pending,
+            "accepted": self.accepted,
+            "flushes": self.flushes,
+            "flushed_notes": self.flushed_notes,
+        }
+
+    def start(self):
+        """Replay edits a previous process acknowledged but never flushed, then start the worker"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="autosave-flush", daemon=True)
+            replayed = self._replay()
+            self._log = open(self.log_path, "ab")
+        if replayed:
+            with app.app_context():
+                print(f"Replaying {replayed} autosaved note(s) from {self.log_path}")
+                self.flush()
+        self._thread.start()
+
+    def stop(self):
+        """Flush what is buffered and stop the worker"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self.start()
+
+    def _write(self, batch):
+        table = Note.__table__
+        by_columns = {}
+        for note_id, (user_id, fields) in batch.items():
+            values = dict(fields)
+            if "content" in values:
+                values["snippet"] = note_snippet(values["content"])
+            row = {f"new_{column}": value for column, value in values.items()}
+            by_columns.setdefault(tuple(sorted(values)), []).append(dict(row, note_id=note_id))
+        # Rows with the same changed columns are one executemany; a note deleted since is skipped
+        for columns, rows in by_columns.items():
+            statement = update(table).where(table.c.id == bindparam("note_id")) \
+                .values({column: bindparam(f"new_{column}") for column in columns})
+            db.session.execute(statement, rows)
+        versions.bump(versions.NOTES, {user_id for user_id, _ in batch.values()})
+        db.session.commit()
+
+    def _append(self, line):
+        self._log.write(line)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+    def _rewrite_log(self):
+        """Replace the log with one line per note still pending"""
+        tmp_path = f"{self.log_path}.tmp"
+        with open(tmp_path, "wb") as tmp:
+            for note_id, (user_id, fields) in self._pending.items():
+                tmp.write(_encode(note_id, user_id, fields))
+            tmp.flush()
+            if self.fsync:
+                os.fsync(tmp.fileno())
+        self._log.close()
+        os.replace(tmp_path, self.log_path)
+        self._log = open(self.log_path, "ab")
+
+    def _replay(self):
+        if not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path, "rb") as log:
+            for line in log:
+                try:
+                    note_id, user_id, fields = _decode(line)
+                except (ValueError, KeyError, TypeError):
+                    continue  # a line torn by the crash was never acknowledged
+                _, pending = self._pending.get(note_id, (user_id, {}))
+                self._pending[note_id] = (user_id, {**pending, **fields})
+        return len(self._pending)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                with app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"Autosave flush failed, retrying in {self.interval:g}s: {e}")
+        try:
+            with app.app_context():
+                self.flush()
+        except Exception as e:
+            print(f"Autosave flush on shutdown failed; {self.log_path} will be replayed on start: {e}")
+
+
+buffer = AutosaveBuffer()
+atexit.register(buffer.stop)
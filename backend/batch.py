@@ -0,0 +1,288 @@
+"""Bulk create/update/delete for tasks, notes, goals and habits.
+
+A batch request body looks like
+
+    {"operations": [
+        {"op": "create", "data": {...}},
+        {"op": "update", "id": 12, "data": {...}},
+        {"op": "delete", "id": 13}
+    ]}
+
+`data` uses the same fields as the single-item routes. Every operation is
+validated first; if any fails, nothing is written and the per-item
+results say why. Otherwise all operations run in one transaction:
+creates as one executemany INSERT plus one association-table insert,
+updates as an executemany UPDATE keyed by id, and deletes as one
+DELETE ... WHERE id IN (...) per table.
+"""
+from dateutil.parser import parse
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.orm import undefer
+
+from config import db
+import folders
+import serializers
+import versions
+from models import Task, TaskStatus, Note, Goal, GoalStatus, GoalPeriod, Habit, HabitStatus, HabitDays, \
+    days_to_mask, note_snippet, user_task, user_goal, user_habit, IN_CHUNK_SIZE
+
+BATCH_LIMIT = 500
+
+
+class BatchSpec:
+    def __init__(self, model, collection, link_column, parse_values, serialize, user_column=None,
+                 check_references=None):
+        self.model = model
+        self.collection = collection  # name used for collection versions
+        self.link_column = link_column  # e.g. user_task.c.task_id; None if owned via a column
+        self.parse_values = parse_values  # (data, creating) -> (values, error)
+        self.serialize = serialize  # rows -> list of dicts, see serializers.py
+        self.user_column = user_column  # e.g. Note.user_id
+        self.check_references = check_references  # (user_id, [(result, values)]) -> marks results it rejects
+
+    def owned_ids(self, user_id, ids):
+        owned = set()
+        ids = list(ids)
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = ids[start:start + IN_CHUNK_SIZE]
+            if self.link_column is not None:
+                link = self.link_column.table
+                query = select(self.link_column).where(link.c.user_id == user_id, self.link_column.in_(chunk))
+            else:
+                query = select(self.model.id).where(self.user_column == user_id, self.model.id.in_(chunk))
+            owned.update(db.session.scalars(query))
+        return owned
+
+
+def _parse_dates(data, values, fields):
+    for key, attr in fields:
+        if key in data:
+            try:
+                values[attr] = parse(data[key]) if data[key] else None
+            except (ValueError, TypeError, OverflowError):
+                return f"Invalid {key} format"
+    return None
+
+
+def task_values(data, creating):
+    values = {}
+    if creating or "title" in data:
+        if not data.get("title"):
+            return None, "Please provide a title for the task."
+        values["title"] = data["title"]
+    if "description" in data:
+        values["description"] = data["description"]
+    error = _parse_dates(data, values, (("dateAssigned", "date_assigned"), ("dateDue", "date_due")))
+    if error:
+        return None, error
+    if creating or "status" in data:
+        status = data.get("status", TaskStatus.PENDING.value)
+        if status not in [s.value for s in TaskStatus]:
+            return None, f"Invalid status. Valid statuses are: {[s.value for s in TaskStatus]}"
+        values["status"] = status
+    if "category" in data:
+        values["category"] = data["category"]
+    return values, None
+
+
+def note_values(data, creating):
+    values = {}
+    if creating or "title" in data:
+        if not data.get("title"):
+            return None, "Please provide a title for the note."
+        values["title"] = data["title"]
+    if "content" in data:
+        values["content"] = data["content"]
+        values["snippet"] = note_snippet(data["content"])
+    if "folderId" in data:
+        # Ownership is checked for the whole batch in note_folders_owned
+        folder_id = data["folderId"]
+        try:
+            values["folder_id"] = None if folder_id is None or folder_id == "" else int(folder_id)
+        except (TypeError, ValueError):
+            return None, "Invalid folder ID. Folder ID must be a number."
+    error = _parse_dates(data, values, (("dateCreated", "date_created"), ("dateUpdated", "date_updated")))
+    if error:
+        return None, error
+    return values, None
+
+
+def note_folders_owned(user_id, items):
+    """404 for notes filed into a folder the user does not own, as the single-note routes answer"""
+    owned = folders.owned_ids(user_id, {values["folder_id"] for _, values in items
+                                        if values.get("folder_id") is not None})
+    for result, values in items:
+        if values.get("folder_id") is not None and values["folder_id"] not in owned:
+            result.update(status=404, error="Folder not found.")
+
+
+def goal_values(data, creating):
+    values = {}
+    if creating or "title" in data:
+        if not data.get("title"):
+            return None, "Please provide a title for the goal."
+        values["title"] = data["title"]
+    if "description" in data:
+        values["description"] = data["description"]
+    for key, attr, enum, default in (("status", "status", GoalStatus, GoalStatus.PLANNED),
+                                     ("period", "period", GoalPeriod, GoalPeriod.WEEKLY)):
+        if key in data:
+            try:
+                values[attr] = enum(data[key])
+            except ValueError:
+                return None, f"Invalid {key}. Valid {key}s are: {[e.value for e in enum]}"
+        elif creating:
+            values[attr] = default
+    return values, None
+
+
+def habit_values(data, creating):
+    values = {}
+    if creating or "title" in data:
+        if not data.get("title"):
+            return None, "Please provide a title for the habit."
+        values["title"] = data["title"]
+    if creating or "color" in data:
+        if not data.get("color"):
+            return None, "Please provide a color for the habit."
+        values["color"] = data["color"]
+    if creating or "status" in data:
+        status = str(data.get("status", HabitStatus.IN_PROGRESS.value)).title()
+        if status not in [s.value for s in HabitStatus]:
+            return None, f"Invalid status. Must be one of: {', '.join(s.value for s in HabitStatus)}"
+        values["status"] = status
+    if creating or "habitDays" in data:
+        habit_days = data.get("habitDays")
+        valid_days = [d.value for d in HabitDays]
+        if not isinstance(habit_days, list) or not all(day in valid_days for day in habit_days):
+            return None, f"Invalid habitDays. Must be a list of valid days: {', '.join(valid_days)}"
+        values["habit_days"] = ",".join(habit_days)
+        values["days_mask"] = days_to_mask(habit_days)
+    return values, None
+
+
+TASKS = BatchSpec(Task, versions.TASKS, user_task.c.task_id, task_values, serializers.tasks)
+NOTES = BatchSpec(Note, versions.NOTES, None, note_values, serializers.notes, user_column=Note.user_id,
+                  check_references=note_folders_owned)
+GOALS = BatchSpec(Goal, versions.GOALS, user_goal.c.goal_id, goal_values, serializers.goals)
+HABITS = BatchSpec(Habit, versions.HABITS, user_habit.c.habit_id, habit_values, serializers.habits)
+
+
+def validate(spec, user_id, operations):
+    """Returns (results, plan); plan is None if any operation is invalid"""
+    results = [{"index": i, "op": op.get("op") if isinstance(op, dict) else None}
+               for i, op in enumerate(operations)]
+    creates, updates, deletes = [], [], []
+    referenced = {}
+
+    for result, op in zip(results, operations):
+        if not isinstance(op, dict) or op.get("op") not in ("create", "update", "delete"):
+            result.update(status=400, error="Each operation needs op: create, update or delete.")
+            continue
+        if op["op"] != "create":
+            try:
+                item_id = int(op.get("id"))
+            except (TypeError, ValueError):
+                result.update(status=400, error="A numeric id is required.")
+                continue
+            if item_id in referenced:
+                result.update(status=400, error=f"Duplicate id in batch (operation {referenced[item_id]}).")
+                continue
+            referenced[item_id] = result["index"]
+            result["id"] = item_id
+        if op["op"] == "delete":
+            deletes.append(result)
+            continue
+        data = op.get("data")
+        if not isinstance(data, dict):
+            result.update(status=400, error="data must be an object.")
+            continue
+        values, error = spec.parse_values(data, op["op"] == "create")
+        if error:
+            result.update(status=400, error=error)
+            continue
+        (creates if op["op"] == "create" else updates).append((result, values))
+
+    owned = spec.owned_ids(user_id, referenced)
+    for result in deletes + [r for r, _ in updates]:
+        if result["id"] not in owned:
+            result.update(status=404, error=f"{spec.model.__name__} not found.")
+    if spec.check_references is not None:
+        spec.check_references(user_id, [(r, values) for r, values in creates + updates if "error" not in r])
+
+    if any("error" in r for r in results):
+        return results, None
+    return results, (creates, updates, deletes)
+
+
+def apply(spec, user_id, plan):
+    """Write a validated plan in the current transaction; returns the ids touched"""
+    creates, updates, deletes = plan
+    model = spec.model
+
+    # Shared rows change other users' collections too; read links before deletes drop them
+    versions.bump(spec.collection, [user_id])
+    if spec.link_column is not None:
+        touched = [result["id"] for result, _ in updates] + [result["id"] for result in deletes]
+        versions.bump_linked(spec.collection, spec.link_column, touched)
+
+    if creates:
+        rows = [values for _, values in creates]
+        if spec.user_column is not None:
+            rows = [dict(values, **{spec.user_column.key: user_id}) for values in rows]
+        db.session.execute(insert(model), rows)
+        # One executemany under SQLite's write lock assigns consecutive rowids
+        # (INTEGER PRIMARY KEY without AUTOINCREMENT is max(rowid) + 1), so the
+        # new ids can be derived instead of inserting row by row with RETURNING
+        last_id = db.session.scalar(text("SELECT last_insert_rowid()"))
+        new_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        for (result, _), new_id in zip(creates, new_ids):
+            result.update(status=201, id=new_id)
+        if spec.link_column is not None:
+            db.session.execute(
+                insert(spec.link_column.table),
+                [{"user_id": user_id, spec.link_column.key: new_id} for new_id in new_ids]
+            )
+
+    # Rows with the same set of columns are sent as one executemany
+    by_columns = {}
+    for result, values in updates:
+        if values:
+            by_columns.setdefault(tuple(sorted(values)), []).append(dict(values, id=result["id"]))
+        result["status"] = 200
+    for rows in by_columns.values():
+        db.session.execute(update(model), rows)
+
+    delete_ids = [result["id"] for result in deletes]
+    for start in range(0, len(delete_ids), IN_CHUNK_SIZE):
+        chunk = delete_ids[start:start + IN_CHUNK_SIZE]
+        if spec.link_column is not None:
+            db.session.execute(delete(spec.link_column.table).where(spec.link_column.in_(chunk)))
+        db.session.execute(delete(model).where(model.id.in_(chunk)),
+                           execution_options={"synchronize_session": False})
+    for result in deletes:
+        result["status"] = 200
+
+    return [r["id"] for r, _ in creates + updates]
+
+
+def overwritten(plan):
+    """Note id -> attributes a validated plan writes, None for deletes; see autosave.overwriting"""
+    _, updates, deletes = plan
+    changes = {result["id"]: set(values) for result, values in updates}
+    changes.update((result["id"], None) for result in deletes)
+    return changes
+
+
+def serialize_results(spec, results, ids):
+    items = {}
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        # Results carry full rows, deferred columns (note content) included
+        rows = spec.model.query.options(undefer("*")) \
+            .filter(spec.model.id.in_(ids[start:start + IN_CHUNK_SIZE])).all()
+        for row, data in zip(rows, spec.serialize(rows)):
+            items[row.id] = data
+    for result in results:
+        if result["op"] in ("create", "update"):
+            result["item"] = items.get(result["id"])
+    return results
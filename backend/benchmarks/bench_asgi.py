@@ -0,0 +1,167 @@
+"""Threaded Flask vs the ASGI mode in asgi.py under many concurrent clients.
+
+    python benchmarks/bench_asgi.py [--clients 1000] [--duration 10] [--path "/tasks?limit=20"]
+
+Seeds a throwaway database, then serves it twice, each time from a fresh
+process: once from the threaded Werkzeug server that `python main.py`
+uses, once from uvicorn running asgi:app. An asyncio client in this
+process keeps --clients requests in flight for --duration seconds. Each
+request opens its own connection (Connection: close), so completed
+requests per second is also connections per second. The report gives
+that rate, errors, and p50/p95/p99/max latency.
+
+Client and server share the machine, so compare the two modes on the
+same box rather than reading the absolute numbers.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def seed(tasks):
+    """Create one user with `tasks` tasks; returns an access token"""
+    import main  # noqa: F401
+    import passwords
+    from config import app
+    from migrations import migrate
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    token = client.post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(tasks):
+        client.post("/tasks", headers=headers, json={"title": f"Task {i}", "category": "Work"})
+    return token
+
+
+def serve(mode, port):
+    """Run inside a child process until killed"""
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    if mode == "threaded":
+        from werkzeug.serving import make_server
+        import main  # noqa: F401
+        from config import app
+        make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+        uvicorn.run("asgi:app", host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+async def one_request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    status = int(response.split(b" ", 2)[1]) if response.startswith(b"HTTP/") else 0
+    return status
+
+
+async def load(port, path, token, clients, duration, timeout):
+    raw = (f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nAuthorization: Bearer {token}\r\n"
+           f"Connection: close\r\n\r\n").encode("latin-1")
+    latencies = []
+    errors = {}
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(one_request(port, raw), timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_mode(mode, args, token):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, "--serve", mode, "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_listening(port)
+        asyncio.run(load(port, args.path, token, 10, 1, args.timeout))  # warm up
+        latencies, errors, elapsed = asyncio.run(
+            load(port, args.path, token, args.clients, args.duration, args.timeout))
+    finally:
+        server.kill()
+        server.wait()
+    latencies.sort()
+    ms = [value * 1000 for value in latencies] or [float("nan")]
+    print(f"{mode:>9} {len(latencies) / elapsed:>9.0f} {sum(errors.values()):>7} "
+          f"{statistics.median(ms):>8.1f} {percentile(ms, 0.95):>8.1f} {percentile(ms, 0.99):>8.1f} "
+          f"{ms[-1]:>8.1f}  {errors or ''}")
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", default="/tasks?limit=20")
+    parser.add_argument("--tasks", type=int, default=50, help="tasks owned by the benchmark user")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request client timeout in seconds")
+    parser.add_argument("--modes", default="threaded,asgi")
+    parser.add_argument("--serve", choices=["threaded", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_asgi.db"))
+    os.environ.setdefault("SLOW_QUERY_MS", "-1")
+    token = seed(args.tasks)
+
+    print(f"GET {args.path}, {args.clients} concurrent clients, {args.duration:g}s per mode")
+    print(f"{'mode':>9} {'req/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in args.modes.split(","):
+        run_mode(mode, args, token)
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,97 @@
+"""Note autosaves: buffered (X-Autosave: true, 202) vs a commit per save (200).
+
+    python benchmarks/bench_autosave.py [--notes 50] [--saves 20] [--threads 8]
+
+Seeds one user with --notes notes, then has --threads editors each send
+--saves saves to every note, through PUT /notes/<id>, once as explicit
+saves and once as autosaves. Reports saves per second, the median and
+p99 latency of a save, and how many write transactions each mode needed.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_autosave.db"))
+os.environ.setdefault("SLOW_QUERY_MS", "-1")
+
+import autosave  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def seed(client, count):
+    token = client.post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [client.post("/notes", headers=headers, json={"title": f"Note {i}", "content": "Draft"}).json["id"]
+           for i in range(count)]
+    return headers, ids
+
+
+def run(headers, note_ids, saves, threads, expected_status):
+    latencies = []
+    lock = threading.Lock()
+
+    def editor(offset):
+        client = app.test_client()
+        mine = []
+        for n in range(saves):
+            for note_id in note_ids[offset::threads]:
+                content = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20) + str(n)
+                started = time.perf_counter()
+                response = client.put(f"/notes/{note_id}", headers=headers, json={"content": content})
+                mine.append(time.perf_counter() - started)
+                assert response.status_code == expected_status, response.data
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=editor, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000, \
+        latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--saves", type=int, default=20, help="saves per note")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    headers, note_ids = seed(app.test_client(), args.notes)
+    total = args.notes * args.saves
+
+    print(f"{total} saves to {args.notes} notes from {args.threads} threads")
+    print(f"{'mode':>10} {'saves/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'commits':>8}")
+    rate, p50, p99 = run(headers, note_ids, args.saves, args.threads, 200)
+    print(f"{'explicit':>10} {rate:>9.0f} {p50:>8.2f} {p99:>8.2f} {total:>8}")
+
+    before = autosave.buffer.flushes
+    rate, p50, p99 = run({**headers, "X-Autosave": "true"}, note_ids, args.saves, args.threads, 202)
+    with app.app_context():
+        autosave.buffer.flush()
+    print(f"{'autosave':>10} {rate:>9.0f} {p50:>8.2f} {p99:>8.2f} {autosave.buffer.flushes - before:>8}")
+    autosave.buffer.stop()
+
+
+if __name__ == "__main__":
+    main_()
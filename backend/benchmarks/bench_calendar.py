@@ -0,0 +1,104 @@
+"""Calendar range queries vs downloading every task, for a user with many tasks.
+
+    python benchmarks/bench_calendar.py [--tasks 50000] [--other-tasks 50000] [--repeat 20]
+
+Compares a month of per-day counts and a week of full tasks from
+/tasks/calendar against fetching GET /tasks and bucketing client-side.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_calendar.db"))
+
+from sqlalchemy import text  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+YEAR_START = datetime(2025, 1, 1)
+
+
+def seed(user_id, tasks, other_user_id, other_tasks):
+    rng = random.Random(42)
+    rows, links = [], []
+    for i in range(tasks + other_tasks):
+        due = YEAR_START + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        rows.append({"id": i + 1, "title": f"Task {i}", "status": "Pending",
+                     "date_assigned": due - timedelta(days=3), "date_due": due})
+        links.append({"user_id": user_id if i < tasks else other_user_id, "task_id": i + 1})
+    with app.app_context():
+        db.session.execute(text(
+            "INSERT INTO tasks (id, title, status, date_assigned, date_due) "
+            "VALUES (:id, :title, :status, :date_assigned, :date_due)"), rows)
+        db.session.execute(text("INSERT INTO user_task (user_id, task_id) VALUES (:user_id, :task_id)"), links)
+        db.session.commit()
+        # A long-lived replica has planner stats from the migration step; bulk-seeded data does not
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+
+
+def timed(client, url, headers, repeat):
+    samples = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        if url == "/tasks":
+            # What the frontend does today: bucket the full list by day
+            days = {}
+            for task in response.json:
+                days.setdefault((task["dateDue"] or "")[:10], []).append(task)
+        samples.append(time.perf_counter() - started)
+        size = len(response.data)
+    return statistics.median(samples) * 1000, size
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--other-tasks", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    tokens = [client.post("/signup", json={"name": "Bench", "email": f"bench{n}@example.com", "password": "pw"})
+              .json["access_token"] for n in range(2)]
+    seed(1, args.tasks, 2, args.other_tasks)
+    headers = {"Authorization": f"Bearer {tokens[0]}"}
+
+    cases = [
+        ("month counts", "/tasks/calendar?from=2025-03-01&to=2025-03-31&tz=Europe/Kyiv&counts=1"),
+        ("week of tasks", "/tasks/calendar?from=2025-03-03&to=2025-03-09&tz=Europe/Kyiv"),
+        ("year counts", "/tasks/calendar?from=2025-01-01&to=2025-12-31&counts=1"),
+        ("full /tasks download", "/tasks"),
+    ]
+    print(f"{args.tasks} tasks for the user, {args.other_tasks} for someone else")
+    print(f"{'case':<22} {'median ms':>10} {'bytes':>12}")
+    for name, url in cases:
+        repeat = max(1, args.repeat // 10) if url == "/tasks" else args.repeat
+        ms, size = timed(client, url, headers, repeat)
+        print(f"{name:<22} {ms:>10.1f} {size:>12}")
+
+    with app.app_context():
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT tasks.date_due FROM tasks JOIN user_task ON user_task.task_id = tasks.id "
+            "WHERE user_task.user_id = 1 AND tasks.date_due >= '2025-03-01' AND tasks.date_due < '2025-04-01'"
+        )).fetchall()
+    print("\nplan:", "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,100 @@
+"""Refreshing a task list: full GET /tasks vs GET /changes?since=, and the triggers' write cost.
+
+    python benchmarks/bench_changes.py [--tasks 10000] [--changed 10] [--repeat 20]
+
+Seeds one user with --tasks tasks, takes the feed position, changes
+--changed of them through PUT /tasks/<id>, then times both ways of
+catching up and compares the response sizes. Last, it times single-row
+task UPDATEs with and without the change-log triggers.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_changes.db"))
+os.environ.setdefault("SLOW_QUERY_MS", "-1")
+
+from sqlalchemy import text  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def seed(client, count):
+    token = client.post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+    rows = [{"id": i, "title": f"Task {i}", "description": "Lorem ipsum dolor sit amet " * 4}
+            for i in range(1, count + 1)]
+    with app.app_context():
+        db.session.execute(text("INSERT INTO tasks (id, title, description, status) "
+                                "VALUES (:id, :title, :description, 'Pending')"), rows)
+        db.session.execute(text("INSERT INTO user_task (user_id, task_id) VALUES (1, :id)"), rows)
+        db.session.commit()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, len(response.data)
+
+
+def update_cost(count):
+    """µs per single-row task UPDATE, in one transaction"""
+    with db.engine.begin() as conn:
+        started = time.perf_counter()
+        for i in range(1, count + 1):
+            conn.execute(text("UPDATE tasks SET status = 'Completed' WHERE id = :id"), {"id": i})
+        elapsed = time.perf_counter() - started
+    return elapsed / count * 1e6
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    headers = seed(client, args.tasks)
+
+    since = client.get("/changes", headers=headers).json["next_since"]
+    for i in range(1, args.changed + 1):
+        client.put(f"/tasks/{i * (args.tasks // args.changed)}", headers=headers, json={"title": f"Changed {i}"})
+
+    full_ms, full_bytes = timed(lambda: client.get("/tasks", headers=headers), args.repeat)
+    feed = client.get(f"/changes?since={since}", headers=headers).json
+    assert len(feed["changes"]) == args.changed, feed
+    feed_ms, feed_bytes = timed(lambda: client.get(f"/changes?since={since}", headers=headers), args.repeat)
+
+    print(f"{args.tasks} tasks, {args.changed} changed since the last refresh")
+    print(f"GET /tasks           {full_ms:9.1f} ms {full_bytes:>10} bytes")
+    print(f"GET /changes?since=  {feed_ms:9.1f} ms {feed_bytes:>10} bytes")
+
+    count = min(args.tasks, 5000)
+    with app.app_context():
+        with_triggers = update_cost(count)
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TRIGGER tasks_changes_update")
+        without_triggers = update_cost(count)
+    print(f"task UPDATE          {with_triggers:.1f} µs with the change-log trigger, "
+          f"{without_triggers:.1f} µs without")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,129 @@
+"""Dashboard counts: GET /dashboard/summary vs aggregating on every request, and the triggers' write cost.
+
+    python benchmarks/bench_dashboard.py [--tasks 10000] [--repeat 20]
+
+Seeds one user with --tasks tasks (and a tenth as many goals and habits),
+then times the summary route against the two ways a client or server
+could get the same counts without counters: fetching /tasks, /goals and
+/habits and counting client-side, or GROUP BY queries over the user's
+rows. Last, it times single-row task status UPDATEs with and without the
+counter triggers.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_dashboard.db"))
+os.environ.setdefault("SLOW_QUERY_MS", "-1")
+
+from sqlalchemy import text  # noqa: E402
+import dashboard  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+STATUSES = ["Pending", "In Progress", "Completed", "Canceled"]
+CATEGORIES = ["Work", "Personal", "Home", "Study", None]
+
+GROUP_BY = " UNION ALL ".join(
+    f"SELECT '{metric}', {table}.{column}, count(*) FROM {link} JOIN {table} ON {table}.id = {link}.{link_column} "
+    f"WHERE {link}.user_id = 1 GROUP BY 2"
+    for metric, (table, link, link_column, column) in dashboard.METRICS.items()
+)
+
+
+def seed(client, count):
+    token = client.post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+    tasks = [{"id": i, "title": f"Task {i}", "status": STATUSES[i % 4], "category": CATEGORIES[i % 5],
+              "date_due": f"20{20 + i % 10}-01-01 00:00:00.000000"} for i in range(1, count + 1)]
+    others = [{"id": i, "title": f"Item {i}"} for i in range(1, count // 10 + 1)]
+    with app.app_context():
+        db.session.execute(text("INSERT INTO tasks (id, title, status, category, date_due) "
+                                "VALUES (:id, :title, :status, :category, :date_due)"), tasks)
+        db.session.execute(text("INSERT INTO user_task (user_id, task_id) VALUES (1, :id)"), tasks)
+        db.session.execute(text("INSERT INTO goals (id, title, status, period) "
+                                "VALUES (:id, :title, 'PLANNED', 'WEEKLY')"), others)
+        db.session.execute(text("INSERT INTO user_goal (user_id, goal_id) VALUES (1, :id)"), others)
+        db.session.execute(text("INSERT INTO habits (id, title, color, status, habit_days) "
+                                "VALUES (:id, :title, 'red', 'Planned', 'Monday')"), others)
+        db.session.execute(text("INSERT INTO user_habit (user_id, habit_id) VALUES (1, :id)"), others)
+        db.session.commit()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def update_cost(count):
+    """µs per single-row task status UPDATE, in one transaction"""
+    with db.engine.begin() as conn:
+        started = time.perf_counter()
+        for i in range(1, count + 1):
+            conn.execute(text("UPDATE tasks SET status = :status WHERE id = :id"),
+                         {"id": i, "status": STATUSES[(i + 1) % 4]})
+        elapsed = time.perf_counter() - started
+    return elapsed / count * 1e6
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    headers = seed(client, args.tasks)
+    with app.app_context():
+        # Rows inserted above went through the triggers too; repair must agree with them
+        before = db.session.execute(text("SELECT * FROM dashboard_counters ORDER BY 1, 2, 3")).all()
+        dashboard.repair(db.session.connection())
+        assert before == db.session.execute(text("SELECT * FROM dashboard_counters ORDER BY 1, 2, 3")).all()
+        db.session.commit()
+
+    def lists():
+        for path in ("/tasks", "/goals", "/habits"):
+            client.get(path, headers=headers).get_json()
+
+    def group_by():
+        with app.app_context():
+            db.session.execute(text(GROUP_BY)).all()
+
+    summary_ms = timed(lambda: client.get("/dashboard/summary", headers=headers), args.repeat)
+    lists_ms = timed(lists, args.repeat)
+    group_by_ms = timed(group_by, args.repeat)
+
+    print(f"{args.tasks} tasks, {args.tasks // 10} goals, {args.tasks // 10} habits")
+    print(f"GET /dashboard/summary        {summary_ms:9.2f} ms")
+    print(f"GET /tasks, /goals, /habits   {lists_ms:9.2f} ms")
+    print(f"GROUP BY over the user's rows {group_by_ms:9.2f} ms")
+
+    count = min(args.tasks, 5000)
+    with app.app_context():
+        with_triggers = update_cost(count)
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TRIGGER tasks_counters_update")
+        without_triggers = update_cost(count)
+    print(f"task status UPDATE            {with_triggers:.1f} µs with the counter trigger, "
+          f"{without_triggers:.1f} µs without")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,127 @@
+"""Folder subtrees: the folder_paths closure table vs a recursive CTE over parent_id.
+
+    python benchmarks/bench_folders.py [--depth 8] [--fanout 3] [--notes-per-folder 5] [--repeat 50]
+
+Seeds one user with a complete folder tree (--fanout children per folder,
+--depth levels) holding --notes-per-folder notes each, then times, for
+the top folder and one halfway down: the ids of notes in the subtree by
+closure table and by WITH RECURSIVE, GET /notes?folder=&recursive=1,
+GET /folders (every folder's direct and recursive note count), and moving
+a subtree under another branch and back.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_folders.db"))
+os.environ.setdefault("SLOW_QUERY_MS", "-1")
+
+from sqlalchemy import text  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+CLOSURE = text(
+    "SELECT notes.id FROM notes WHERE notes.user_id = 1 AND notes.folder_id IN "
+    "(SELECT descendant_id FROM folder_paths WHERE ancestor_id = :folder_id)"
+)
+RECURSIVE = text(
+    "WITH RECURSIVE subtree(id) AS (SELECT :folder_id UNION ALL "
+    "SELECT folders.id FROM folders JOIN subtree ON folders.parent_id = subtree.id) "
+    "SELECT notes.id FROM notes WHERE notes.user_id = 1 AND notes.folder_id IN (SELECT id FROM subtree)"
+)
+
+
+def seed(client, depth, fanout, notes_per_folder):
+    """Returns the auth headers and the folder ids by level, top first"""
+    token = client.post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+    levels = []
+    with app.app_context():
+        next_id = 1
+        parents = [None]
+        for _ in range(depth):
+            level = []
+            for parent_id in parents:
+                for _ in range(fanout if parent_id is not None else 1):
+                    level.append((next_id, parent_id))
+                    next_id += 1
+            # Rows go in level by level so each parent's paths exist before its children's
+            db.session.execute(text("INSERT INTO folders (id, name, parent_id, user_id) "
+                                    "VALUES (:id, :name, :parent_id, 1)"),
+                               [{"id": i, "name": f"Folder {i}", "parent_id": p} for i, p in level])
+            levels.append([i for i, _ in level])
+            parents = levels[-1]
+        folder_ids = [i for level in levels for i in level]
+        db.session.execute(text("INSERT INTO notes (title, content, folder_id, user_id) "
+                                "VALUES (:title, 'text', :folder_id, 1)"),
+                           [{"title": f"Note {n}", "folder_id": i} for i in folder_ids for n in range(notes_per_folder)])
+        db.session.commit()
+    return {"Authorization": f"Bearer {token}"}, levels
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--notes-per-folder", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    headers, levels = seed(client, args.depth, args.fanout, args.notes_per_folder)
+    folders = sum(len(level) for level in levels)
+    print(f"{folders} folders, {args.depth} levels, {folders * args.notes_per_folder} notes")
+
+    with app.app_context():
+        for label, folder_id in (("top folder", levels[0][0]), ("mid-level", levels[args.depth // 2][0])):
+            closure_ms, closure_ids = timed(
+                lambda: sorted(db.session.scalars(CLOSURE, {"folder_id": folder_id})), args.repeat)
+            recursive_ms, recursive_ids = timed(
+                lambda: sorted(db.session.scalars(RECURSIVE, {"folder_id": folder_id})), args.repeat)
+            assert closure_ids == recursive_ids
+            route_ms, response = timed(
+                lambda: client.get(f"/notes?folder={folder_id}&recursive=1", headers=headers), args.repeat)
+            assert len(response.json) == len(closure_ids)
+            print(f"{label:>10}, {len(closure_ids):>6} notes: closure {closure_ms:7.2f} ms, "
+                  f"WITH RECURSIVE {recursive_ms:7.2f} ms, GET /notes?folder=&recursive=1 {route_ms:7.2f} ms")
+
+    counts_ms, _ = timed(lambda: client.get("/folders", headers=headers), args.repeat)
+    print(f"GET /folders with counts: {counts_ms:.2f} ms")
+
+    # A subtree from the second level moved under the last leaf of another branch and back
+    subtree, original_parent = levels[1][0], levels[0][0]
+    target = levels[-1][-1]
+
+    def move_and_back():
+        client.put(f"/folders/{subtree}", headers=headers, json={"parentId": target})
+        return client.put(f"/folders/{subtree}", headers=headers, json={"parentId": original_parent})
+
+    move_ms, response = timed(move_and_back, max(1, args.repeat // 5))
+    assert response.status_code == 200, response.json
+    subtree_size = sum(1 for level in levels[1:] for _ in level) // args.fanout
+    print(f"move a {subtree_size}-folder subtree and back: {move_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main_()
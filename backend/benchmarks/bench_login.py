@@ -0,0 +1,95 @@
+"""Login throughput and latency as the bcrypt pool grows.
+
+    python benchmarks/bench_login.py [--pool-sizes 0,1,2,4] [--clients 16] [--seconds 5] [--rounds 10]
+
+Pool size 0 hashes inline on the request thread (the old behaviour).
+While logins run, a second set of threads polls /validate-token to show
+how much the hashing load slows down unrelated routes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_login.db"))
+
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(clients, seconds, token):
+    stop = threading.Event()
+    logins, busy, probes = [], [0], []
+
+    def login_loop():
+        client = app.test_client()
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post("/login", json={"email": "bench@example.com", "password": "password"})
+            if response.status_code == 503:
+                busy[0] += 1
+            else:
+                logins.append(time.perf_counter() - started)
+
+    def probe_loop():
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get("/validate-token", headers=headers)
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(clients)]
+    threads += [threading.Thread(target=probe_loop) for _ in range(2)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return logins, busy[0], probes
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", default="0,1,2,4")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=args.rounds)
+    token = app.test_client().post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+
+    print(f"{'pool':>5} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'503s':>6} {'probe p99 ms':>13}")
+    for size in [int(n) for n in args.pool_sizes.split(",")]:
+        passwords.configure(pool_size=size, rounds=args.rounds, queue_limit=max(1, size) * 4).start()
+        logins, busy, probes = run(args.clients, args.seconds, token)
+        print(f"{size:>5} {len(logins) / args.seconds:>9.1f} "
+              f"{statistics.median(logins) * 1000 if logins else float('nan'):>8.1f} "
+              f"{percentile(logins, 99) * 1000:>8.1f} {busy:>6} {percentile(probes, 99) * 1000:>13.1f}")
+    passwords.hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main_()
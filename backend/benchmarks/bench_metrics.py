@@ -0,0 +1,118 @@
+"""Cost of the /metrics instrumentation per request and per SQL statement.
+
+    python benchmarks/bench_metrics.py [--iterations 200000] [--requests 5000]
+
+Times the request hooks (before_request, after_request and teardown) on
+their own, the timed sqlite3 cursor on a SELECT 1 loop, and then
+end-to-end GET /validate-token with METRICS_ENABLED=1 vs 0, each in a
+fresh process.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def end_to_end(requests):
+    """Run inside a child process; prints µs per request as JSON"""
+    os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_metrics.db"))
+    import main  # noqa: F401
+    import passwords
+    from config import app
+    from migrations import migrate
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    token = client.post("/signup", json={"name": "B", "email": "b@x.com", "password": "pw"}).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(200):
+        client.get("/validate-token", headers=headers)
+    rounds = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(requests // 5):
+            client.get("/validate-token", headers=headers)
+        rounds.append((time.perf_counter() - started) / (requests // 5) * 1e6)
+    print("RESULT", json.dumps(statistics.median(rounds)), flush=True)
+
+
+def hooks(iterations):
+    from flask import Flask
+    import metrics
+
+    app = Flask(__name__)
+    app.add_url_rule("/tasks/<int:task_id>", "task", lambda task_id: "")
+    metrics.install(app)
+    start = app.before_request_funcs[None][0]
+    after = app.after_request_funcs[None][0]
+    finish = app.teardown_request_funcs[None][0]
+    response = app.response_class("")
+
+    with app.test_request_context("/tasks/1"):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            start()
+            after(response)
+            finish(None)
+        return (time.perf_counter() - started) / iterations * 1e6
+
+
+def statements(iterations, rounds=7):
+    """Best-of-rounds difference, since a SELECT 1 round trip varies by more than the timing costs"""
+    import sqlite3
+    from sqlalchemy import create_engine, text
+    import metrics
+
+    def engine(factory):
+        return create_engine("sqlite://", creator=lambda: sqlite3.connect(":memory:", factory=factory))
+
+    plain, timed = engine(sqlite3.Connection), engine(metrics.TimedConnection)
+    best = {plain: float("inf"), timed: float("inf")}
+    statement = text("SELECT 1")
+    for _ in range(rounds):
+        for each in best:
+            with each.connect() as conn:
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    conn.execute(statement)
+                best[each] = min(best[each], (time.perf_counter() - started) / iterations * 1e6)
+    return best[timed] - best[plain]
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        end_to_end(args.requests)
+        return
+
+    print(f"request hooks:        {hooks(args.iterations):.2f} µs per request")
+    print(f"timed cursor:         {statements(args.iterations // 20):.2f} µs per SQL statement")
+
+    per_request = {}
+    for enabled in ("0", "1"):
+        child = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests)],
+            env=dict(os.environ, METRICS_ENABLED=enabled), capture_output=True, text=True, check=True
+        )
+        result = next(line for line in child.stdout.splitlines() if line.startswith("RESULT "))
+        per_request[enabled] = json.loads(result.split(" ", 1)[1])
+    print(f"GET /validate-token:  {per_request['0']:.1f} µs without metrics, {per_request['1']:.1f} µs with "
+          f"({per_request['1'] - per_request['0']:+.1f} µs, includes the route's SQL statements)")
+
+
+if __name__ == "__main__":
+    main_()
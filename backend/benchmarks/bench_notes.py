@@ -0,0 +1,127 @@
+"""Note storage and lists: full content, uncompressed (before) vs summaries over compressed content (after).
+
+    python benchmarks/bench_notes.py [--notes 2000] [--words 1500] [--repeat 10]
+
+Seeds one user with --notes notes of about --words words each, stored as
+plain TEXT the way they were before compression, and measures the
+vacuumed database file, a GET /notes list that carries every note's full
+content (the old response), and GET /notes/<id>. It then compresses the
+content in place as migration 10 does, vacuums again, and measures the
+file, the summary list GET /notes?view=summary returns, and
+GET /notes/<id>, which now inflates the content.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_notes.db"))
+os.environ.setdefault("SLOW_QUERY_MS", "-1")
+
+from flask import jsonify  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.orm import undefer  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+import serializers  # noqa: E402
+from compression import compress  # noqa: E402
+from config import app, db, local_db_path  # noqa: E402
+from migrations import migrate  # noqa: E402
+from models import Note, note_snippet  # noqa: E402
+
+
+def seed(client, count, words):
+    token = client.post("/signup", json={
+        "name": "Bench", "email": "bench@example.com", "password": "password"
+    }).json["access_token"]
+    rng = random.Random(1)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+                  for _ in range(2000)]
+    rows = []
+    for i in range(1, count + 1):
+        content = " ".join(rng.choice(vocabulary) for _ in range(words))
+        rows.append({"id": i, "title": f"Note {i}", "content": content, "snippet": note_snippet(content)})
+    with app.app_context():
+        # Raw SQL stores the content as TEXT, bypassing the compressing column type
+        db.session.execute(text("INSERT INTO notes (id, title, content, snippet, user_id) "
+                                "VALUES (:id, :title, :content, :snippet, 1)"), rows)
+        db.session.commit()
+    return {"Authorization": f"Bearer {token}"}
+
+
+def vacuumed_size():
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.exec_driver_sql("VACUUM")
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(local_db_path)
+
+
+def compress_in_place():
+    with db.engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, content FROM notes")).fetchall()
+        packed = [{"id": row.id, "content": compress(row.content)} for row in rows]
+        conn.execute(text("UPDATE notes SET content = :content WHERE id = :id"),
+                     [row for row in packed if isinstance(row["content"], bytes)])
+        conn.exec_driver_sql("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, size
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    headers = seed(client, args.notes, args.words)
+
+    def full_list():
+        # What GET /notes returned before: every column, content included
+        with app.test_request_context():
+            notes = Note.query.options(undefer(Note.content)).filter(Note.user_id == 1).order_by(Note.id).all()
+            return len(jsonify(serializers.notes(notes)).data)
+
+    def summary_list():
+        return len(client.get("/notes?view=summary", headers=headers).data)
+
+    def one_note():
+        return len(client.get(f"/notes/{args.notes // 2}", headers=headers).data)
+
+    with app.app_context():
+        before_size = vacuumed_size()
+        before_list = timed(full_list, args.repeat)
+        before_one = timed(one_note, args.repeat * 10)
+        compress_in_place()
+        after_size = vacuumed_size()
+    after_list = timed(summary_list, args.repeat)
+    after_one = timed(one_note, args.repeat * 10)
+
+    print(f"{args.notes} notes of ~{args.words} words")
+    print(f"{'':8} {'db file':>10} {'GET /notes':>22} {'GET /notes/<id>':>16}")
+    for label, size, (list_ms, list_bytes), (one_ms, _) in (("before", before_size, before_list, before_one),
+                                                            ("after", after_size, after_list, after_one)):
+        print(f"{label:8} {size / 2 ** 20:7.1f} MiB {list_ms:8.1f} ms {list_bytes / 2 ** 20:7.2f} MiB "
+              f"{one_ms:13.2f} ms")
+
+
+if __name__ == "__main__":
+    main_()
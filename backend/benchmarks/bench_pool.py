@@ -0,0 +1,98 @@
+"""Read throughput of the static vs pooled engine as threads scale.
+
+    python benchmarks/bench_pool.py [--rows 20000] [--seconds 2] [--threads 1,2,4,8]
+
+Runs against a throwaway database file, never local.db.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Must be set before config is imported
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_pool.db"))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from config import db_wrapper, engine_options, configure_engine  # noqa: E402
+
+
+def seed(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_tasks"))
+        conn.execute(text(
+            "CREATE TABLE bench_tasks (id INTEGER PRIMARY KEY, title TEXT, status TEXT, date_due TEXT)"
+        ))
+        conn.execute(
+            text("INSERT INTO bench_tasks (title, status, date_due) VALUES (:title, :status, :date_due)"),
+            [{"title": f"task {i}", "status": "Pending", "date_due": f"2025-01-{i % 28 + 1:02d}"}
+             for i in range(rows)]
+        )
+
+
+def run(engine, threads, seconds, rows, writer):
+    counts = [0] * threads
+    stop = threading.Event()
+
+    def reader(slot):
+        i = slot * 997
+        while not stop.is_set():
+            start = (i * 31) % (rows - 2000)
+            with engine.connect() as conn:
+                # Aggregate so most time is spent inside SQLite, which releases the GIL
+                conn.execute(
+                    text("SELECT status, count(*), max(date_due) FROM bench_tasks "
+                         "WHERE id BETWEEN :a AND :b GROUP BY status"),
+                    {"a": start, "b": start + 2000}
+                ).fetchall()
+            counts[slot] += 1
+            i += 1
+
+    def write_loop():
+        while not stop.is_set():
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE bench_tasks SET status = 'Completed' WHERE id = :id"),
+                             {"id": int(time.time() * 1000) % rows})
+            time.sleep(0.001)
+
+    workers = [threading.Thread(target=reader, args=(n,)) for n in range(threads)]
+    if writer:
+        workers.append(threading.Thread(target=write_loop))
+    for w in workers:
+        w.start()
+    time.sleep(seconds)
+    stop.set()
+    for w in workers:
+        w.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--no-writer", action="store_true", help="readers only, no concurrent writer")
+    args = parser.parse_args()
+    thread_counts = [int(n) for n in args.threads.split(",")]
+
+    engines = {}
+    for mode in ("static", "queue"):
+        engine = create_engine("sqlite://", **engine_options(db_wrapper, mode))
+        configure_engine(engine)
+        engines[mode] = engine
+    seed(engines["queue"], args.rows)
+
+    print(f"{'threads':>8} {'static q/s':>12} {'queue q/s':>12} {'speedup':>8}")
+    for threads in thread_counts:
+        static = run(engines["static"], threads, args.seconds, args.rows, not args.no_writer)
+        pooled = run(engines["queue"], threads, args.seconds, args.rows, not args.no_writer)
+        print(f"{threads:>8} {static:>12.0f} {pooled:>12.0f} {pooled / static:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""/search (FTS5) vs fetching every note and grepping it client-side.
+
+    python benchmarks/bench_search.py [--notes 5000] [--words 300] [--repeat 20]
+
+Seeds one user with --notes notes of roughly --words words each (plus as
+many for another user), then times a rare term, a common term and a
+prefix query through /search against GET /notes followed by a
+case-insensitive substring filter, which is what the frontend does today.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_search.db"))
+
+from sqlalchemy import text  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+VOCABULARY = [f"word{n}" for n in range(5000)]
+
+
+def seed(user_ids, notes, words):
+    rng = random.Random(7)
+    rows = []
+    for i in range(notes * len(user_ids)):
+        body = rng.choices(VOCABULARY, weights=[1 / (n + 1) for n in range(len(VOCABULARY))], k=words)
+        if i % 500 == 0:
+            body.append("quarterly")  # a rare term: one note in 500
+        rows.append({"title": f"Note {i} {rng.choice(VOCABULARY)}", "content": " ".join(body),
+                     "user_id": user_ids[i % len(user_ids)]})
+    started = time.perf_counter()
+    with app.app_context():
+        db.session.execute(text(
+            "INSERT INTO notes (title, content, user_id, date_created, date_updated) "
+            "VALUES (:title, :content, :user_id, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"), rows)
+        db.session.commit()
+    return time.perf_counter() - started
+
+
+def timed(client, url, headers, repeat, term=None):
+    samples, size, hits = [], 0, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        if term is None:
+            hits = len(response.json["items"])
+        else:
+            needle = term.lower()
+            hits = sum(1 for note in response.json
+                       if needle in note["title"].lower() or needle in (note["content"] or "").lower())
+        samples.append(time.perf_counter() - started)
+        size = len(response.data)
+    return statistics.median(samples) * 1000, size, hits
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrate()
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    tokens = [client.post("/signup", json={"name": "Bench", "email": f"bench{n}@example.com", "password": "pw"})
+              .json["access_token"] for n in range(2)]
+    seconds = seed([1, 2], args.notes, args.words)
+    headers = {"Authorization": f"Bearer {tokens[0]}"}
+    print(f"{args.notes} notes of ~{args.words} words per user, 2 users; "
+          f"insert incl. FTS triggers took {seconds:.1f}s")
+
+    cases = [
+        ("rare term", "quarterly"),
+        ("common term", "word3"),
+        ("two terms", "word10 word20"),
+        ("prefix", "quart"),
+    ]
+    print(f"{'case':<14} {'mode':<16} {'median ms':>10} {'bytes':>12} {'hits':>6}")
+    for name, q in cases:
+        ms, size, hits = timed(client, f"/search?q={q}&type=notes", headers, args.repeat)
+        print(f"{name:<14} {'/search page':<16} {ms:>10.1f} {size:>12} {hits:>6}")
+        if " " not in q:
+            ms, size, hits = timed(client, "/notes", headers, max(1, args.repeat // 10), term=q)
+            print(f"{'':<14} {'fetch + grep':<16} {ms:>10.1f} {size:>12} {hits:>6}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,101 @@
+"""Serializing task lists: per-object to_json + stdlib json vs serializers.py.
+
+    python benchmarks/bench_serialize.py [--sizes 100,10000,100000] [--repeat 5]
+
+Rows are loaded once per size; each timing covers building the dicts
+(including the batched user-id query both paths share) and encoding them.
+The "legacy" path is a copy of the old Task.to_json / jsonify code.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_serialize.db"))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+import main  # noqa: E402,F401
+import serializers  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+from models import Task, user_ids_by, user_task  # noqa: E402
+
+
+def legacy_task_json(task, user_ids):
+    return {
+        "id": task.id,
+        "title": task.title,
+        "description": task.description,
+        "dateAssigned": task.date_assigned.isoformat() if task.date_assigned else None,
+        "dateDue": task.date_due.isoformat() if task.date_due else None,
+        "users": user_ids,
+        "status": task.status,
+        "category": task.category
+    }
+
+
+def legacy(tasks, provider):
+    user_ids = user_ids_by(user_task.c.task_id, [task.id for task in tasks])
+    data = [legacy_task_json(task, user_ids[task.id]) for task in tasks]
+    return provider.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def current(tasks):
+    return serializers.dumps_bytes(serializers.tasks(tasks))
+
+
+def seed(count):
+    start = datetime(2025, 1, 1)
+    rows = [{"id": i, "title": f"Task {i}", "description": "Lorem ipsum dolor sit amet " * 4,
+             "status": "Pending", "category": "Work",
+             "date_assigned": start + timedelta(minutes=i), "date_due": start + timedelta(hours=i)}
+            for i in range(1, count + 1)]
+    db.session.execute(text(
+        "INSERT INTO tasks (id, title, description, status, category, date_assigned, date_due) "
+        "VALUES (:id, :title, :description, :status, :category, :date_assigned, :date_due)"), rows)
+    db.session.execute(text("INSERT INTO users (id, name, email, password) VALUES (1, 'Bench', 'b@x', 'x')"))
+    db.session.execute(text("INSERT INTO user_task (user_id, task_id) VALUES (1, :id)"),
+                       [{"id": row["id"]} for row in rows])
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"encoder: {'orjson ' + serializers.orjson.__version__ if serializers.orjson else 'stdlib json'}")
+    print(f"{'rows':>8} {'legacy ms':>10} {'new ms':>10} {'speedup':>8}")
+    with app.app_context():
+        migrate()
+        seed(max(sizes))
+        provider = DefaultJSONProvider(app)
+        for size in sizes:
+            tasks = Task.query.order_by(Task.id).limit(size).all()
+            assert provider.loads(legacy(tasks, provider)) == serializers.loads(current(tasks))
+            old_ms = timed(lambda: legacy(tasks, provider), args.repeat)
+            new_ms = timed(lambda: current(tasks), args.repeat)
+            print(f"{size:>8} {old_ms:>10.1f} {new_ms:>10.1f} {old_ms / new_ms:>7.1f}x")
+            db.session.expunge_all()
+
+
+if __name__ == "__main__":
+    main_()
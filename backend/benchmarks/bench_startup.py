@@ -0,0 +1,108 @@
+"""Cold-start cost: import time, first request, and time until /readyz passes.
+
+    python benchmarks/bench_startup.py [--sync-latency-ms 2000] [--remote-down] [--runs 3]
+
+Each run is a fresh process. Before main.py is imported, the Turso client
+is replaced with the stand-in from loadtest.py, which sleeps
+--sync-latency-ms per sync (or raises, with --remote-down). DB_LINK is set
+so the pull is attempted. The run times `import main`, the first
+GET /healthz, and polls GET /readyz until it returns 200 (up to
+--ready-timeout). The replica is migrated by an untimed run first.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+class UnreachableSyncEndpoint:
+    def __call__(self, database, sync_url=None, auth_token=None):
+        raise ConnectionError("remote unreachable")
+
+
+def child(latency, remote_down, ready_timeout):
+    """Run inside a fresh process; prints timings in ms as JSON"""
+    started = time.perf_counter()
+    import libsql_experimental
+    from loadtest import LocalSyncEndpoint
+    libsql_experimental.connect = UnreachableSyncEndpoint() if remote_down else LocalSyncEndpoint(latency)
+
+    import main  # noqa: F401
+    from config import app
+    from migrations import migrate
+    imported = time.perf_counter()
+
+    with app.app_context():
+        migrate()
+    client = app.test_client()
+    health = client.get("/healthz")
+    first_request = time.perf_counter()
+
+    ready = None
+    while time.perf_counter() - started < ready_timeout:
+        response = client.get("/readyz")
+        if response.status_code == 200:
+            ready = time.perf_counter()
+            break
+        if response.status_code == 404:  # a tree without the probe
+            break
+        time.sleep(0.01)
+
+    print("RESULT", json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_request_ms": (first_request - started) * 1000,
+        "first_request_status": health.status_code,
+        "ready_ms": (ready - started) * 1000 if ready is not None else None,
+    }), flush=True)
+
+
+def run_child(args):
+    env = dict(os.environ, DB_LINK="libsql://stand-in.example", SLOW_QUERY_MS="-1")
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", "--sync-latency-ms", str(args.sync_latency_ms),
+         "--ready-timeout", str(args.ready_timeout)] + (["--remote-down"] if args.remote_down else []),
+        env=env, capture_output=True, text=True, check=True
+    )
+    line = next(line for line in result.stdout.splitlines() if line.startswith("RESULT "))
+    return json.loads(line.split(" ", 1)[1])
+
+
+def median_of(runs, key):
+    values = [run[key] for run in runs if run[key] is not None]
+    return f"{statistics.median(values):.0f} ms" if values else "never"
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sync-latency-ms", type=float, default=2000)
+    parser.add_argument("--remote-down", action="store_true", help="every sync attempt fails")
+    parser.add_argument("--ready-timeout", type=float, default=30, help="seconds to wait for /readyz")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.sync_latency_ms / 1000, args.remote_down, args.ready_timeout)
+        return
+
+    os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_startup.db"))
+    run_child(argparse.Namespace(**{**vars(args), "sync_latency_ms": 0, "remote_down": False}))  # migrate
+
+    runs = [run_child(args) for _ in range(args.runs)]
+    remote = "down" if args.remote_down else f"{args.sync_latency_ms:g} ms per sync"
+    print(f"remote: {remote}, median of {args.runs} fresh processes")
+    print(f"import main:        {median_of(runs, 'import_ms')}")
+    print(f"first /healthz:     {median_of(runs, 'first_request_ms')} after start "
+          f"(status {runs[0]['first_request_status']})")
+    print(f"/readyz passing:    {median_of(runs, 'ready_ms')} after start")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,106 @@
+"""Check that list routes issue a fixed number of SQL statements, whatever the list size.
+
+    python benchmarks/check_query_counts.py
+
+Seeds a throwaway database through the API with one user per list size
+(1, 10 and 50 tasks, goals and habits, each row also linked to a second
+user), then counts the statements each list route executes for each of
+them. Exits non-zero if a route's count grows with the size, which is
+how an N+1 (one lazy load of `users` per row) shows up.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "counts.db"))
+os.environ.setdefault("SLOW_QUERY_MS", "-1")
+
+from sqlalchemy import event, text  # noqa: E402
+import main  # noqa: E402,F401
+import passwords  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+SIZES = [1, 10, 50]
+
+LIST_ROUTES = [
+    "/tasks",
+    "/tasks?limit=100&sort=dateDue",
+    "/tasks/search?status=Pending",
+    "/goals",
+    "/goals?limit=100",
+    "/habits",
+    "/habits?limit=100",
+    "/habits/days?habitDays=Monday",
+]
+
+# Association table -> (the collection's route, its id column)
+LINKS = {"user_task": ("/tasks", "task_id"), "user_goal": ("/goals", "goal_id"), "user_habit": ("/habits", "habit_id")}
+
+
+def signup(client, email):
+    response = client.post("/signup", json={"name": "Count", "email": email, "password": "password"})
+    return response.json["user"]["id"], {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def seed(client, size, other_id):
+    user_id, headers = signup(client, f"count{size}@example.com")
+    for i in range(size):
+        client.post("/tasks", headers=headers, json={"title": f"Task {i}", "dateDue": "2025-01-02"})
+        client.post("/goals", headers=headers, json={"title": f"Goal {i}", "status": "Planned", "period": "Weekly"})
+        client.post("/habits", headers=headers, json={"title": f"Habit {i}", "color": "#ffffff",
+                                                      "habitDays": ["Monday"]})
+    # Share every row with a second user, so each item has more than one linked user id
+    with app.app_context():
+        for table, (_, column) in LINKS.items():
+            db.session.execute(
+                text(f"INSERT INTO {table} (user_id, {column}) "
+                     f"SELECT :other, {column} FROM {table} WHERE user_id = :user"),
+                {"other": other_id, "user": user_id})
+        db.session.commit()
+    return headers
+
+
+def main_():
+    with app.app_context():
+        migrate()
+        engine = db.engine
+    passwords.configure(pool_size=0, rounds=4)
+    client = app.test_client()
+    other_id, _ = signup(client, "other@example.com")
+    users = {size: seed(client, size, other_id) for size in SIZES}
+
+    count = [0]
+
+    def counter(conn, cursor, statement, parameters, context, executemany):
+        count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", counter)
+    failures = 0
+    print(f"{'route':<34}" + "".join(f"{f'{size} rows':>10}" for size in SIZES))
+    for route in LIST_ROUTES:
+        counts = []
+        for size, headers in users.items():
+            client.get("/validate-token", headers=headers)  # the user lookup is cached from here on
+            count[0] = 0
+            response = client.get(route, headers=headers)
+            body = response.json
+            items = body["items"] if isinstance(body, dict) else body
+            if response.status_code != 200 or len(items) != size:
+                print(f"{route}: expected {size} items, got status {response.status_code}")
+                failures += 1
+            counts.append(count[0])
+        grows = any(later > first for first, later in zip(counts, counts[1:]))
+        failures += grows
+        print(f"{route:<34}" + "".join(f"{n:>10}" for n in counts) + ("  !! grows with size" if grows else ""))
+    event.remove(engine, "before_cursor_execute", counter)
+
+    print(f"\n{failures} route(s) whose statement count depends on the list size")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
@@ -0,0 +1,122 @@
+"""Run EXPLAIN QUERY PLAN on every SELECT issued by the read routes in main.py.
+
+    python benchmarks/check_query_plans.py
+
+Seeds a throwaway database through the API, records the statements each
+route executes and flags any plan step that scans a table without an
+index. Exits non-zero if one is found.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("LOCAL_DB_PATH", os.path.join(tempfile.mkdtemp(), "plans.db"))
+
+from sqlalchemy import event  # noqa: E402
+import main  # noqa: E402
+from config import app, db  # noqa: E402
+from migrations import migrate  # noqa: E402
+from slow_queries import full_scans  # noqa: E402
+
+# Route -> query string; each is requested with a seeded user's token
+READ_ROUTES = [
+    "/",
+    "/validate-token",
+    "/users/seed0@example.com",
+    "/notes",
+    "/notes?view=summary",
+    "/notes/1",
+    "/notes?folder=2",
+    "/notes?folder=1&recursive=1",
+    "/folders",
+    "/folders/2",
+    "/tasks",
+    "/tasks?limit=10&sort=dateDue",
+    "/tasks/1",
+    "/tasks/search?status=Pending,Completed&category=Work&dueFrom=2025-01-01&dueTo=2025-01-31&q=Task&sort=dateDue",
+    "/tasks/calendar?from=2025-01-01&to=2025-01-31&tz=Europe/Kyiv",
+    "/tasks/calendar?from=2025-01-01&to=2025-12-31&counts=1",
+    "/tasks/status?status=Pending",
+    "/tasks/category?category=Work",
+    "/tasks/dateAssigned?dateAssigned=2025-01-01 00:00:00.000000",
+    "/tasks/dateDue?dateDue=2025-01-02 00:00:00.000000",
+    "/goals",
+    "/goals/1",
+    "/goals/status?status=Planned",
+    "/goals/period?period=Weekly",
+    "/habits",
+    "/habits/1",
+    "/habits/status?status=Planned",
+    "/habits/days?habitDays=Wednesday,Friday",
+    "/search?q=Task text",
+    "/changes?since=1",
+    "/dashboard/summary",
+]
+
+
+def seed(client):
+    token = client.post("/signup", json={
+        "name": "Seed", "email": "seed0@example.com", "password": "password"
+    }).json["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/folders", headers=headers, json={"name": "Folder 1"})
+    client.post("/folders", headers=headers, json={"name": "Folder 2", "parentId": 1})
+    for i in range(20):
+        client.post("/tasks", headers=headers, json={
+            "title": f"Task {i}", "category": "Work" if i % 2 else "Home",
+            "dateAssigned": "2025-01-01", "dateDue": f"2025-01-{i % 5 + 2:02d}",
+        })
+        client.post("/notes", headers=headers, json={"title": f"Note {i}", "content": "text", "folderId": i % 3})
+        client.post("/goals", headers=headers, json={"title": f"Goal {i}", "status": "Planned", "period": "Weekly"})
+        client.post("/habits", headers=headers, json={
+            "title": f"Habit {i}", "color": "#ffffff", "status": "Planned", "habitDays": ["Monday"]
+        })
+    return headers
+
+
+def main_():
+    with app.app_context():
+        migrate()
+        engine = db.engine
+    client = app.test_client()
+    headers = seed(client)
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+
+    failures = 0
+    seen = set()
+    for route in READ_ROUTES:
+        captured.clear()
+        response = client.get(route, headers=headers)
+        print(f"\n{route}  [{response.status_code}]")
+        if response.status_code >= 500:
+            failures += 1
+            continue
+        with engine.connect() as conn:
+            for statement, parameters in list(captured):
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                scans = full_scans([row[-1] for row in plan])
+                failures += bool(scans)
+                print("  " + " ".join(statement.split())[:110])
+                for row in plan:
+                    print(f"    {'!!' if row[-1] in scans else '  '} {row[-1]}")
+
+    event.remove(engine, "before_cursor_execute", capture)
+    print(f"\n{failures} route(s)/statement(s) failing or doing full table scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_())
@@ -0,0 +1,548 @@
+"""HTTP load test of every route in main.py against a seeded synthetic dataset.
+
+    python benchmarks/loadtest.py [--scale 1.0] [--db PATH] [--concurrency 16]
+                                  [--requests 200] [--sync-latency-ms 20] [--out loadtest.json]
+    python benchmarks/loadtest.py --compare before.json after.json
+
+At --scale 1.0 the dataset is 10k users, 1M tasks, 200k notes, 50k goals
+and 30k habits plus their association rows, generated from a fixed seed.
+Task, note, goal and habit n belong to user (n - 1) % users + 1, and one
+task in twenty is shared with a second user. Every user has a small folder
+tree, and four notes in five are filed in one of its folders. With --db the dataset is kept
+in that file and reused by later runs with the same parameters, so
+reports from different commits compare like with like.
+
+The app runs on a local threaded HTTP server. Syncs to Turso go to an
+in-process stand-in that sleeps --sync-latency-ms per sync. Each endpoint
+gets --requests requests from --concurrency client threads, one endpoint
+after another. The single-filter routes are called with limit=100, as
+they were when they still returned every matching row in the database.
+
+The report holds, per endpoint, request and error counts, status codes,
+mean/p50/p95/p99 latency in ms and throughput. It is written with sorted
+keys so two reports diff cleanly; --compare prints the p50/p95 change.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SEED = 20250101
+BASE_SIZES = {"users": 10000, "tasks": 1000000, "notes": 200000, "goals": 50000, "habits": 30000}
+PASSWORD = "loadtest-password"
+WORDS = ["budget", "meeting", "report", "garden", "invoice", "travel", "study", "exam", "groceries",
+         "doctor", "project", "review", "design", "release", "family", "gym", "reading", "taxes"]
+STATUSES = ["Pending", "In Progress", "Completed", "Canceled"]
+CATEGORIES = ["Work", "Home", "Study", "Other"]
+DAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+# Each user's folders: (parent's position, or None for the top level), in id order
+FOLDER_TREE = [None, 1, 2, None]
+YEAR_START = datetime(2025, 1, 1)
+CHUNK = 20000
+ADMIN_USER = 1
+
+
+class LocalSyncEndpoint:
+    """Stands in for libsql_experimental.connect(...).sync() against Turso"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.syncs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, database, sync_url=None, auth_token=None):
+        return self
+
+    def sync(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.syncs += 1
+
+    def close(self):
+        pass
+
+
+def stamp(value):
+    # The format SQLAlchemy stores DateTime columns in on SQLite
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def due_date(n):
+    return YEAR_START + timedelta(minutes=(n * 7919) % (365 * 24 * 60))
+
+
+def folder_id(user_id, position):
+    """Id of the user's folder at `position` (1-based) in FOLDER_TREE; 0 is the top level"""
+    return (user_id - 1) * len(FOLDER_TREE) + position if position else None
+
+
+def dataset_params(sizes):
+    return {"seed": SEED, "folders_per_user": len(FOLDER_TREE), **sizes}
+
+
+# ----------------------------------------------------------------------------------------
+
+def seed(engine, sizes):
+    from sqlalchemy import text
+    import passwords
+
+    rng = random.Random(SEED)
+    users = sizes["users"]
+    password = passwords.hash_password(PASSWORD)
+
+    def insert(conn, sql, rows):
+        for start in range(0, len(rows), CHUNK):
+            conn.execute(text(sql), rows[start:start + CHUNK])
+
+    def sentence(count):
+        return " ".join(rng.choice(WORDS) for _ in range(count))
+
+    with engine.begin() as conn:
+        insert(conn, "INSERT INTO users (id, name, email, password, location) "
+                     "VALUES (:id, :name, :email, :password, :location)",
+               [{"id": u, "name": f"User {u}", "email": f"user{u}@loadtest.local", "password": password,
+                 "location": "Kyiv"} for u in range(1, users + 1)])
+
+        for start in range(1, sizes["tasks"] + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, sizes["tasks"] + 1))
+            insert(conn, "INSERT INTO tasks (id, title, description, date_assigned, date_due, status, category) "
+                         "VALUES (:id, :title, :description, :date_assigned, :date_due, :status, :category)",
+                   [{"id": n, "title": f"Task {n} {rng.choice(WORDS)}", "description": sentence(12),
+                     "date_assigned": stamp(due_date(n) - timedelta(days=3)), "date_due": stamp(due_date(n)),
+                     "status": STATUSES[n % 4], "category": CATEGORIES[n % 4 - 1]} for n in ids])
+            links = [{"user_id": (n - 1) % users + 1, "task_id": n} for n in ids]
+            links += [{"user_id": (n + 7) % users + 1, "task_id": n} for n in ids
+                      if n % 20 == 0 and (n + 7) % users != (n - 1) % users]
+            insert(conn, "INSERT INTO user_task (user_id, task_id) VALUES (:user_id, :task_id)", links)
+
+        # Parents come before their children, so the closure-table triggers see them
+        insert(conn, "INSERT INTO folders (id, name, parent_id, user_id, date_created) "
+                     "VALUES (:id, :name, :parent_id, :user_id, :created)",
+               [{"id": folder_id(u, position), "name": f"Folder {position}",
+                 "parent_id": folder_id(u, parent), "user_id": u, "created": stamp(YEAR_START)}
+                for u in range(1, users + 1) for position, parent in enumerate(FOLDER_TREE, 1)])
+
+        for start in range(1, sizes["notes"] + 1, CHUNK):
+            ids = range(start, min(start + CHUNK, sizes["notes"] + 1))
+            insert(conn, "INSERT INTO notes (id, title, content, folder_id, date_created, date_updated, user_id) "
+                         "VALUES (:id, :title, :content, :folder_id, :created, :created, :user_id)",
+                   [{"id": n, "title": f"Note {n} {rng.choice(WORDS)}", "content": sentence(80),
+                     "folder_id": folder_id((n - 1) % users + 1, n % (len(FOLDER_TREE) + 1)),
+                     "created": stamp(due_date(n)), "user_id": (n - 1) % users + 1}
+                    for n in ids])
+
+        insert(conn, "INSERT INTO goals (id, title, description, status, period) "
+                     "VALUES (:id, :title, :description, :status, :period)",
+               [{"id": n, "title": f"Goal {n}", "description": sentence(8),
+                 "status": ["PLANNED", "IN_PROGRESS", "COMPLETED"][n % 3],
+                 "period": ["WEEKLY", "MONTHLY", "YEARLY"][n % 3]} for n in range(1, sizes["goals"] + 1)])
+        insert(conn, "INSERT INTO user_goal (user_id, goal_id) VALUES (:user_id, :goal_id)",
+               [{"user_id": (n - 1) % users + 1, "goal_id": n} for n in range(1, sizes["goals"] + 1)])
+
+        habit_rows = []
+        for n in range(1, sizes["habits"] + 1):
+            days = [day for i, day in enumerate(DAYS) if (n >> i) & 1] or ["Monday"]
+            habit_rows.append({"id": n, "title": f"Habit {n}", "color": "#34a853", "status": "In Progress",
+                               "habit_days": ",".join(days), "days_mask": sum(1 << DAYS.index(d) for d in days)})
+        insert(conn, "INSERT INTO habits (id, title, color, status, habit_days, days_mask) "
+                     "VALUES (:id, :title, :color, :status, :habit_days, :days_mask)", habit_rows)
+        insert(conn, "INSERT INTO user_habit (user_id, habit_id) VALUES (:user_id, :habit_id)",
+               [{"user_id": (n - 1) % users + 1, "habit_id": n} for n in range(1, sizes["habits"] + 1)])
+
+        conn.execute(text("CREATE TABLE loadtest_meta (params TEXT NOT NULL)"))
+        conn.execute(text("INSERT INTO loadtest_meta (params) VALUES (:p)"),
+                     {"p": json.dumps(dataset_params(sizes), sort_keys=True)})
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def seeded_params(engine):
+    from sqlalchemy import inspect, text
+    if not inspect(engine).has_table("loadtest_meta"):
+        return None
+    with engine.connect() as conn:
+        return json.loads(conn.execute(text("SELECT params FROM loadtest_meta")).scalar())
+
+
+# ----------------------------------------------------------------------------------------
+
+class Context:
+    """Per-run state shared by the endpoint builders"""
+
+    def __init__(self, app, sizes, port):
+        self.app = app
+        self.sizes = sizes
+        self.port = port
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def unique(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def tokens(self, user_id):
+        from flask_jwt_extended import create_access_token, create_refresh_token
+        with self._lock:
+            if user_id not in self._tokens:
+                with self.app.app_context():
+                    self._tokens[user_id] = (
+                        create_access_token(identity=str(user_id), expires_delta=timedelta(hours=6)),
+                        create_refresh_token(identity=str(user_id), expires_delta=timedelta(hours=6)),
+                    )
+            return self._tokens[user_id]
+
+    def fresh_refresh_token(self, user_id):
+        """A refresh token of its own, for requests that revoke the one they carry"""
+        from flask_jwt_extended import create_refresh_token
+        with self.app.app_context():
+            return create_refresh_token(identity=str(user_id), expires_delta=timedelta(hours=6))
+
+    def owned(self, rng, kind, user_id):
+        """An id of `kind` owned by the user under the seeding scheme"""
+        users = self.sizes["users"]
+        per_user = max(1, (self.sizes[kind] - user_id) // users + 1)
+        return user_id + users * rng.randrange(per_user)
+
+    def folder(self, rng, user_id):
+        """One of the user's folders, or None (the top level)"""
+        return folder_id(user_id, rng.randrange(len(FOLDER_TREE) + 1))
+
+    def request(self, method, path, body=None, token=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        try:
+            conn.request(method, quote(path, safe="/?&=,:@%"), body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            return response.status, data
+        finally:
+            conn.close()
+
+    def create(self, path, body, token):
+        status, data = self.request("POST", path, body, token)
+        return json.loads(data)["id"] if status == 201 else 0
+
+
+# Each builder returns (method, path, body, token) for one request of that endpoint.
+# Work done inside a builder (e.g. creating the row a DELETE removes) is not timed.
+
+def task_body(rng):
+    due = due_date(rng.randrange(10 ** 6))
+    return {"title": f"Load {rng.choice(WORDS)}", "description": " ".join(rng.sample(WORDS, 6)),
+            "dateAssigned": (due - timedelta(days=2)).isoformat(), "dateDue": due.isoformat(),
+            "status": rng.choice(STATUSES), "category": rng.choice(CATEGORIES)}
+
+
+def note_body(rng, folder_id=None):
+    return {"title": f"Load {rng.choice(WORDS)}", "content": " ".join(rng.choice(WORDS) for _ in range(80)),
+            "folderId": folder_id}
+
+
+def goal_body(rng):
+    return {"title": f"Load goal {rng.choice(WORDS)}", "description": "load", "status": "Planned",
+            "period": "Weekly"}
+
+
+def habit_body(rng):
+    return {"title": f"Load habit {rng.choice(WORDS)}", "color": "#4285f4", "status": "In Progress",
+            "habitDays": rng.sample(DAYS, 3)}
+
+
+def batch_body(rng, make):
+    return {"operations": [{"op": "create", "data": make(rng)} for _ in range(20)]}
+
+
+def endpoints():
+    month = lambda rng: rng.randrange(1, 13)  # noqa: E731
+
+    def created(path, make):
+        def build(ctx, rng, user, access):
+            return "DELETE", f"{path}/{ctx.create(path, make(rng), access)}", None, access
+        return build
+
+    return [
+        ("GET /", lambda ctx, rng, user, access: ("GET", "/", None, access)),
+        ("POST /signup", lambda ctx, rng, user, access: (
+            "POST", "/signup", {"name": "New", "email": f"new{ctx.unique()}-{time.time_ns()}@loadtest.local",
+                                "password": PASSWORD}, None)),
+        ("POST /login", lambda ctx, rng, user, access: (
+            "POST", "/login", {"email": f"user{user}@loadtest.local", "password": PASSWORD}, None)),
+        ("GET /validate-token", lambda ctx, rng, user, access: ("GET", "/validate-token", None, access)),
+        ("GET /users/<email>", lambda ctx, rng, user, access: ("GET", f"/users/user{user}@loadtest.local", None, None)),
+        ("PUT /users/<id>", lambda ctx, rng, user, access: (
+            "PUT", f"/users/{user}", {"location": rng.choice(["Kyiv", "Lviv", "Odesa"])}, access)),
+        ("POST /refresh", lambda ctx, rng, user, access: ("POST", "/refresh", None, ctx.tokens(user)[1])),
+        ("DELETE /logout", lambda ctx, rng, user, access: ("DELETE", "/logout", None, ctx.fresh_refresh_token(user))),
+
+        ("GET /notes", lambda ctx, rng, user, access: ("GET", "/notes", None, access)),
+        ("GET /notes?limit", lambda ctx, rng, user, access: (
+            "GET", "/notes?limit=50&sort=dateUpdated&order=desc", None, access)),
+        ("GET /notes?folder", lambda ctx, rng, user, access: (
+            "GET", f"/notes?folder={folder_id(user, 1)}&recursive=1", None, access)),
+        ("GET /folders", lambda ctx, rng, user, access: ("GET", "/folders", None, access)),
+        ("GET /notes/<id>", lambda ctx, rng, user, access: (
+            "GET", f"/notes/{ctx.owned(rng, 'notes', user)}", None, access)),
+        ("POST /notes", lambda ctx, rng, user, access: (
+            "POST", "/notes", note_body(rng, ctx.folder(rng, user)), access)),
+        ("PUT /notes", lambda ctx, rng, user, access: (
+            "PUT", "/notes", dict(note_body(rng, ctx.folder(rng, user)), note_id=ctx.owned(rng, "notes", user)),
+            access)),
+        ("PUT /notes/<id>", lambda ctx, rng, user, access: (
+            "PUT", f"/notes/{ctx.owned(rng, 'notes', user)}", note_body(rng, ctx.folder(rng, user)), access)),
+        ("DELETE /notes/<id>", created("/notes", note_body)),
+
+        ("GET /tasks", lambda ctx, rng, user, access: ("GET", "/tasks", None, access)),
+        ("GET /tasks?limit", lambda ctx, rng, user, access: (
+            "GET", "/tasks?limit=50&sort=dateDue", None, access)),
+        ("GET /tasks/<id>", lambda ctx, rng, user, access: (
+            "GET", f"/tasks/{ctx.owned(rng, 'tasks', user)}", None, access)),
+        ("POST /tasks", lambda ctx, rng, user, access: ("POST", "/tasks", task_body(rng), access)),
+        ("PUT /tasks/<id>", lambda ctx, rng, user, access: (
+            "PUT", f"/tasks/{ctx.owned(rng, 'tasks', user)}", task_body(rng), access)),
+        ("POST /tasks/<id>/users", lambda ctx, rng, user, access: (
+            "POST", f"/tasks/{ctx.owned(rng, 'tasks', user)}/users",
+            {"user_id": rng.randrange(1, ctx.sizes["users"] + 1)}, access)),
+        ("DELETE /tasks/<id>", created("/tasks", task_body)),
+        ("GET /tasks/search", lambda ctx, rng, user, access: (
+            "GET", f"/tasks/search?status=Pending,In Progress&dueFrom=2025-{month(rng):02d}-01"
+                   f"&dueTo=2025-12-31&sort=dateDue&limit=50", None, access)),
+        ("GET /tasks/calendar", lambda ctx, rng, user, access: (
+            "GET", "/tasks/calendar?from=2025-{0:02d}-01&to=2025-{0:02d}-28&tz=Europe/Kyiv&counts=1"
+                   .format(month(rng)), None, access)),
+        ("GET /tasks/status", lambda ctx, rng, user, access: (
+            "GET", f"/tasks/status?status={rng.choice(STATUSES)}&limit=100", None, access)),
+        ("GET /tasks/category", lambda ctx, rng, user, access: (
+            "GET", f"/tasks/category?category={rng.choice(CATEGORIES)}&limit=100", None, access)),
+        ("GET /tasks/dateAssigned", lambda ctx, rng, user, access: (
+            "GET", "/tasks/dateAssigned?dateAssigned=" +
+            stamp(due_date(ctx.owned(rng, "tasks", user)) - timedelta(days=3)),
+            None, access)),
+        ("GET /tasks/dateDue", lambda ctx, rng, user, access: (
+            "GET", "/tasks/dateDue?dateDue=" + stamp(due_date(ctx.owned(rng, "tasks", user))),
+            None, access)),
+
+        ("GET /goals", lambda ctx, rng, user, access: ("GET", "/goals", None, access)),
+        ("GET /goals/<id>", lambda ctx, rng, user, access: (
+            "GET", f"/goals/{ctx.owned(rng, 'goals', user)}", None, access)),
+        ("POST /goals", lambda ctx, rng, user, access: ("POST", "/goals", goal_body(rng), access)),
+        ("PUT /goals/<id>", lambda ctx, rng, user, access: (
+            "PUT", f"/goals/{ctx.owned(rng, 'goals', user)}", goal_body(rng), access)),
+        ("DELETE /goals/<id>", created("/goals", goal_body)),
+        ("GET /goals/status", lambda ctx, rng, user, access: (
+            "GET", "/goals/status?status=Planned&limit=100", None, access)),
+        ("GET /goals/period", lambda ctx, rng, user, access: (
+            "GET", "/goals/period?period=Weekly&limit=100", None, access)),
+
+        ("GET /habits", lambda ctx, rng, user, access: ("GET", "/habits", None, access)),
+        ("GET /habits/<id>", lambda ctx, rng, user, access: (
+            "GET", f"/habits/{ctx.owned(rng, 'habits', user)}", None, access)),
+        ("POST /habits", lambda ctx, rng, user, access: ("POST", "/habits", habit_body(rng), access)),
+        ("PUT /habits/<id>", lambda ctx, rng, user, access: (
+            "PUT", f"/habits/{ctx.owned(rng, 'habits', user)}", habit_body(rng), access)),
+        ("DELETE /habits/<id>", created("/habits", habit_body)),
+        ("GET /habits/status", lambda ctx, rng, user, access: (
+            "GET", "/habits/status?status=In Progress&limit=100", None, access)),
+        ("GET /habits/days", lambda ctx, rng, user, access: (
+            "GET", f"/habits/days?habitDays={rng.choice(DAYS)}", None, access)),
+
+        ("POST /tasks/batch", lambda ctx, rng, user, access: (
+            "POST", "/tasks/batch", batch_body(rng, task_body), access)),
+        ("POST /notes/batch", lambda ctx, rng, user, access: (
+            "POST", "/notes/batch", batch_body(rng, lambda rng: note_body(rng, ctx.folder(rng, user))), access)),
+        ("POST /goals/batch", lambda ctx, rng, user, access: (
+            "POST", "/goals/batch", batch_body(rng, goal_body), access)),
+        ("POST /habits/batch", lambda ctx, rng, user, access: (
+            "POST", "/habits/batch", batch_body(rng, habit_body), access)),
+
+        ("GET /search", lambda ctx, rng, user, access: (
+            "GET", f"/search?q={rng.choice(WORDS)} {rng.choice(WORDS)[:3]}", None, access)),
+        ("GET /sync/status", lambda ctx, rng, user, access: (
+            "GET", "/sync/status", None, ctx.tokens(ADMIN_USER)[0])),
+        ("GET /cache/stats", lambda ctx, rng, user, access: (
+            "GET", "/cache/stats", None, ctx.tokens(ADMIN_USER)[0])),
+    ]
+
+
+# ----------------------------------------------------------------------------------------
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_endpoint(ctx, name, build, requests, concurrency):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker(slot):
+        rng = random.Random(f"{SEED}-{name}-{slot}")
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            user = rng.randrange(1, ctx.sizes["users"] + 1)
+            method, path, body, token = build(ctx, rng, user, ctx.tokens(user)[0])
+            started = time.perf_counter()
+            try:
+                status, _ = ctx.request(method, path, body, token)
+            except (OSError, http.client.HTTPException):
+                status = "connection error"
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": statuses,
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_rps": round(len(latencies) / wall, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)["endpoints"]
+    with open(after_path) as f:
+        after = json.load(f)["endpoints"]
+    print(f"{'endpoint':<26} {'p50 before':>10} {'after':>8} {'p95 before':>11} {'after':>8} {'change':>8}")
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name), after.get(name)
+        if not old or not new:
+            print(f"{name:<26} {'only in ' + ('after' if new else 'before'):>48}")
+            continue
+        change = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0
+        print(f"{name:<26} {old['p50_ms']:>10.1f} {new['p50_ms']:>8.1f} {old['p95_ms']:>11.1f} "
+              f"{new['p95_ms']:>8.1f} {change:>+7.0f}%")
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the dataset sizes")
+    parser.add_argument("--db", help="dataset file to create or reuse (default: a fresh temp file)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--only", help="comma-separated endpoint names to run")
+    parser.add_argument("--sync-latency-ms", type=float, default=20)
+    parser.add_argument("--out", default="loadtest.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(tempfile.mkdtemp(), "loadtest.db")
+    # Must be set before config is imported
+    os.environ["LOCAL_DB_PATH"] = db_path
+    os.environ["ADMIN_EMAILS"] = f"user{ADMIN_USER}@loadtest.local"  # for the status routes
+
+    from werkzeug.serving import make_server
+    import main  # noqa: F401
+    import config
+    import passwords
+    from config import app, db
+    from migrations import migrate
+
+    sync_endpoint = LocalSyncEndpoint(args.sync_latency_ms / 1000)
+    config.db_wrapper._connect = sync_endpoint
+    config.db_wrapper.sync_url = "http://local-stand-in"  # syncs are skipped without a remote
+    passwords.hasher.start()
+
+    sizes = {name: max(1, int(count * args.scale)) for name, count in BASE_SIZES.items()}
+    with app.app_context():
+        migrate()
+        engine = db.engine
+        existing = seeded_params(engine)
+        if existing is None:
+            started = time.perf_counter()
+            print(f"Seeding {sizes} into {db_path} ...")
+            seed(engine, sizes)
+            print(f"Seeded in {time.perf_counter() - started:.0f}s")
+        elif existing != dataset_params(sizes):
+            sys.exit(f"{db_path} holds a different dataset: {existing}")
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ctx = Context(app, sizes, server.port)
+
+    selected = endpoints()
+    if args.only:
+        wanted = {name.strip() for name in args.only.split(",")}
+        selected = [(name, build) for name, build in selected if name in wanted]
+
+    results = {}
+    print(f"{'endpoint':<26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>7}")
+    for name, build in selected:
+        result = run_endpoint(ctx, name, build, args.requests, args.concurrency)
+        results[name] = result
+        print(f"{name:<26} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['throughput_rps']:>8.1f} {result['errors']:>7}")
+
+    server.shutdown()
+    config.sync_worker.flush(timeout=30)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "dataset": dataset_params(sizes),
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "sync_latency_ms": args.sync_latency_ms,
+            "cpu_count": os.cpu_count(),
+            "python": sys.version.split()[0],
+        },
+        "sync": {"endpoint_syncs": sync_endpoint.syncs, "worker": config.sync_worker.status()},
+        "endpoints": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main_()
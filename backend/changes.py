@@ -0,0 +1,157 @@
+"""Change feed for incremental client sync.
+
+Triggers (migration 7) keep `change_log` holding, for each user, the
+latest change to every task, note, goal and habit they can see, under a
+monotonic sequence number. A client fetches the list routes once, takes
+`next_since` from GET /changes, and from then on asks only for what
+changed:
+
+    /changes?since=<next_since>&limit=500
+        -> {"changes": [...], "next_since": 1234, "has_more": false}
+
+Each change is an upsert carrying the row as the list routes serialize it
+(notes as GET /notes?view=summary does; GET /notes/<id> has the content),
+or a tombstone {"op": "delete"} once the entity is gone or no longer
+visible to the user. Both are resolved from current state when the feed is
+read, so a page only costs queries for the entities in it.
+
+`compact()` drops entries older than a retention period and raises the
+horizon; a `since` below it gets 410 Gone and the client refetches the lists.
+"""
+import time
+
+from sqlalchemy import func, select
+
+import serializers
+from config import db
+from models import Change, ChangeLogHorizon, Goal, Habit, IN_CHUNK_SIZE, Note, Task, user_goal, user_habit, \
+    user_task
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+DEFAULT_RETENTION_DAYS = 30
+
+
+class ChangesError(ValueError):
+    pass
+
+
+class ChangesGone(Exception):
+    """`since` is below the compaction horizon (or ahead of the log)"""
+
+    def __init__(self, message, horizon, latest):
+        super().__init__(message)
+        self.horizon = horizon
+        self.latest = latest
+
+
+def _visible_tasks(user_id, ids):
+    return Task.query.join(user_task, user_task.c.task_id == Task.id) \
+        .filter(user_task.c.user_id == user_id, Task.id.in_(ids))
+
+
+def _visible_goals(user_id, ids):
+    return Goal.query.join(user_goal, user_goal.c.goal_id == Goal.id) \
+        .filter(user_goal.c.user_id == user_id, Goal.id.in_(ids))
+
+
+def _visible_habits(user_id, ids):
+    return Habit.query.join(user_habit, user_habit.c.habit_id == Habit.id) \
+        .filter(user_habit.c.user_id == user_id, Habit.id.in_(ids))
+
+
+def _visible_notes(user_id, ids):
+    return Note.query.filter(Note.user_id == user_id, Note.id.in_(ids))
+
+
+# entity -> (rows of `ids` the user can currently see, serializer)
+ENTITIES = {
+    "task": (_visible_tasks, serializers.tasks),
+    "note": (_visible_notes, serializers.note_summaries),
+    "goal": (_visible_goals, serializers.goals),
+    "habit": (_visible_habits, serializers.habits),
+}
+
+
+def horizon():
+    return db.session.scalar(select(ChangeLogHorizon.horizon).where(ChangeLogHorizon.id == 1)) or 0
+
+
+def latest(floor):
+    """Highest sequence number handed out so far, or `floor` if none is above it"""
+    return max(floor, db.session.scalar(select(func.max(Change.seq))) or 0)
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ChangesError("Invalid limit. Limit must be a number.")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ChangesError(f"Invalid limit. Must be between 1 and {MAX_LIMIT}.")
+    return limit
+
+
+def changes_since(user_id, since, limit=DEFAULT_LIMIT):
+    """The user's changes after `since`, oldest first; without `since`, only the current position"""
+    floor = horizon()
+    if since is None:
+        return {"changes": [], "next_since": latest(floor), "has_more": False}
+    try:
+        since = int(since)
+    except ValueError:
+        raise ChangesError("Invalid since. Must be a sequence number from next_since.")
+    if since < floor:
+        raise ChangesGone("Changes before the horizon were compacted; refetch the collections.",
+                          floor, latest(floor))
+
+    rows = db.session.execute(
+        select(Change.seq, Change.entity, Change.entity_id)
+        .where(Change.user_id == user_id, Change.seq > since)
+        .order_by(Change.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        current = latest(floor)
+        if since > current:
+            raise ChangesGone("since is ahead of the change log; refetch the collections.", floor, current)
+        return {"changes": [], "next_since": since, "has_more": False}
+
+    ids_by_entity = {}
+    for row in rows:
+        ids_by_entity.setdefault(row.entity, []).append(row.entity_id)
+    data = {}
+    for entity, ids in ids_by_entity.items():
+        visible, serialize = ENTITIES[entity]
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            for item in serialize(visible(user_id, ids[start:start + IN_CHUNK_SIZE]).all()):
+                data[entity, item["id"]] = item
+
+    changes = []
+    for row in rows:
+        item = data.get((row.entity, row.entity_id))
+        change = {"seq": row.seq, "type": row.entity, "id": row.entity_id}
+        if item is None:
+            change["op"] = "delete"
+        else:
+            change["op"] = "upsert"
+            change["data"] = item
+        changes.append(change)
+    return {"changes": changes, "next_since": rows[-1].seq, "has_more": has_more}
+
+
+def compact(retention_days=DEFAULT_RETENTION_DAYS):
+    """Delete entries older than `retention_days` and raise the horizon past them; returns the new horizon"""
+    cutoff = int(time.time() - retention_days * 86400)
+    newest_old = db.session.scalar(select(func.max(Change.seq)).where(Change.changed_at < cutoff))
+    if newest_old is None:
+        return horizon()
+    db.session.execute(Change.__table__.delete().where(Change.seq <= newest_old))
+    state = db.session.get(ChangeLogHorizon, 1)
+    state.horizon = max(state.horizon, newest_old)
+    db.session.commit()
+    return state.horizon
@@ -0,0 +1,50 @@
+"""Transparent zlib compression for large text columns.
+
+SQLite lets any column hold any type, so a compressed value is stored as
+a BLOB in the same column a short one is stored in as TEXT. The
+`CompressedText` column type compresses on write above
+NOTE_COMPRESS_MIN_BYTES (when it saves space) and inflates BLOBs on read.
+Triggers that need the plaintext, like the full-text index on notes, call
+the SQL function `inflate(value)`, which `register(conn)` adds to every
+connection the app opens; TEXT values pass through it unchanged.
+"""
+import os
+import zlib
+
+from sqlalchemy.types import Text, TypeDecorator
+
+compress_min_bytes = int(os.getenv("NOTE_COMPRESS_MIN_BYTES", "1024"))
+compress_level = int(os.getenv("NOTE_COMPRESS_LEVEL", "6"))
+
+
+def compress(text, min_bytes=compress_min_bytes):
+    """zlib bytes for long `text`, or `text` itself if it is short or doesn't shrink"""
+    if text is None:
+        return None
+    encoded = text.encode("utf-8")
+    if len(encoded) < min_bytes:
+        return text
+    packed = zlib.compress(encoded, compress_level)
+    return packed if len(packed) < len(encoded) else text
+
+
+def inflate(value):
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def register(conn):
+    """Add inflate() to a sqlite3 connection"""
+    conn.create_function("inflate", 1, inflate, deterministic=True)
+
+
+class CompressedText(TypeDecorator):
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        return inflate(value)
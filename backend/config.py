@@ -8,87 +8,347 @@ import sqlite3
 from sqlalchemy.pool import StaticPool
 from flask_jwt_extended import JWTManager
 from datetime import timedelta
+from sqlalchemy import event
 import threading
+import atexit
+import time
+import multiprocessing
 
 load_dotenv()
 
+import metrics  # noqa: E402  (reads METRICS_ENABLED, which may come from .env)
+import slow_queries  # noqa: E402
+import compression  # noqa: E402
+
 app = Flask(__name__)
-CORS(app, origins=[
+cors_origins = [
     "http://localhost:3000",  # React dev server
     "http://localhost:5173"   # Vite dev server
-])
+]
+CORS(app, origins=cors_origins)
 
 # Turso configuration
 url = os.getenv("DB_LINK")
 auth_token = os.getenv("DB_AUTH_TOKEN")
-local_db_path = "local.db"
+local_db_path = os.getenv("LOCAL_DB_PATH", "local.db")
+
+# Background sync configuration
+sync_interval = float(os.getenv("TURSO_SYNC_INTERVAL", "1.0"))  # seconds between coalesced syncs
+sync_batch_size = int(os.getenv("TURSO_SYNC_BATCH_SIZE", "100"))  # dirty commits that force an early sync
+sync_wait_timeout = float(os.getenv("TURSO_SYNC_WAIT_TIMEOUT", "10"))  # max wait for durable writes
+ready_max_sync_lag = float(os.getenv("READY_MAX_SYNC_LAG", "30"))  # /readyz fails once unsynced writes are older
+# Users allowed on the operational routes (status, metrics, /debug/*); comma-separated
+admin_emails = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Connection pool configuration
+db_pool_mode = os.getenv("DB_POOL_MODE", "queue")  # "queue" (pooled) or "static" (one shared connection)
+db_pool_size = int(os.getenv("DB_POOL_SIZE", "8"))
+db_pool_overflow = int(os.getenv("DB_POOL_OVERFLOW", "8"))
+busy_timeout_ms = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+
+# Applied to every new connection; WAL lets readers run alongside the single writer
+sqlite_pragmas = {
+    "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.getenv("DB_CACHE_SIZE_KB", "20000")) * -1,  # negative = KiB
+    "mmap_size": int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+    "busy_timeout": busy_timeout_ms,
+}
 
 class LibSQLWrapper:
-    def __init__(self):
+    """Connections to the local replica, plus syncs between it and Turso.
+
+    Nothing talks to Turso on construction: `start_initial_sync()` pulls
+    on a background thread, retrying with backoff, so the app serves from
+    the local replica straight away. Without DB_LINK the replica is
+    local-only and syncs are skipped.
+    """
+
+    max_initial_sync_backoff = 60.0
+
+    def __init__(self, connect=libsql.connect):
         self.local_db_path = local_db_path
         self.sync_url = url
         self.auth_token = auth_token
+        # Swappable so a local stand-in can replace the Turso endpoint
+        self._connect = connect
         self._lock = threading.Lock()
-        self._setup_local_db()
-    
-    def _setup_local_db(self):
-        """Initialize local database and sync from Turso"""
-        try:
-            # Create connection to Turso for syncing
-            turso_conn = libsql.connect(
-                database=self.local_db_path,
-                sync_url=self.sync_url,
-                auth_token=self.auth_token
-            )
-            
-            # Initial sync to get latest data
-            turso_conn.sync()
-            turso_conn.close()
-            
-            print("Initial sync completed successfully")
-            
-        except Exception as e:
-            print(f"Setup error: {e}")
-            # Create local db if sync fails
-            conn = sqlite3.connect(self.local_db_path)
-            conn.close()
-    
+        self._initial_sync_thread = None
+        self.initial_synced = threading.Event()
+        self.initial_sync_attempts = 0
+        self.initial_sync_duration = None  # seconds from start to the first successful pull
+        self.last_sync_error = None
+        self.last_synced_at = None
+
+    def start_initial_sync(self):
+        """Pull from Turso on a background thread until it succeeds once"""
+        if not self.sync_url:
+            self.initial_synced.set()
+            return
+        if self._initial_sync_thread is None:
+            self._initial_sync_thread = threading.Thread(target=self._initial_sync, name="turso-initial-sync",
+                                                         daemon=True)
+            self._initial_sync_thread.start()
+
+    def _initial_sync(self):
+        started = time.monotonic()
+        backoff = 1.0
+        while True:
+            self.initial_sync_attempts += 1
+            if self.sync_to_turso():
+                self.initial_sync_duration = time.monotonic() - started
+                self.initial_synced.set()
+                print(f"Initial sync completed in {self.initial_sync_duration:.2f}s")
+                return
+            print(f"Initial sync failed, retrying in {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(self.max_initial_sync_backoff, backoff * 2)
+
+    def status(self):
+        return {
+            "remote": bool(self.sync_url),
+            "initial_synced": self.initial_synced.is_set(),
+            "initial_sync_attempts": self.initial_sync_attempts,
+            "initial_sync_duration": self.initial_sync_duration,
+            "last_synced_at": self.last_synced_at,
+            "last_error": self.last_sync_error,
+        }
+
     def sync_to_turso(self):
         """Sync local changes to Turso"""
+        if not self.sync_url:
+            return True  # local-only replica, nothing to sync with
         with self._lock:
+            started = time.perf_counter()
             try:
-                turso_conn = libsql.connect(
+                turso_conn = self._connect(
                     database=self.local_db_path,
                     sync_url=self.sync_url,
                     auth_token=self.auth_token
                 )
                 turso_conn.sync()
                 turso_conn.close()
+                metrics.sync_duration.observe(time.perf_counter() - started, "ok")
+                self.last_synced_at = time.time()
+                self.last_sync_error = None
                 print("Sync to Turso completed")
                 return True
             except Exception as e:
+                metrics.sync_duration.observe(time.perf_counter() - started, "error")
+                metrics.sync_failures.inc()
+                self.last_sync_error = str(e)
                 print(f"Sync error: {e}")
                 return False
     
     def __call__(self):
         """Return a new SQLite connection for SQLAlchemy"""
-        return sqlite3.connect(
+        conn = sqlite3.connect(
             self.local_db_path,
             check_same_thread=False,
-            timeout=30
+            timeout=busy_timeout_ms / 1000,
+            factory=metrics.connection_factory  # times statements for /metrics and the slow-query log
         )
+        for name, value in sqlite_pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        compression.register(conn)  # the notes full-text triggers call inflate()
+        return conn
+
+
+def engine_options(creator, mode=db_pool_mode):
+    """SQLAlchemy engine options for the given pool mode"""
+    if mode == "static":
+        return {
+            'creator': creator,
+            'poolclass': StaticPool,
+            'connect_args': {'check_same_thread': False}
+        }
+    return {
+        'creator': creator,
+        'poolclass': metrics.TimedQueuePool,
+        'pool_size': db_pool_size,
+        'max_overflow': db_pool_overflow,
+        'pool_timeout': 30,
+    }
+
+
+def configure_engine(engine):
+    """Attach per-checkout connection setup to an engine"""
+    @event.listens_for(engine, "checkout")
+    def _set_busy_timeout(dbapi_conn, connection_record, connection_proxy):
+        # Pooled connections may have been touched by other code; reassert the wait
+        dbapi_conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+
+
+class SyncWorker:
+    """Coalesces commits into periodic background syncs to Turso.
+
+    Commits only mark the replica dirty; a single worker thread runs one
+    sync per `interval` seconds, or sooner once `batch_size` commits are
+    pending or a caller asks to flush.
+    """
+
+    max_backoff = 60.0
+
+    def __init__(self, sync, interval=1.0, batch_size=100):
+        self._sync = sync
+        self.interval = interval
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_requested = False
+        self._generation = 0         # bumped by every mark_dirty()
+        self._synced_generation = 0  # highest generation known to be in Turso
+        self._pending = 0            # dirty marks not yet handed to a sync
+        self._dirty_since = None     # monotonic time of oldest pending mark
+        self._inflight_since = None  # oldest mark covered by the running sync
+        self._retry_at = 0.0
+        self._backoff = 0.0
+        self.syncs = 0
+        self.failures = 0
+        self.last_sync_at = None
+        self.last_sync_duration = None
+
+    def mark_dirty(self):
+        """Record a local commit and return its generation number"""
+        with self._cond:
+            self._generation += 1
+            self._pending += 1
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            self._ensure_started()
+            if self._pending == 1 or self._pending >= self.batch_size:
+                self._cond.notify_all()
+            return self._generation
+
+    def wait_for(self, generation, timeout=None):
+        """Block until `generation` has been synced; False on timeout"""
+        with self._cond:
+            if self._synced_generation >= generation:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._synced_generation >= generation, timeout)
 
-# Initialize the wrapper
+    @property
+    def generation(self):
+        """Generation of the latest commit marked dirty"""
+        with self._cond:
+            return self._generation
+
+    def flush(self, timeout=None):
+        """Sync everything committed so far, without waiting for the interval"""
+        return self.wait_for(self.generation, timeout)
+
+    def lag(self):
+        """Seconds since the oldest commit that has not reached Turso yet"""
+        with self._cond:
+            oldest = min((t for t in (self._dirty_since, self._inflight_since) if t is not None), default=None)
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def status(self):
+        with self._cond:
+            pending = self._generation - self._synced_generation
+        return {
+            "pending_commits": pending,
+            "lag_seconds": round(self.lag(), 3),
+            "syncs": self.syncs,
+            "failures": self.failures,
+            "last_sync_at": self.last_sync_at,
+            "last_sync_duration": self.last_sync_duration,
+        }
+
+    def stop(self, timeout=None):
+        """Flush pending commits once and stop the worker thread"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(target=self._run, name="turso-sync", daemon=True)
+            self._thread.start()
+
+    def _seconds_until_due(self):
+        if self._pending == 0:
+            return None
+        if self._stopping:
+            return 0.0
+        now = time.monotonic()
+        retry_in = self._retry_at - now
+        if self._flush_requested or self._pending >= self.batch_size:
+            return max(0.0, retry_in)
+        return max(0.0, self._dirty_since + self.interval - now, retry_in)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    due = self._seconds_until_due()
+                    if due == 0.0:
+                        break
+                    if due is None and self._stopping:
+                        return
+                    self._cond.wait(due)
+                target = self._generation
+                covered = self._pending
+                self._pending = 0
+                self._flush_requested = False
+                self._inflight_since, self._dirty_since = self._dirty_since, None
+                stopping = self._stopping
+
+            started = time.monotonic()
+            try:
+                ok = bool(self._sync())
+            except Exception as e:
+                print(f"Background sync failed: {e}")
+                ok = False
+            finished = time.monotonic()
+
+            with self._cond:
+                self.last_sync_duration = finished - started
+                if ok:
+                    self.syncs += 1
+                    self.last_sync_at = time.time()
+                    self._synced_generation = max(self._synced_generation, target)
+                    self._backoff = 0.0
+                else:
+                    # Put the commits back so the next round retries them
+                    self.failures += 1
+                    self._pending += covered
+                    if self._dirty_since is None or self._inflight_since < self._dirty_since:
+                        self._dirty_since = self._inflight_since
+                    self._backoff = min(self.max_backoff, max(self.interval, self._backoff * 2))
+                    self._retry_at = finished + self._backoff
+                self._inflight_since = None
+                self._cond.notify_all()
+                if stopping:
+                    return
+
+
+# Slow-query log; installed before the first pooled connection is opened
+slow_query_log = slow_queries.SlowQueryLog(
+    log_path=slow_queries.slow_query_log if slow_queries.slow_query_log is not None
+    else os.path.join(os.path.dirname(local_db_path), "slow_queries.log")
+)
+slow_query_log.install()
+
+# Initialize the wrapper; the first pull from Turso runs in the background.
+# Worker processes (passwords.py's pool) import the app too, but must not pull.
 db_wrapper = LibSQLWrapper()
+if multiprocessing.parent_process() is None:
+    db_wrapper.start_initial_sync()
+sync_worker = SyncWorker(db_wrapper.sync_to_turso, interval=sync_interval, batch_size=sync_batch_size)
+atexit.register(sync_worker.stop)
 
 # Flask configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{local_db_path}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'creator': db_wrapper,
-    'poolclass': StaticPool,
-    'connect_args': {'check_same_thread': False}
-}
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_wrapper)
 
 # JWT configuration
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', '103ewihbjfrje')  # Use env var
@@ -98,11 +358,43 @@ app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=7)
 jwt = JWTManager(app)
 db = SQLAlchemy(app)
 
-def sync_after_commit():
-    """Call this after important database operations"""
-    try:
-        db_wrapper.sync_to_turso()
-    except Exception as e:
-        print(f"Post-commit sync failed: {e}")
+with app.app_context():
+    configure_engine(db.engine)
+
+
+@event.listens_for(db.session, "after_flush")
+def _note_pending_writes(session, flush_context):
+    session.info["needs_sync"] = True
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _note_statement_writes(orm_execute_state):
+    # Core INSERT/UPDATE/DELETE through session.execute() never flushes
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["needs_sync"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def _mark_replica_dirty(session):
+    # Only commits that actually wrote something need to reach Turso
+    if session.info.pop("needs_sync", False):
+        sync_worker.mark_dirty()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_pending_writes(session):
+    session.info.pop("needs_sync", None)
+
+
+def sync_after_commit(wait=False):
+    """Call this after important database operations.
+
+    Commits are already queued for the background sync worker by the
+    after_commit hook; pass wait=True to block until the write has reached
+    Turso. Returns whether it did, or None when not waiting.
+    """
+    if not wait:
+        return None
+    return sync_worker.wait_for(sync_worker.generation, timeout=sync_wait_timeout)
 
 # Example usage in your routes:
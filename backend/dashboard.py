@@ -0,0 +1,92 @@
+"""Dashboard aggregates from per-user counter rows.
+
+`dashboard_counters` holds, per user, how many of their tasks, goals and
+habits have each status, category or period. Triggers (migration 8)
+adjust the counts in the same transaction as every write to the entity
+and link tables, batch routes included. The summary is one indexed read
+of the user's counter rows plus the overdue count, which depends on the
+clock and so is queried each time.
+
+If the counters ever drift (e.g. after editing the database by hand),
+`flask --app main repair-dashboard` recomputes them with GROUP BY.
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from config import db
+from models import GoalPeriod, GoalStatus, HabitStatus, TaskCategory, TaskStatus
+
+# metric -> (entity table, link table, link column, counted column)
+METRICS = {
+    "task_status": ("tasks", "user_task", "task_id", "status"),
+    "task_category": ("tasks", "user_task", "task_id", "category"),
+    "goal_status": ("goals", "user_goal", "goal_id", "status"),
+    "goal_period": ("goals", "user_goal", "goal_id", "period"),
+    "habit_status": ("habits", "user_habit", "habit_id", "status"),
+}
+
+# Tasks still open once their due date has passed
+OPEN_TASK_STATUSES = (TaskStatus.PENDING.value, TaskStatus.IN_PROGRESS.value)
+
+_SUMMARY = text(
+    "SELECT metric, key, count FROM dashboard_counters WHERE user_id = :user_id AND count != 0 "
+    "UNION ALL "
+    "SELECT 'task_overdue', '', count(*) FROM user_task JOIN tasks ON tasks.id = user_task.task_id "
+    "WHERE user_task.user_id = :user_id AND tasks.date_due < :now "
+    "AND (tasks.status IS NULL OR tasks.status IN (:open_1, :open_2))"
+)
+
+
+def _breakdown(counts, enum, by_name=False):
+    """Counts for every enum value (goals store enum names, tasks and habits values)"""
+    result = {member.value: counts.pop(member.name if by_name else member.value, 0) for member in enum}
+    unset = counts.pop("", 0)
+    if unset:
+        result["unset"] = unset
+    result.update(counts)  # values outside the enum, if any were written directly
+    return result
+
+
+def summary(user_id):
+    rows = db.session.execute(_SUMMARY, {
+        "user_id": user_id, "now": datetime.utcnow(),
+        "open_1": OPEN_TASK_STATUSES[0], "open_2": OPEN_TASK_STATUSES[1],
+    })
+    counts = {metric: {} for metric in METRICS}
+    overdue = 0
+    for metric, key, count in rows:
+        if metric == "task_overdue":
+            overdue = count
+        else:
+            counts[metric][key] = count
+
+    return {
+        "tasks": {
+            "total": sum(counts["task_status"].values()),
+            "overdue": overdue,
+            "byStatus": _breakdown(counts["task_status"], TaskStatus),
+            "byCategory": _breakdown(counts["task_category"], TaskCategory),
+        },
+        "goals": {
+            "total": sum(counts["goal_status"].values()),
+            "byStatus": _breakdown(counts["goal_status"], GoalStatus, by_name=True),
+            "byPeriod": _breakdown(counts["goal_period"], GoalPeriod, by_name=True),
+        },
+        "habits": {
+            "total": sum(counts["habit_status"].values()),
+            "byStatus": _breakdown(counts["habit_status"], HabitStatus),
+        },
+    }
+
+
+def repair(conn):
+    """Recompute every user's counters from the entity tables in one GROUP BY pass"""
+    conn.exec_driver_sql("DELETE FROM dashboard_counters")
+    conn.exec_driver_sql(
+        "INSERT INTO dashboard_counters (user_id, metric, key, count) " + " UNION ALL ".join(
+            f"SELECT {link}.user_id, '{metric}', coalesce({table}.{column}, ''), count(*) "
+            f"FROM {link} JOIN {table} ON {table}.id = {link}.{link_column} GROUP BY 1, 3"
+            for metric, (table, link, link_column, column) in METRICS.items()
+        )
+    )
@@ -0,0 +1,128 @@
+"""Note folders: a per-user tree with a closure table for subtree queries.
+
+`folder_paths` holds one row per (ancestor, descendant) pair, each folder
+being its own ancestor at depth 0. Triggers on `folders` (migration 11)
+keep it current on insert, move and delete, and refuse moves that would
+create a cycle. That makes the questions the notes sidebar asks single
+indexed queries whatever the depth of the tree:
+
+    notes under a folder, recursively  notes.folder_id IN (descendants)
+    note counts per folder, recursive  one GROUP BY over notes JOIN folder_paths
+    breadcrumbs                        ancestors ORDER BY depth DESC
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, func, select, update
+
+from config import db
+from models import Folder, FolderPath, IN_CHUNK_SIZE, Note
+
+# Longest folder name accepted; the column is String(200)
+MAX_NAME_LENGTH = 200
+
+
+class FolderError(ValueError):
+    pass
+
+
+class FolderNotFound(LookupError):
+    pass
+
+
+def owned(user_id, folder_id):
+    """The user's folder with this id, or None"""
+    folder = db.session.get(Folder, folder_id)
+    if folder is None or folder.user_id != user_id:
+        return None
+    return folder
+
+
+def parse_folder_id(user_id, value):
+    """A folder id from a request (None or '' for the top level); raises unless the user owns it"""
+    if value is None or value == "":
+        return None
+    try:
+        folder_id = int(value)
+    except (TypeError, ValueError):
+        raise FolderError("Invalid folder ID. Folder ID must be a number.")
+    if owned(user_id, folder_id) is None:
+        raise FolderNotFound("Folder not found.")
+    return folder_id
+
+
+def owned_ids(user_id, folder_ids):
+    """The subset of `folder_ids` that are the user's folders"""
+    owned = set()
+    folder_ids = list(folder_ids)
+    for start in range(0, len(folder_ids), IN_CHUNK_SIZE):
+        chunk = folder_ids[start:start + IN_CHUNK_SIZE]
+        owned.update(db.session.scalars(select(Folder.id).where(Folder.user_id == user_id, Folder.id.in_(chunk))))
+    return owned
+
+
+def parse_name(value):
+    name = value.strip() if isinstance(value, str) else ""
+    if not name:
+        raise FolderError("Please provide a name for the folder.")
+    if len(name) > MAX_NAME_LENGTH:
+        raise FolderError(f"Folder name must be at most {MAX_NAME_LENGTH} characters.")
+    return name
+
+
+def subtree_ids(folder_id):
+    """SELECT of the folder's id and every folder below it"""
+    return select(FolderPath.descendant_id).where(FolderPath.ancestor_id == folder_id)
+
+
+def ancestors(folder_id):
+    """The folder's ancestors from the top level down, the folder itself last"""
+    return db.session.scalars(
+        select(Folder).join(FolderPath, FolderPath.ancestor_id == Folder.id)
+        .where(FolderPath.descendant_id == folder_id)
+        .order_by(FolderPath.depth.desc())
+    ).all()
+
+
+def note_counts(user_id, folder_id=None):
+    """{folder id: (notes directly in it, notes in its whole subtree)} for the user's folders, or one folder"""
+    direct = select(Note.folder_id, func.count()).where(Note.user_id == user_id, Note.folder_id.is_not(None))
+    total = select(FolderPath.ancestor_id, func.count()) \
+        .join(Note, Note.folder_id == FolderPath.descendant_id).where(Note.user_id == user_id)
+    if folder_id is not None:
+        direct = direct.where(Note.folder_id == folder_id)
+        total = total.where(FolderPath.ancestor_id == folder_id)
+    direct = dict(db.session.execute(direct.group_by(Note.folder_id)).all())
+    total = dict(db.session.execute(total.group_by(FolderPath.ancestor_id)).all())
+    return {key: (direct.get(key, 0), total[key]) for key in total}
+
+
+def create(user_id, name, parent_id):
+    folder = Folder(name=name, parent_id=parent_id, user_id=user_id, date_created=datetime.utcnow())
+    db.session.add(folder)
+    db.session.flush()
+    return folder
+
+
+def move(folder, parent_id):
+    """Re-parent the folder and its subtree; the closure rows are rewritten by trigger"""
+    if parent_id is not None and db.session.scalar(
+            select(FolderPath.depth).where(FolderPath.ancestor_id == folder.id,
+                                           FolderPath.descendant_id == parent_id)) is not None:
+        raise FolderError("A folder cannot move into its own subtree.")
+    folder.parent_id = parent_id
+
+
+def remove(folder):
+    """Delete the folder and everything below it; their notes move to the folder's parent.
+
+    Returns the number of notes moved.
+    """
+    moved = db.session.execute(
+        update(Note).where(Note.user_id == folder.user_id, Note.folder_id.in_(subtree_ids(folder.id)))
+        .values(folder_id=folder.parent_id),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    # SQLite collects the rows to delete before the triggers remove their paths
+    db.session.execute(delete(Folder).where(Folder.id.in_(subtree_ids(folder.id))),
+                       execution_options={"synchronize_session": False})
+    return moved
@@ -1,8 +1,24 @@
 from flask import request, jsonify, Response
-from config import app, db, sync_after_commit
+from config import app, db, sync_after_commit, sync_worker, slow_query_log, db_wrapper, ready_max_sync_lag, \
+    admin_emails
 from models import User, Task, TaskStatus, Note, Goal, Habit, GoalStatus, GoalPeriod, HabitStatus, \
-    HabitDays
-import bcrypt
+    HabitDays, Folder, days_to_mask, masks_with_any, user_task, user_goal, user_habit
+from pagination import list_response
+from migrations import migrate, schema_is_current
+import batch
+import user_cache
+import versions
+import search
+import changes
+import autosave
+import dashboard
+import folders
+import token_store
+import serializers
+import metrics
+from user_cache import get_user
+import passwords
+from passwords import hash_password, check_password, needs_rehash, HashingBusy
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
@@ -10,10 +26,51 @@ from flask_jwt_extended import (
     get_jwt_identity,
     get_jwt
 )
-from datetime import timedelta
+from datetime import timedelta, datetime, date, time, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+import operator
+from functools import wraps
+import os
+import click
 from dateutil.parser import parse 
 from config import sync_after_commit
 
+# jsonify and request.get_json go through orjson, see serializers.py
+app.json = serializers.JSONProvider(app)
+metrics.install(app)
+
+# Sort keys accepted by `?sort=` on collection routes, see pagination.py
+TASK_SORT_KEYS = {"id": Task.id, "title": Task.title, "dateDue": Task.date_due, "dateAssigned": Task.date_assigned}
+NOTE_SORT_KEYS = {"id": Note.id, "title": Note.title, "dateCreated": Note.date_created, "dateUpdated": Note.date_updated}
+GOAL_SORT_KEYS = {"id": Goal.id, "title": Goal.title}
+HABIT_SORT_KEYS = {"id": Habit.id, "title": Habit.title}
+FOLDER_SORT_KEYS = {"id": Folder.id, "name": Folder.name}
+
+
+def wants_durable_write():
+    """Clients opt in to waiting for Turso with `X-Wait-For-Sync: true`"""
+    return request.headers.get("X-Wait-For-Sync", "").lower() in ("1", "true", "yes")
+
+
+def with_sync_header(response, synced):
+    if synced is not None:
+        response.headers["X-Sync-Status"] = "synced" if synced else "pending"
+    return response
+
+
+def admin_required(fn):
+    """For operational routes: a valid access token of a user listed in ADMIN_EMAILS"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = get_user(get_jwt_identity())
+        if not user or user.email.lower() not in admin_emails:
+            return jsonify({"error": "Admin access required."}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
 
 # персоналізована сторінка?
 @app.route("/", methods=["GET"])
@@ -29,7 +86,7 @@ def enter_homepage():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
@@ -51,12 +108,10 @@ def create_user():
         if User.query.filter_by(email=data["email"]).first():
             return jsonify({"error": "User already exists"}), 409
 
-        hashed_password = bcrypt.hashpw(data["password"].encode('utf-8'), bcrypt.gensalt())
-
         user = User(
             name=data["name"],
             email=data["email"],
-            password=hashed_password.decode('utf-8'),
+            password=hash_password(data["password"]),
             phone_number=data.get("phoneNumber"),
             location=data.get("location")
         )
@@ -68,20 +123,18 @@ def create_user():
         access_token = create_access_token(identity=str(user.id))
         refresh_token = create_refresh_token(identity=str(user.id))  # Fixed: use create_refresh_token
 
-        try:
-            wrapper = app.config['SQLALCHEMY_ENGINE_OPTIONS']['creator']
-            wrapper.sync()
-        except Exception as e:
-            print(f"Sync failed but user created locally: {e}")
+        synced = sync_after_commit(wait=wants_durable_write())
 
         db.session.refresh(user)
         
-        return jsonify({
+        return with_sync_header(jsonify({
             "access_token": access_token,
             "refresh_token": refresh_token,
-            "user": user.to_json()
-        }), 201
+            "user": serializers.user(user)
+        }), synced), 201
 
+    except HashingBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -102,9 +155,20 @@ def login():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    if not bcrypt.checkpw(password.encode('utf-8'), user.password.encode('utf-8')):
+    if not check_password(password, user.password):
         return jsonify({"error": "Invalid password"}), 401
 
+    # Upgrade hashes made with an older cost factor while we have the plaintext;
+    # if the pool is saturated, the upgrade waits for a later login
+    if needs_rehash(user.password):
+        try:
+            user.password = hash_password(password)
+        except HashingBusy:
+            pass
+        else:
+            db.session.commit()
+            user_cache.invalidate(user.id)
+
     access_token = create_access_token(
         identity=str(user.id),
         expires_delta=timedelta(minutes=30)  
@@ -115,13 +179,10 @@ def login():
         expires_delta=timedelta(days=7)
     )
 
-    # Store refresh token in database (for logout functionality)
-    user.refresh_token = refresh_token
-    db.session.commit()
     return jsonify({
         "access_token": access_token,
         "refresh_token": refresh_token,
-        "user": user.to_json()
+        "user": serializers.user(user)
     }), 200
 
 
@@ -130,7 +191,7 @@ def login():
 def validate_token():
     try:
         current_user = get_jwt_identity()
-        user = User.query.get(current_user)
+        user = get_user(current_user)
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -148,7 +209,7 @@ def get_user_by_email(email):
     user = User.query.filter_by(email=email).first()
     if not user:
         return jsonify({"error": "User not found."}), 404
-    return jsonify(user.to_json()), 200
+    return jsonify(serializers.user(user)), 200
 
 @app.route("/users/<int:user_id>", methods=["PUT"])  
 @jwt_required()
@@ -159,7 +220,7 @@ def update_user(user_id):
     if str(current_user_id) != str(user_id):
         return jsonify({"error": "Unauthorized"}), 403
     
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
@@ -179,8 +240,7 @@ def update_user(user_id):
 
     password = data.get("password")
     if password:
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        user.password = hashed_password.decode('utf-8')
+        user.password = hash_password(password)
 
     phone_number = data.get("phoneNumber")
     if phone_number:
@@ -191,29 +251,32 @@ def update_user(user_id):
         user.location = location
 
     db.session.commit()
+    user_cache.invalidate(user.id)
 
-    return jsonify(user.to_json()), 200
+    return jsonify(serializers.user(user)), 200
 
 @app.route('/logout', methods=['DELETE'])
 @jwt_required(refresh=True)  
 def logout():
     user_id = get_jwt_identity()
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
-    
-    user.refresh_token = None
-    db.session.commit()
-    
-    return jsonify({"message": "Successfully logged out"}), 200
+
+    # Revoke this refresh token; /refresh and /logout reject it from now on
+    claims = get_jwt()
+    token_store.store.revoke(claims["jti"], user.id, claims["exp"])
+    synced = sync_after_commit(wait=wants_durable_write())
+
+    return with_sync_header(jsonify({"message": "Successfully logged out"}), synced), 200
 
 @app.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)  
 def refresh():
     current_user = get_jwt_identity()
     
-    user = User.query.get(current_user)
+    user = get_user(current_user)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
@@ -227,31 +290,23 @@ def refresh():
 # --------------------------------------------Note--------------------------------------------
 
 
-@app.route("/notes", methods=["PUT"])
-@jwt_required()
-def update_note():
-    data = request.json
+def wants_note_summaries(args=None):
+    """`?view=summary` on GET /notes, see serializers.NOTE_SUMMARY"""
+    return (request.args if args is None else args).get("view") == "summary"
 
-    note_id = data.get("note_id")
-    if not note_id:
-        return jsonify({"error": "Note ID is required."}), 400
-
-    try:
-        note_id = int(note_id)
-    except ValueError:
-        return jsonify({"error": "Invalid Note ID. Note ID must be a number."}), 400
 
-    note = Note.query.get(note_id)
-    if not note:
-        return jsonify({"error": "Note not found."}), 404
+def wants_autosave():
+    """Editors send `X-Autosave: true` for saves that may be buffered, see autosave.py"""
+    return autosave.buffer.enabled and request.headers.get("X-Autosave", "").lower() in ("1", "true", "yes")
 
-    title = data.get("title")
-    if title:
-        note.title = title
 
-    content = data.get("content")
-    if content:
-        note.content = content
+def note_changes(data, user_id):
+    """Note attributes a PUT body sets; raises folders.FolderError or FolderNotFound"""
+    changes = {}
+    if data.get("title"):
+        changes["title"] = data["title"]
+    if data.get("content"):
+        changes["content"] = data["content"]
 
     def parse_date(date_str):
         if not date_str:
@@ -260,20 +315,54 @@ def update_note():
             return parse(date_str)
         except (ValueError, TypeError):
             return None
-        
-    date_created = parse_date(data.get("dateCreated"))
-    date_updated = parse_date(data.get("dateUpdated"))
-    folder_id = data.get("folderId")
-    if folder_id is not None:  # Check if folder_id is provided
-        note.folder_id = int(folder_id) if folder_id else None
-    if date_created:
-        note.date_created = date_created
-    if date_updated:
-        note.date_updated = date_updated
 
-    db.session.commit()
+    for key, attr in (("dateCreated", "date_created"), ("dateUpdated", "date_updated")):
+        value = parse_date(data.get(key))
+        if value:
+            changes[attr] = value
+    if data.get("folderId") is not None:
+        changes["folder_id"] = folders.parse_folder_id(user_id, data["folderId"])
+    return changes
+
+
+def save_note(note_id, data):
+    """Shared by both PUT note routes: buffer an autosave (202), or write the change now (200)"""
+    user_id = db.session.scalar(select(Note.user_id).where(Note.id == note_id))
+    if user_id is None:
+        return jsonify({"error": "Note not found."}), 404
+
+    try:
+        changes = note_changes(data, user_id)
+    except folders.FolderError as e:
+        return jsonify({"error": str(e)}), 400
+    except folders.FolderNotFound as e:
+        return jsonify({"error": str(e)}), 404
+
+    if wants_autosave():
+        if changes:
+            autosave.buffer.put(note_id, user_id, changes)
+        return jsonify({"id": note_id, "buffered": True}), 202
+
+    autosave.buffer.save(note_id, user_id, changes)
+    note = db.session.get(Note, note_id, options=[undefer(Note.content)])
+    return jsonify(serializers.note(note)), 200
+
+
+@app.route("/notes", methods=["PUT"])
+@jwt_required()
+def update_note():
+    data = request.json
+
+    note_id = data.get("note_id")
+    if not note_id:
+        return jsonify({"error": "Note ID is required."}), 400
+
+    try:
+        note_id = int(note_id)
+    except ValueError:
+        return jsonify({"error": "Invalid Note ID. Note ID must be a number."}), 400
 
-    return jsonify(note.to_json()), 200
+    return save_note(note_id, data)
 
 
 @app.route("/notes", methods=["GET"])
@@ -289,21 +378,47 @@ def get_user_notes():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
-    notes = user.notes
-    return jsonify([note.to_json() for note in notes]), 200
+    notes = Note.query.filter(Note.user_id == user_id)
+    # ?folder=<id>[&recursive=1] narrows to one folder (or its subtree); ?folder= to notes in no folder
+    folder = request.args.get("folder")
+    if folder is not None:
+        try:
+            folder_id = folders.parse_folder_id(user_id, folder)
+        except folders.FolderError as e:
+            return jsonify({"error": str(e)}), 400
+        except folders.FolderNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        if folder_id is None:
+            notes = notes.filter(Note.folder_id.is_(None))
+        elif request.args.get("recursive", "").lower() in ("1", "true", "yes"):
+            notes = notes.filter(Note.folder_id.in_(folders.subtree_ids(folder_id)))
+        else:
+            notes = notes.filter(Note.folder_id == folder_id)
+    # Full notes by default; ?view=summary swaps content for the snippet and leaves it unread
+    if wants_note_summaries():
+        serialize = serializers.note_summaries
+    else:
+        notes, serialize = notes.options(undefer(Note.content)), serializers.notes
+    return versions.conditional(user_id, versions.NOTES,
+                                lambda: list_response(notes, Note, serialize, NOTE_SORT_KEYS))
 
 @app.route("/notes/<int:note_id>", methods=["GET"])
 @jwt_required()
 def get_note(note_id):
-    note = Note.query.get(note_id)
+    note = db.session.get(Note, note_id, options=[undefer(Note.content)])
     if not note:
         return jsonify({"error": "Note not found."}), 404
 
-    return jsonify(note.to_json()), 200
+    data = serializers.note(note)
+    # Autosaves not flushed yet: the editor reads back what it wrote
+    pending = autosave.buffer.pending(note_id)
+    if pending:
+        data.update(pending)
+    return jsonify(data), 200
 
 @app.route("/notes", methods=["POST"])
 @jwt_required()
@@ -320,7 +435,7 @@ def create_note():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
         
@@ -337,22 +452,28 @@ def create_note():
         
     date_created = parse_date(data.get("dateCreated"))
     date_updated = parse_date(data.get("dateUpdated"))
-    folder_id = data.get("folderId") 
+    try:
+        folder_id = folders.parse_folder_id(user.id, data.get("folderId"))
+    except folders.FolderError as e:
+        return jsonify({"error": str(e)}), 400
+    except folders.FolderNotFound as e:
+        return jsonify({"error": str(e)}), 404
 
     note = Note(
         title=title,
-        content=content,
         date_created=date_created,
         date_updated=date_updated,
         folder_id=folder_id
     )
+    note.set_content(content)
 
     user.notes.append(note)  
 
     db.session.add(note)
+    versions.bump(versions.NOTES, [user.id])
     db.session.commit()
 
-    return jsonify(note.to_json()), 201
+    return jsonify(serializers.note(note)), 201
 
 @app.route("/notes/<int:note_id>", methods=["DELETE"])
 @jwt_required()
@@ -361,50 +482,121 @@ def delete_note(note_id):
     if not note:
         return jsonify({"error": "Note not found."}), 404
 
-    db.session.delete(note)
-    db.session.commit()
+    versions.bump(versions.NOTES, [note.user_id])
+    with autosave.buffer.overwriting({note_id: None}):  # a later flush must not write to it
+        db.session.delete(note)
+        db.session.commit()
     return jsonify({"message": "Note deleted successfully."}), 200
 
 @app.route("/notes/<int:note_id>", methods=["PUT"])
 @jwt_required()
 def update_note_by_id(note_id):
-    note = Note.query.get(note_id)
-    if not note:
-        return jsonify({"error": "Note not found."}), 404
+    return save_note(note_id, request.json)
 
-    data = request.json
 
-    title = data.get("title")
-    if title:
-        note.title = title
+# --------------------------------------------Folder--------------------------------------------
+def folder_json(folder, counts):
+    data = serializers.folder(folder)
+    data["noteCount"], data["totalNoteCount"] = counts.get(folder.id, (0, 0))
+    return data
 
-    content = data.get("content")
-    if content:
-        note.content = content
 
-    def parse_date(date_str):
-        if not date_str:
-            return None
-        try:
-            return parse(date_str)
-        except (ValueError, TypeError):
-            return None
-        
-    date_created = parse_date(data.get("dateCreated"))
-    date_updated = parse_date(data.get("dateUpdated"))    
+@app.route("/folders", methods=["GET"])
+@jwt_required()
+def get_user_folders():
+    """The caller's folders, flat with parentId, and how many notes each holds directly and in total"""
+    user = get_user(get_jwt_identity())
+    if not user:
+        return jsonify({"error": "User not found."}), 404
 
-    if date_created:
-        note.date_created = date_created
-    if date_updated:
-        note.date_updated = date_updated
+    counts = folders.note_counts(user.id)
 
-    folder_id = data.get("folderId")
-    if folder_id is not None: 
-        note.folder_id = int(folder_id) if folder_id else None
-        
+    def serialize(rows):
+        items = serializers.folders(rows)
+        for item in items:
+            item["noteCount"], item["totalNoteCount"] = counts.get(item["id"], (0, 0))
+        return items
+
+    return list_response(Folder.query.filter(Folder.user_id == user.id), Folder, serialize, FOLDER_SORT_KEYS)
+
+
+@app.route("/folders", methods=["POST"])
+@jwt_required()
+def create_folder():
+    user = get_user(get_jwt_identity())
+    if not user:
+        return jsonify({"error": "User not found."}), 404
+
+    data = request.get_json(silent=True) or {}
+    try:
+        name = folders.parse_name(data.get("name"))
+        parent_id = folders.parse_folder_id(user.id, data.get("parentId"))
+    except folders.FolderError as e:
+        return jsonify({"error": str(e)}), 400
+    except folders.FolderNotFound:
+        return jsonify({"error": "Parent folder not found."}), 404
+
+    folder = folders.create(user.id, name, parent_id)
+    db.session.commit()
+    return jsonify(folder_json(folder, {})), 201
+
+
+@app.route("/folders/<int:folder_id>", methods=["GET"])
+@jwt_required()
+def get_folder(folder_id):
+    """One folder with its note counts and its path from the top level (`path`, the folder last)"""
+    folder = folders.owned(int(get_jwt_identity()), folder_id)
+    if not folder:
+        return jsonify({"error": "Folder not found."}), 404
+
+    data = folder_json(folder, folders.note_counts(folder.user_id, folder.id))
+    data["path"] = [{"id": ancestor.id, "name": ancestor.name} for ancestor in folders.ancestors(folder.id)]
+    return jsonify(data), 200
+
+
+@app.route("/folders/<int:folder_id>", methods=["PUT"])
+@jwt_required()
+def update_folder(folder_id):
+    """Rename and/or move a folder with everything below it; `parentId: null` moves it to the top level"""
+    folder = folders.owned(int(get_jwt_identity()), folder_id)
+    if not folder:
+        return jsonify({"error": "Folder not found."}), 404
+
+    data = request.get_json(silent=True) or {}
+    try:
+        if "name" in data:
+            folder.name = folders.parse_name(data["name"])
+        if "parentId" in data:
+            parent_id = folders.parse_folder_id(folder.user_id, data["parentId"])
+            if parent_id != folder.parent_id:
+                folders.move(folder, parent_id)
+                # Recursive note lists under the old and new ancestors change
+                versions.bump(versions.NOTES, [folder.user_id])
+    except folders.FolderError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except folders.FolderNotFound:
+        db.session.rollback()
+        return jsonify({"error": "Parent folder not found."}), 404
+
+    db.session.commit()
+    return jsonify(folder_json(folder, folders.note_counts(folder.user_id, folder.id))), 200
+
+
+@app.route("/folders/<int:folder_id>", methods=["DELETE"])
+@jwt_required()
+def delete_folder(folder_id):
+    """Delete a folder and its subfolders; their notes move up to the deleted folder's parent"""
+    folder = folders.owned(int(get_jwt_identity()), folder_id)
+    if not folder:
+        return jsonify({"error": "Folder not found."}), 404
+
+    moved = folders.remove(folder)
+    versions.bump(versions.NOTES, [folder.user_id])
     db.session.commit()
+    return jsonify({"message": "Folder deleted successfully.", "notesMoved": moved}), 200
+
 
-    return jsonify(note.to_json()), 200
 # --------------------------------------------Task--------------------------------------------
 @app.route("/tasks", methods=["GET"])
 @jwt_required() 
@@ -419,12 +611,13 @@ def get_user_tasks():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
-    tasks = user.tasks
-    return jsonify([task.to_json() for task in tasks]), 200
+    tasks = Task.query.join(user_task, user_task.c.task_id == Task.id).filter(user_task.c.user_id == user_id)
+    return versions.conditional(user_id, versions.TASKS,
+                                lambda: list_response(tasks, Task, serializers.tasks, TASK_SORT_KEYS))
 
 @app.route("/tasks", methods=["POST"])
 @jwt_required()
@@ -440,7 +633,7 @@ def create_task():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = db.session.get(User, user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
@@ -483,10 +676,157 @@ def create_task():
     task.users.append(user)
 
     db.session.add(task)
+    versions.bump(versions.TASKS, [user.id])
     db.session.commit()
 
-    sync_after_commit()
-    return jsonify(task.to_json()), 201
+    synced = sync_after_commit(wait=wants_durable_write())
+    return with_sync_header(jsonify(serializers.task(task)), synced), 201
+
+
+@app.route("/tasks/search", methods=["GET"])
+@jwt_required()
+def search_tasks():
+    """Filter the caller's tasks in SQL.
+
+    Any combination of: status, category (comma-separated for several),
+    dueFrom/dueTo, assignedFrom/assignedTo (inclusive), q (title prefix),
+    plus the usual sort/order/limit/after/stream arguments.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
+
+    tasks = Task.query.join(user_task, user_task.c.task_id == Task.id).filter(user_task.c.user_id == user_id)
+
+    statuses = split_arg("status")
+    if statuses:
+        valid_statuses = [s.value for s in TaskStatus]
+        if any(s not in valid_statuses for s in statuses):
+            return jsonify({"error": f"Invalid status. Valid statuses are: {valid_statuses}"}), 400
+        tasks = tasks.filter(Task.status.in_(statuses))
+
+    categories = split_arg("category")
+    if categories:
+        tasks = tasks.filter(Task.category.in_(categories))
+
+    for arg, column, compare in (
+        ("dueFrom", Task.date_due, operator.ge),
+        ("dueTo", Task.date_due, operator.le),
+        ("assignedFrom", Task.date_assigned, operator.ge),
+        ("assignedTo", Task.date_assigned, operator.le),
+    ):
+        value = request.args.get(arg)
+        if not value:
+            continue
+        try:
+            bound = parse(value)
+        except (ValueError, OverflowError):
+            return jsonify({"error": f"Invalid {arg} format"}), 400
+        tasks = tasks.filter(compare(column, bound))
+
+    prefix = request.args.get("q")
+    if prefix:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        tasks = tasks.filter(Task.title.like(escaped + "%", escape="\\"))
+
+    return versions.conditional(user_id, versions.TASKS,
+                                lambda: list_response(tasks, Task, serializers.tasks, TASK_SORT_KEYS))
+
+
+CALENDAR_FIELDS = {"dateDue": Task.date_due, "dateAssigned": Task.date_assigned}
+CALENDAR_MAX_DAYS = 366
+
+
+@app.route("/tasks/calendar", methods=["GET"])
+@jwt_required()
+def get_task_calendar():
+    """The caller's tasks between two local days, grouped by local day.
+
+    from/to are inclusive dates (YYYY-MM-DD) in `tz` (IANA name, default
+    UTC); stored timestamps are treated as UTC. `field` picks dateDue
+    (default) or dateAssigned; counts=1 returns only per-day counts.
+    """
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
+
+    try:
+        tz = ZoneInfo(request.args.get("tz", "UTC"))
+    except (ZoneInfoNotFoundError, ValueError):
+        return jsonify({"error": "Invalid tz. Use an IANA time zone name such as Europe/Kyiv."}), 400
+
+    try:
+        first_day = date.fromisoformat(request.args["from"])
+        last_day = date.fromisoformat(request.args["to"])
+    except KeyError:
+        return jsonify({"error": "from and to are required."}), 400
+    except ValueError:
+        return jsonify({"error": "Invalid from/to format. Use YYYY-MM-DD."}), 400
+    if last_day < first_day or (last_day - first_day).days >= CALENDAR_MAX_DAYS:
+        return jsonify({"error": f"to must be on or after from, at most {CALENDAR_MAX_DAYS} days apart."}), 400
+
+    field = request.args.get("field", "dateDue")
+    if field not in CALENDAR_FIELDS:
+        return jsonify({"error": f"Invalid field. Valid fields are: {list(CALENDAR_FIELDS)}"}), 400
+    column = CALENDAR_FIELDS[field]
+    counts_only = request.args.get("counts", "").lower() in ("1", "true", "yes")
+
+    # Local midnight of `from` up to local midnight after `to`, as naive UTC for the range scan
+    start = datetime.combine(first_day, time.min, tz).astimezone(timezone.utc).replace(tzinfo=None)
+    end = datetime.combine(last_day + timedelta(days=1), time.min, tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+    def local_day(value):
+        return value.replace(tzinfo=timezone.utc).astimezone(tz).date().isoformat()
+
+    def build():
+        in_range = (user_task.c.user_id == user_id, column >= start, column < end)
+        if counts_only:
+            # Only the timestamp column is read; no rows are built or serialized
+            values = db.session.scalars(
+                select(column).join(user_task, user_task.c.task_id == Task.id).where(*in_range)
+            )
+            days = {}
+            for value in values:
+                key = local_day(value)
+                days[key] = days.get(key, 0) + 1
+        else:
+            tasks = (Task.query.join(user_task, user_task.c.task_id == Task.id)
+                     .filter(*in_range).order_by(column, Task.id).all())
+            days = {}
+            for task, data in zip(tasks, serializers.tasks(tasks)):
+                days.setdefault(local_day(getattr(task, column.key)), []).append(data)
+        return jsonify({
+            "from": first_day.isoformat(),
+            "to": last_day.isoformat(),
+            "tz": str(tz),
+            "field": field,
+            "days": days,
+        }), 200
+
+    return versions.conditional(user_id, versions.TASKS, build)
+
+
+def split_arg(name):
+    """Comma-separated query argument as a list, ignoring blanks"""
+    return [part.strip() for part in request.args.get(name, "").split(",") if part.strip()]
+
+
+# The single-filter routes predate /tasks/search and stay for existing clients, scoped to the caller
+def caller_tasks():
+    return Task.query.join(user_task, user_task.c.task_id == Task.id) \
+        .filter(user_task.c.user_id == int(get_jwt_identity()))
+
+
+def caller_goals():
+    return Goal.query.join(user_goal, user_goal.c.goal_id == Goal.id) \
+        .filter(user_goal.c.user_id == int(get_jwt_identity()))
+
+
+def caller_habits():
+    return Habit.query.join(user_habit, user_habit.c.habit_id == Habit.id) \
+        .filter(user_habit.c.user_id == int(get_jwt_identity()))
 
 
 @app.route("/tasks/status", methods=["GET"])
@@ -496,9 +836,9 @@ def get_tasks_by_status():
 
     if not status:
         return jsonify({"error": "Status is required."}), 400
-    tasks = Task.query.filter_by(status=status).all()
+    tasks = caller_tasks().filter(Task.status == status)
 
-    return jsonify([task.to_json() for task in tasks]), 200
+    return list_response(tasks, Task, serializers.tasks, TASK_SORT_KEYS)
 
 
 @app.route("/tasks/category", methods=["GET"])
@@ -509,8 +849,8 @@ def get_tasks_by_category():
     if not category:
         return jsonify({"error": "Category is required."}), 400
 
-    tasks = Task.query.filter_by(category=category).all()
-    return jsonify([task.to_json() for task in tasks]), 200
+    tasks = caller_tasks().filter(Task.category == category)
+    return list_response(tasks, Task, serializers.tasks, TASK_SORT_KEYS)
 
 @app.route("/tasks/dateAssigned", methods=["GET"])
 @jwt_required()
@@ -520,8 +860,8 @@ def get_tasks_by_date_assigned():
     if not date_assigned:
         return jsonify({"error": "Date assigned is required."}), 400
 
-    tasks = Task.query.filter_by(date_assigned=date_assigned).all()
-    return jsonify([task.to_json() for task in tasks]), 200
+    tasks = caller_tasks().filter(Task.date_assigned == date_assigned)
+    return list_response(tasks, Task, serializers.tasks, TASK_SORT_KEYS)
 
 
 @app.route("/tasks/dateDue", methods=["GET"])
@@ -532,8 +872,8 @@ def get_tasks_by_date_due():
     if not date_due:
         return jsonify({"error": "Date due is required."}), 400
 
-    tasks = Task.query.filter_by(date_due=date_due).all()
-    return jsonify([task.to_json() for task in tasks]), 200
+    tasks = caller_tasks().filter(Task.date_due == date_due)
+    return list_response(tasks, Task, serializers.tasks, TASK_SORT_KEYS)
 
 
 
@@ -585,12 +925,13 @@ def update_task(task_id):
             return jsonify({"error": "Invalid category"}), 400
 
     try:
+        versions.bump_linked(versions.TASKS, user_task.c.task_id, [task.id])
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Failed to update task: {str(e)}"}), 500
 
-    return jsonify(task.to_json()), 200
+    return jsonify(serializers.task(task)), 200
 
 @app.route("/tasks/<int:task_id>", methods=["GET"])
 @jwt_required()
@@ -599,7 +940,7 @@ def get_task(task_id):
     if not task:
         return jsonify({"error": "Task not found."}), 404
 
-    return jsonify(task.to_json()), 200
+    return jsonify(serializers.task(task)), 200
 
 
 @app.route("/tasks/<int:task_id>/users", methods=["POST"])  
@@ -619,15 +960,16 @@ def assign_user_to_task(task_id):
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
     if user not in task.users:
         task.users.append(user)
+        versions.bump_linked(versions.TASKS, user_task.c.task_id, [task.id])
         db.session.commit()
 
-    return jsonify(task.to_json()), 200
+    return jsonify(serializers.task(task)), 200
 
 
 @app.route("/tasks/<int:task_id>", methods=["DELETE"])
@@ -637,6 +979,7 @@ def delete_task(task_id):
     if not task:
         return jsonify({"error": "Task not found."}), 404
 
+    versions.bump_linked(versions.TASKS, user_task.c.task_id, [task.id])
     db.session.delete(task)
     db.session.commit()
 
@@ -659,7 +1002,7 @@ def create_goal():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
@@ -692,9 +1035,10 @@ def create_goal():
     goal.users.append(user)
 
     db.session.add(goal)
+    versions.bump(versions.GOALS, [user.id])
     db.session.commit()
 
-    return jsonify(goal.to_json()), 201
+    return jsonify(serializers.goal(goal)), 201
 
 
 @app.route("/goals/status", methods=["GET"])
@@ -710,8 +1054,8 @@ def get_goals_by_status():
     except ValueError:
         return jsonify({"error": f"Invalid status. Valid statuses are: {[s.value for s in GoalStatus]}"}), 400
 
-    goals = Goal.query.filter_by(status=status_enum).all()
-    return jsonify([goal.to_json() for goal in goals]), 200
+    goals = caller_goals().filter(Goal.status == status_enum)
+    return list_response(goals, Goal, serializers.goals, GOAL_SORT_KEYS)
 
 
 @app.route("/goals/period", methods=["GET"])
@@ -727,8 +1071,8 @@ def get_goals_by_period():
     except ValueError:
         return jsonify({"error": f"Invalid period. Valid periods are: {[s.value for s in GoalPeriod]}"}), 400
 
-    goals = Goal.query.filter_by(period=period_enum).all()  # Fixed: should filter by period, not status
-    return jsonify([goal.to_json() for goal in goals]), 200
+    goals = caller_goals().filter(Goal.period == period_enum)
+    return list_response(goals, Goal, serializers.goals, GOAL_SORT_KEYS)
 
 
 @app.route("/goals", methods=["GET"])
@@ -744,12 +1088,13 @@ def get_user_goals():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
-    goals = user.goals
-    return jsonify([goal.to_json() for goal in goals]), 200
+    goals = Goal.query.join(user_goal, user_goal.c.goal_id == Goal.id).filter(user_goal.c.user_id == user_id)
+    return versions.conditional(user_id, versions.GOALS,
+                                lambda: list_response(goals, Goal, serializers.goals, GOAL_SORT_KEYS))
 
 
 @app.route("/goals/<int:goal_id>", methods=["PUT"])
@@ -785,9 +1130,10 @@ def update_goal(goal_id):
 
         goal.period = period_enum
 
+    versions.bump_linked(versions.GOALS, user_goal.c.goal_id, [goal.id])
     db.session.commit()
 
-    return jsonify(goal.to_json()), 200
+    return jsonify(serializers.goal(goal)), 200
 
 
 @app.route("/goals/<int:goal_id>", methods=["GET"])
@@ -796,7 +1142,7 @@ def get_goal(goal_id):
     goal = Goal.query.get(goal_id)
     if not goal:
         return jsonify({"error": "Goal not found."}), 404
-    return jsonify(goal.to_json()), 200
+    return jsonify(serializers.goal(goal)), 200
 
 
 @app.route("/goals/<int:goal_id>", methods=["DELETE"])
@@ -805,6 +1151,7 @@ def delete_goal(goal_id):
     goal = Goal.query.get(goal_id)
     if not goal:
         return jsonify({"error": "Goal not found."}), 404
+    versions.bump_linked(versions.GOALS, user_goal.c.goal_id, [goal.id])
     db.session.delete(goal)
     db.session.commit()
     return jsonify({"message": "Goal deleted successfully."}), 200
@@ -825,7 +1172,7 @@ def create_habit():
     except ValueError:
         return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
 
-    user = db.session.get(User, user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
@@ -852,25 +1199,24 @@ def create_habit():
             "error": f"Invalid habitDays. Must be a list of valid days: {', '.join(valid_days)}"
         }), 400
 
-    # Convert habit_days list to a comma-separated string if needed for DB
-    # or use a separate HabitDay model if you're normalizing
     habit = Habit(
         title=title,
         status=status,
-        color=color,
-        habit_days=",".join(habit_days)  # or keep as JSON if supported
+        color=color
     )
+    habit.set_days(habit_days)
 
     db.session.add(habit)
     with db.session.no_autoflush:
         user.habits.append(habit)
     try:
+        versions.bump(versions.HABITS, [user.id])
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Failed to create habit: {str(e)}"}), 500
 
-    return jsonify(habit.to_json()), 201
+    return jsonify(serializers.habit(habit)), 201
 
 @app.route("/habits/status", methods=["GET"])
 @jwt_required()
@@ -886,26 +1232,45 @@ def get_habits_by_status():
     except ValueError:
         return jsonify({"error": f"Invalid status. Valid statuses are: {[s.value for s in HabitStatus]}"}), 400
 
-    habits = Habit.query.filter_by(status=status_enum).all()
-    return jsonify([habit.to_json() for habit in habits]), 200
+    habits = caller_habits().filter(Habit.status == status_enum.value)
+    return list_response(habits, Habit, serializers.habits, HABIT_SORT_KEYS)
 
 
 @app.route("/habits/days", methods=["GET"])
 @jwt_required()
 def get_habits_by_days():
-    habit_days = request.args.get("habitDays")
+    """The caller's habits scheduled on any of the given days.
 
-    # for debugging purposes
+    habitDays is a day name or a comma-separated list of them; `today`
+    means the current day in `tz` (IANA name, default UTC).
+    """
+    user = get_user(get_jwt_identity())
+    if not user:
+        return jsonify({"error": "User not found."}), 404
+
+    habit_days = split_arg("habitDays")
     if not habit_days:
-        return jsonify({"error": "Period is required."}), 400
+        return jsonify({"error": "habitDays is required."}), 400
 
-    try:
-        habit_days_enum = HabitDays(habit_days)
-    except ValueError:
-        return jsonify({"error": f"Invalid period. Valid periods are: {[s.value for s in HabitDays]}"}), 400
+    if "today" in habit_days:
+        try:
+            tz = ZoneInfo(request.args.get("tz", "UTC"))
+        except (ZoneInfoNotFoundError, ValueError):
+            return jsonify({"error": "Invalid tz. Use an IANA time zone name such as Europe/Kyiv."}), 400
+        today = list(HabitDays)[datetime.now(tz).isoweekday() % 7]
+        habit_days = [today.value if day == "today" else day for day in habit_days]
 
-    habits = Habit.query.filter_by(status=habit_days_enum).all()
-    return jsonify([habit.to_json() for habit in habits]), 200
+    valid_days = [d.value for d in HabitDays]
+    if not all(day in valid_days for day in habit_days):
+        return jsonify({"error": f"Invalid habitDays. Valid days are: {valid_days} or today"}), 400
+
+    habits = (Habit.query.join(user_habit, user_habit.c.habit_id == Habit.id)
+              .filter(user_habit.c.user_id == user.id,
+                      Habit.days_mask.in_(masks_with_any(days_to_mask(habit_days)))))
+    # `today` resolves to a different day after midnight with the same query string
+    return versions.conditional(user.id, versions.HABITS,
+                                lambda: list_response(habits, Habit, serializers.habits, HABIT_SORT_KEYS),
+                                variant=",".join(habit_days))
 
 
 @app.route("/habits", methods=["GET"])
@@ -916,12 +1281,13 @@ def get_user_habits():
     if not user_id:
         return jsonify({"error": "User ID is required."}), 400
 
-    user = User.query.get(user_id)
+    user = get_user(user_id)
     if not user:
         return jsonify({"error": "User not found."}), 404
 
-    habits = user.habits
-    return jsonify([h.to_json() for h in habits]), 200
+    habits = Habit.query.join(user_habit, user_habit.c.habit_id == Habit.id).filter(user_habit.c.user_id == user.id)
+    return versions.conditional(user.id, versions.HABITS,
+                                lambda: list_response(habits, Habit, serializers.habits, HABIT_SORT_KEYS))
 
 
 @app.route("/habits/<int:habit_id>", methods=["GET"])
@@ -930,7 +1296,7 @@ def get_habit(habit_id):
     habit = Habit.query.get(habit_id)
     if not habit:
         return jsonify({"error": "Habit not found."}), 404
-    return jsonify(habit.to_json()), 200
+    return jsonify(serializers.habit(habit)), 200
 
 
 @app.route("/habits/<int:habit_id>", methods=["DELETE"])
@@ -939,6 +1305,7 @@ def delete_habit(habit_id):
     habit = Habit.query.get(habit_id)
     if not habit:
         return jsonify({"error": "Habit not found."}), 404
+    versions.bump_linked(versions.HABITS, user_habit.c.habit_id, [habit.id])
     db.session.delete(habit)
     db.session.commit()
     return jsonify({"message": "Habit deleted successfully."}), 200
@@ -959,36 +1326,263 @@ def update_habit(habit_id):
     color = data.get("color")
     if not color:
         return jsonify({"error": "Please provide a color for the habit."}), 400
+    habit.color = color
+
+    if "status" in data:
+        status = str(data["status"]).title()
+        if status not in [s.value for s in HabitStatus]:
+            return jsonify({"error": f"Invalid status. Must be one of: {', '.join(s.value for s in HabitStatus)}"}), 400
+        habit.status = status
+
+    if "habitDays" in data:
+        habit_days = data["habitDays"]
+        valid_days = [d.value for d in HabitDays]
+        if not isinstance(habit_days, list) or not all(day in valid_days for day in habit_days):
+            return jsonify({"error": f"Invalid habitDays. Must be a list of valid days: {', '.join(valid_days)}"}), 400
+        habit.set_days(habit_days)
+
+    versions.bump_linked(versions.HABITS, user_habit.c.habit_id, [habit.id])
+    db.session.commit()
 
-    status = data.get("status")
-    habit.status = status
+    return jsonify(serializers.habit(habit)), 200
 
-    habit_days = data.get("habitDays")
-    habit.period = habit_days
 
-    db.session.commit()
+# --------------------------------------------Batch--------------------------------------------
+def run_batch(spec):
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 415
+
+    user = get_user(get_jwt_identity())
+    if not user:
+        return jsonify({"error": "User not found."}), 404
+
+    operations = (request.get_json(silent=True) or {}).get("operations")
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "operations must be a non-empty list."}), 400
+    if len(operations) > batch.BATCH_LIMIT:
+        return jsonify({"error": f"At most {batch.BATCH_LIMIT} operations per batch."}), 400
+
+    results, plan = batch.validate(spec, user.id, operations)
+    if plan is None:
+        return jsonify({"results": results}), 400
+
+    try:
+        # Buffered autosaves must not overwrite these updates or revive deleted notes
+        with autosave.buffer.overwriting(batch.overwritten(plan) if spec is batch.NOTES else {}):
+            ids = batch.apply(spec, user.id, plan)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"Batch failed: {str(e)}"}), 500
+
+    synced = sync_after_commit(wait=wants_durable_write())
+    return with_sync_header(jsonify({"results": batch.serialize_results(spec, results, ids)}), synced), 200
 
-    return jsonify(habit.to_json()), 200
+
+@app.route("/tasks/batch", methods=["POST"])
+@jwt_required()
+def batch_tasks():
+    return run_batch(batch.TASKS)
+
+
+@app.route("/notes/batch", methods=["POST"])
+@jwt_required()
+def batch_notes():
+    return run_batch(batch.NOTES)
+
+
+@app.route("/goals/batch", methods=["POST"])
+@jwt_required()
+def batch_goals():
+    return run_batch(batch.GOALS)
+
+
+@app.route("/habits/batch", methods=["POST"])
+@jwt_required()
+def batch_habits():
+    return run_batch(batch.HABITS)
+
+
+# --------------------------------------------Search--------------------------------------------
+@app.route("/search", methods=["GET"])
+@jwt_required()
+def search_notes_and_tasks():
+    """Full-text search over the caller's notes and tasks, best matches first.
+
+    ?q=words&type=notes,tasks&limit=20&after=<next_cursor>; title and
+    snippet are HTML-escaped with matches wrapped in <mark>.
+    """
+    user = get_user(get_jwt_identity())
+    if not user:
+        return jsonify({"error": "User not found."}), 404
+
+    q = request.args.get("q", "")
+    if not q.strip():
+        return jsonify({"error": "q is required."}), 400
+
+    types = split_arg("type") or ["notes", "tasks"]
+    if not set(types) <= {"notes", "tasks"}:
+        return jsonify({"error": "Invalid type. Valid types are: ['notes', 'tasks']"}), 400
+
+    try:
+        limit = int(request.args.get("limit", search.DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "Invalid limit. Limit must be a number."}), 400
+    if not 1 <= limit <= search.MAX_LIMIT:
+        return jsonify({"error": f"Invalid limit. Must be between 1 and {search.MAX_LIMIT}."}), 400
+
+    try:
+        items, next_cursor = search.search(user.id, q, kinds=[t[:-1] for t in types],
+                                           limit=limit, after=request.args.get("after"))
+    except search.SearchError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"items": items, "next_cursor": next_cursor}), 200
+
+
+# --------------------------------------------Changes--------------------------------------------
+@app.route("/changes", methods=["GET"])
+@jwt_required()
+def get_changes():
+    """Upserts and tombstones for the caller's tasks, notes, goals and habits since a sequence number"""
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
+
+    try:
+        limit = changes.parse_limit(request.args.get("limit"))
+        return jsonify(changes.changes_since(user_id, request.args.get("since"), limit)), 200
+    except changes.ChangesError as e:
+        return jsonify({"error": str(e)}), 400
+    except changes.ChangesGone as e:
+        return jsonify({"error": str(e), "horizon": e.horizon, "next_since": e.latest}), 410
+
+
+# --------------------------------------------Dashboard--------------------------------------------
+@app.route("/dashboard/summary", methods=["GET"])
+@jwt_required()
+def get_dashboard_summary():
+    """Totals and per-status/category/period counts of the caller's tasks, goals and habits"""
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid User ID. User ID must be a number."}), 400
+    return jsonify(dashboard.summary(user_id)), 200
+
+
+# --------------------------------------------Sync--------------------------------------------
+@app.route("/sync/status", methods=["GET"])
+@admin_required
+def get_sync_status():
+    return jsonify(sync_worker.status()), 200
+
+
+@app.route("/autosave/status", methods=["GET"])
+@admin_required
+def get_autosave_status():
+    return jsonify(autosave.buffer.status()), 200
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving; touches neither the database nor Turso"""
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: schema migrated, first pull from Turso done, unsynced writes younger than the bound"""
+    lag = sync_worker.lag()
+    checks = {
+        "schema": schema_is_current(),
+        "initial_sync": db_wrapper.initial_synced.is_set(),
+        "sync_lag": lag <= ready_max_sync_lag,
+    }
+    ready = all(checks.values())
+    return jsonify({
+        "ready": ready,
+        "checks": checks,
+        "sync_lag_seconds": round(lag, 3),
+        "max_sync_lag_seconds": ready_max_sync_lag,
+        "replica": db_wrapper.status(),
+    }), 200 if ready else 503
+
+
+@app.route("/metrics", methods=["GET"])
+@admin_required
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/debug/slow-queries", methods=["GET"])
+@admin_required
+def get_slow_queries():
+    limit = request.args.get("limit", type=int)
+    return jsonify(slow_query_log.status(limit)), 200
+
+
+@app.route("/debug/slow-queries", methods=["DELETE"])
+@admin_required
+def clear_slow_queries():
+    slow_query_log.clear()
+    return jsonify({"message": "Slow-query log cleared"}), 200
+
+
+@app.route("/cache/stats", methods=["GET"])
+@admin_required
+def get_cache_stats():
+    return jsonify({"users": user_cache.user_cache.stats()}), 200
 
 
 # --------------------------------------------main--------------------------------------------
 
+@app.errorhandler(HashingBusy)
+def password_hashing_busy(e):
+    response = jsonify({"error": "Server is busy, please retry shortly."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @app.before_request
 def basic_authentication():
     if request.method.lower() == 'options':
         return Response()
 
-if __name__ == "__main__":
-    with app.app_context():
-        try:
-            #sync_db()
-            db.create_all()
-        except Exception as e:
-            print(f"Initialization error: {e}")
-           # sync_db()
-            db.create_all()
-    app.run(debug=True)
+@app.cli.command("migrate-db")
+def migrate_db_command():
+    """Apply pending schema migrations"""
+    migrate()
+
+
+@app.cli.command("compact-changes")
+@click.option("--retention-days", type=float, default=changes.DEFAULT_RETENTION_DAYS, show_default=True)
+def compact_changes_command(retention_days):
+    """Drop change-feed entries older than the retention period"""
+    print(f"Change log horizon is now {changes.compact(retention_days)}")
+
+
+@app.cli.command("repair-dashboard")
+def repair_dashboard_command():
+    """Recompute the dashboard counters from the tasks, goals and habits tables"""
+    dashboard.repair(db.session.connection())
+    db.session.commit()
+
 
 @app.teardown_appcontext
 def shutdown_session(exception=None):
-    db.session.remove()
\ No newline at end of file
+    db.session.remove()
+
+
+if __name__ == "__main__":
+    debug = os.getenv("FLASK_DEBUG", "1") not in ("0", "false", "no")
+    use_reloader = debug and os.getenv("FLASK_RELOADER", "1") not in ("0", "false", "no")
+    # With the reloader this file runs twice: in the watcher and in the server process it spawns
+    # (WERKZEUG_RUN_MAIN). Only the server migrates, starts the hash pool and replays autosaves;
+    # without the reloader, this process is the server. Migrations only touch the local
+    # replica; the first Turso pull is already running in the background.
+    if not use_reloader or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        with app.app_context():
+            migrate()
+        passwords.hasher.start()
+        autosave.buffer.start()  # replays autosaves acknowledged before a crash
+    app.run(debug=debug, use_reloader=use_reloader)
@@ -0,0 +1,288 @@
+"""Prometheus metrics for /metrics, without a client-library dependency.
+
+Request latency and counts come from Flask request hooks, SQL counts and
+time from `TimedConnection` (the sqlite3 connection class config.py
+connects with), pool checkout wait from `TimedQueuePool`, and sync and
+bcrypt timings from config.py and passwords.py. Per-request SQL totals
+live in a thread-local, since a request runs on one thread.
+
+/metrics needs an admin's access token (see ADMIN_EMAILS); give the
+scraper one as a bearer token. Set METRICS_ENABLED=0 to skip installing
+the hooks.
+"""
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from flask import request
+from sqlalchemy.pool import QueuePool
+
+metrics_enabled = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), lock=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = lock or threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._add(label_values, amount)
+
+    def _add(self, label_values, amount):
+        # Caller holds self._lock
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield self.name, _label_text(self.labels, label_values), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS, lock=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = lock or threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            self._add(label_values, value)
+
+    def _add(self, label_values, value):
+        # Caller holds self._lock
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        bounds = self.buckets + (float("inf"),)
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), label_values + (_number(bound),))
+                yield self.name + "_bucket", labels, cumulative
+            labels = _label_text(self.labels, label_values)
+            yield self.name + "_sum", labels, values[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------------------------
+
+# The per-request series share one lock, taken once at the end of each request
+_request_lock = threading.Lock()
+requests_in_flight = Gauge("http_requests_in_flight", "Requests currently being handled", lock=_request_lock)
+request_duration = Histogram("http_request_duration_seconds", "Request latency by route",
+                             ("method", "route"), lock=_request_lock)
+requests_total = Counter("http_requests_total", "Requests by route and status", ("method", "route", "status"),
+                         lock=_request_lock)
+request_statements = Histogram("http_request_sql_statements", "SQL statements executed per request",
+                               ("route",), buckets=COUNT_BUCKETS, lock=_request_lock)
+request_db_time = Histogram("http_request_db_seconds", "Time spent in SQL per request", ("route",),
+                            lock=_request_lock)
+_sql_lock = threading.Lock()
+sql_statements = Counter("db_statements_total", "SQL statements executed, including outside requests",
+                         lock=_sql_lock)
+sql_seconds = Counter("db_statement_seconds_total", "Time spent executing SQL statements", lock=_sql_lock)
+pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+                      buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+sync_duration = Histogram("turso_sync_duration_seconds", "Duration of syncs to Turso", ("result",))
+sync_failures = Counter("turso_sync_failures_total", "Failed syncs to Turso")
+bcrypt_duration = Histogram("bcrypt_duration_seconds", "Password hash/check time including pool wait",
+                            ("op",), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+_local = threading.local()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if metrics_enabled:
+                pool_wait.observe(perf_counter() - started)
+
+
+def _record_statement(elapsed):
+    with _sql_lock:
+        sql_statements._add((), 1)
+        sql_seconds._add((), elapsed)
+    local = _local
+    if getattr(local, "active", False):
+        local.statements += 1
+        local.db_time += elapsed
+
+
+# Statements at least this slow are also passed to `_slow_statement_hook`, see slow_queries.py
+_slow_statement_seconds = float("inf")
+_slow_statement_hook = None
+
+
+def watch_slow_statements(threshold_seconds, hook):
+    """Call hook(cursor, sql, parameters, elapsed, many) for statements over the threshold"""
+    global _slow_statement_seconds, _slow_statement_hook, connection_factory
+    _slow_statement_hook = hook
+    _slow_statement_seconds = threshold_seconds
+    connection_factory = TimedConnection
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Counts statements and their execute time, globally and for the current request.
+
+    Timing the DBAPI cursor costs 1-2 µs per statement; SQLAlchemy's
+    before/after_cursor_execute listeners measured ~9 µs.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            elapsed = perf_counter() - started
+            _record_statement(elapsed)
+            if elapsed >= _slow_statement_seconds:
+                _slow_statement_hook(self, sql, parameters, elapsed)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = perf_counter() - started
+            _record_statement(elapsed)
+            if elapsed >= _slow_statement_seconds:
+                _slow_statement_hook(self, sql, seq_of_parameters, elapsed, many=True)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+
+# Pass as sqlite3.connect(factory=...) for connections that should be measured
+connection_factory = TimedConnection if metrics_enabled else sqlite3.Connection
+
+
+def install(app):
+    """Register the request hooks on a Flask app"""
+    if not metrics_enabled:
+        return
+
+    def _start_request():
+        with _request_lock:
+            requests_in_flight._add((), 1)
+        local = _local
+        local.active = True
+        local.status = 500  # unless after_request sees a response
+        local.statements = 0
+        local.db_time = 0.0
+        local.started = perf_counter()
+
+    # First in line, so requests answered by another before_request hook are counted too
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+
+    @app.after_request
+    def _record_status(response):
+        _local.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        local = _local
+        if not getattr(local, "active", False):
+            return
+        elapsed = perf_counter() - local.started
+        local.active = False
+        req = request._get_current_object()
+        rule = req.url_rule
+        route = rule.rule if rule is not None else "unmatched"
+        method = req.method
+        with _request_lock:
+            requests_in_flight._add((), -1)
+            request_duration._add((method, route), elapsed)
+            requests_total._add((method, route, local.status), 1)
+            request_statements._add((route,), local.statements)
+            request_db_time._add((route,), local.db_time)
+
+
+def timed(histogram, *label_values):
+    """Context manager observing the block's duration"""
+    return _Timer(histogram, label_values)
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "started")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if metrics_enabled:
+            self.histogram.observe(perf_counter() - self.started, *self.label_values)
+        return False
@@ -0,0 +1,369 @@
+"""Versioned schema migrations for the local SQLite replica.
+
+Each migration runs once, in order, and is recorded in `schema_migrations`.
+Migrations must be safe to run against a database that `db.create_all()`
+already brought up to date, since older replicas were created that way.
+
+    python migrations.py        # or: flask --app main migrate-db
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from config import db
+import dashboard
+from compression import compress, inflate
+from models import NOTE_SNIPPET_LENGTH, days_to_mask, note_snippet
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def create_tables(conn, *names):
+    """Create the named model tables (and their indexes) if missing"""
+    for name in names:
+        db.metadata.tables[name].create(conn, checkfirst=True)
+
+
+def create_indexes(conn, *names):
+    """Create the named indexes declared on the models, skipping existing ones"""
+    wanted = set(names)
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name in wanted:
+                index.create(conn, checkfirst=True)
+                wanted.discard(index.name)
+    if wanted:
+        raise RuntimeError(f"Indexes not declared on any model: {sorted(wanted)}")
+
+
+def add_column(conn, table, column_ddl):
+    """ALTER TABLE ADD COLUMN unless the column already exists"""
+    name = column_ddl.split()[0]
+    if name not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column_ddl}")
+
+
+# ----------------------------------------------------------------------------------------
+
+@migration(1, "baseline schema")
+def baseline(conn):
+    db.metadata.create_all(conn)
+
+
+@migration(2, "secondary and reverse-association indexes")
+def secondary_indexes(conn):
+    create_indexes(
+        conn,
+        # Filter routes on tasks; status/category lead so date_due ranges stay indexed
+        "ix_tasks_status_date_due",
+        "ix_tasks_category_date_due",
+        "ix_tasks_date_due",
+        "ix_tasks_date_assigned",
+        # Per-user notes, optionally narrowed to one folder
+        "ix_notes_user_folder",
+        "ix_goals_status",
+        "ix_goals_period",
+        "ix_habits_status",
+        # Association tables: the PK is (user_id, x_id); these serve x_id -> users
+        "ix_user_task_task_user",
+        "ix_user_goal_goal_user",
+        "ix_user_habit_habit_user",
+        "ix_user_note_note_user",
+    )
+
+
+@migration(3, "per-user collection versions")
+def collection_versions(conn):
+    create_tables(conn, "collection_versions")
+
+
+@migration(4, "planner statistics")
+def planner_statistics(conn):
+    # Without sqlite_stat1 the planner assumes every index is equally selective and
+    # drives range queries (e.g. /tasks/calendar) from user_task instead of the
+    # date index. Empty tables get no stats, so this is harmless on a fresh replica.
+    conn.exec_driver_sql("ANALYZE")
+
+
+@migration(5, "habit day masks")
+def habit_day_masks(conn):
+    add_column(conn, "habits", "days_mask INTEGER NOT NULL DEFAULT 0")
+    rows = conn.execute(text("SELECT id, habit_days FROM habits WHERE days_mask = 0")).fetchall()
+    backfill = [{"id": row.id, "mask": days_to_mask(row.habit_days or "")} for row in rows]
+    backfill = [row for row in backfill if row["mask"]]
+    if backfill:
+        conn.execute(text("UPDATE habits SET days_mask = :mask WHERE id = :id"), backfill)
+    create_indexes(conn, "ix_habits_days_mask")
+
+
+@migration(6, "full-text search")
+def full_text_search(conn):
+    # Plain (not external-content) FTS5 tables keyed by the entity id, so
+    # snippets never depend on how the source column is stored
+    for table, columns in (("notes", ("title", "content")), ("tasks", ("title", "description"))):
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new = ", ".join(f"new.{c}" for c in columns)
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new}); END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {fts} WHERE rowid = old.id; END"
+        )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"UPDATE {fts} SET " + ", ".join(f"{c} = new.{c}" for c in columns) + " WHERE rowid = old.id; END"
+        )
+        conn.exec_driver_sql(f"DELETE FROM {fts}")
+        conn.exec_driver_sql(f"INSERT INTO {fts} (rowid, {cols}) SELECT id, {cols} FROM {table}")
+
+
+
+def _log_changes(entity, user_ids_sql, entity_id_sql):
+    """Trigger body statements recording a change to one entity for every user in `user_ids_sql`"""
+    match = f"entity = '{entity}' AND entity_id = {entity_id_sql}"
+    return (
+        f"DELETE FROM change_log WHERE {match} AND user_id IN ({user_ids_sql}); "
+        f"INSERT INTO change_log (user_id, entity, entity_id, changed_at) "
+        f"SELECT user_id, '{entity}', {entity_id_sql}, CAST(strftime('%s', 'now') AS INTEGER) "
+        f"FROM ({user_ids_sql}); "
+    )
+
+
+@migration(7, "change feed")
+def change_feed(conn):
+    create_tables(conn, "change_log", "change_log_horizon")
+    # Clients bootstrap from the list routes and then follow /changes from the horizon,
+    # so sequence numbers start above it and since=0 is answered with 410
+    conn.exec_driver_sql("INSERT OR IGNORE INTO change_log_horizon (id, horizon) VALUES (1, 1)")
+    if not conn.exec_driver_sql("SELECT 1 FROM sqlite_sequence WHERE name = 'change_log'").first():
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', 1)")
+
+    def trigger(name, event, table, body):
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} BEGIN {body}END")
+
+    trigger("notes_changes_insert", "INSERT", "notes", _log_changes("note", "SELECT new.user_id AS user_id", "new.id"))
+    trigger("notes_changes_update", "UPDATE", "notes",
+            _log_changes("note", "SELECT new.user_id AS user_id UNION SELECT old.user_id", "new.id"))
+    trigger("notes_changes_delete", "DELETE", "notes", _log_changes("note", "SELECT old.user_id AS user_id", "old.id"))
+
+    # Shared entities: every linked user sees the row, and its "users" list changes with the links
+    for entity, table, link, column in (("task", "tasks", "user_task", "task_id"),
+                                        ("goal", "goals", "user_goal", "goal_id"),
+                                        ("habit", "habits", "user_habit", "habit_id")):
+        linked = f"SELECT user_id FROM {link} WHERE {column} = {{}}"
+        trigger(f"{table}_changes_update", "UPDATE", table, _log_changes(entity, linked.format("new.id"), "new.id"))
+        trigger(f"{table}_changes_delete", "DELETE", table, _log_changes(entity, linked.format("old.id"), "old.id"))
+        trigger(f"{link}_changes_insert", "INSERT", link,
+                _log_changes(entity, linked.format(f"new.{column}"), f"new.{column}"))
+        trigger(f"{link}_changes_delete", "DELETE", link,
+                _log_changes(entity, "SELECT old.user_id AS user_id UNION " + linked.format(f"old.{column}"),
+                             f"old.{column}"))
+
+
+
+def _count(metric, key_sql, delta, source):
+    """Trigger body statement adding `delta` to the counter for each row of `source`"""
+    return (
+        f"INSERT INTO dashboard_counters (user_id, metric, key, count) "
+        f"SELECT user_id, '{metric}', coalesce({key_sql}, ''), {delta} {source} "
+        f"ON CONFLICT (user_id, metric, key) DO UPDATE SET count = count + excluded.count; "
+    )
+
+
+@migration(8, "dashboard counters")
+def dashboard_counters(conn):
+    create_tables(conn, "dashboard_counters")
+
+    def trigger(name, event, table, body, when=""):
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} {when}BEGIN {body}END")
+
+    for table, link, link_column, columns in (("tasks", "user_task", "task_id", ("status", "category")),
+                                               ("goals", "user_goal", "goal_id", ("status", "period")),
+                                               ("habits", "user_habit", "habit_id", ("status",))):
+        entity = table[:-1]
+        metrics = [(f"{entity}_{column}", column) for column in columns]
+        # Linking or unlinking a user counts the entity's current values for them
+        trigger(f"{link}_counters_insert", "INSERT", link, "".join(
+            _count(metric, f"{table}.{column}", 1, f"FROM {table} JOIN (SELECT new.user_id AS user_id) "
+                                                   f"WHERE {table}.id = new.{link_column}")
+            for metric, column in metrics))
+        trigger(f"{link}_counters_delete", "DELETE", link, "".join(
+            _count(metric, f"{table}.{column}", -1, f"FROM {table} JOIN (SELECT old.user_id AS user_id) "
+                                                    f"WHERE {table}.id = old.{link_column}")
+            for metric, column in metrics))
+        # Changing a counted column moves every linked user's count from the old value to the new
+        changed = " OR ".join(f"old.{column} IS NOT new.{column}" for column in columns)
+        trigger(f"{table}_counters_update", f"UPDATE OF {', '.join(columns)}", table, "".join(
+            _count(metric, f"old.{column}", -1, f"FROM {link} WHERE {link_column} = old.id") +
+            _count(metric, f"new.{column}", 1, f"FROM {link} WHERE {link_column} = new.id")
+            for metric, column in metrics), when=f"WHEN {changed} ")
+        # Deleting the entity while links remain (the ORM removes links first)
+        trigger(f"{table}_counters_delete", "DELETE", table, "".join(
+            _count(metric, f"old.{column}", -1, f"FROM {link} WHERE {link_column} = old.id")
+            for metric, column in metrics))
+
+    dashboard.repair(conn)
+
+
+
+@migration(9, "revoked tokens")
+def revoked_tokens(conn):
+    create_tables(conn, "revoked_tokens")
+    # Login no longer stores the latest refresh token on the user row
+    conn.exec_driver_sql("UPDATE users SET refresh_token = NULL WHERE refresh_token IS NOT NULL")
+
+
+
+@migration(10, "note snippets and compression")
+def note_snippets(conn):
+    add_column(conn, "notes", f"snippet VARCHAR({NOTE_SNIPPET_LENGTH})")
+    # Content above the threshold is now a zlib BLOB; index its plaintext
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS notes_fts_insert")
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS notes_fts_update")
+    conn.exec_driver_sql(
+        "CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN "
+        "INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, inflate(new.content)); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN "
+        "UPDATE notes_fts SET title = new.title, content = inflate(new.content) WHERE rowid = old.id; END"
+    )
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text("SELECT id, content FROM notes WHERE id > :last_id ORDER BY id LIMIT 500"),
+                            {"last_id": last_id}).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        snippets = [{"id": row.id, "snippet": note_snippet(inflate(row.content))} for row in rows]
+        conn.execute(text("UPDATE notes SET snippet = :snippet WHERE id = :id"), snippets)
+        packed = [{"id": row.id, "content": compress(row.content)} for row in rows if isinstance(row.content, str)]
+        packed = [row for row in packed if isinstance(row["content"], bytes)]
+        if packed:
+            conn.execute(text("UPDATE notes SET content = :content WHERE id = :id"), packed)
+    # Rewriting content re-indexed those notes; merge the index segments that left behind
+    conn.exec_driver_sql("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+
+
+
+@migration(11, "folders")
+def folders(conn):
+    create_tables(conn, "folders", "folder_paths")
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS folders_paths_insert AFTER INSERT ON folders BEGIN "
+        "INSERT INTO folder_paths (ancestor_id, descendant_id, depth) "
+        "SELECT ancestor_id, new.id, depth + 1 FROM folder_paths WHERE descendant_id = new.parent_id "
+        "UNION ALL SELECT new.id, new.id, 0; END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS folders_no_cycles BEFORE UPDATE OF parent_id ON folders "
+        "WHEN EXISTS (SELECT 1 FROM folder_paths WHERE ancestor_id = new.id AND descendant_id = new.parent_id) "
+        "BEGIN SELECT RAISE(ABORT, 'A folder cannot move into its own subtree.'); END"
+    )
+    # Moving a subtree: unlink it from the old ancestors, then link every node to the new ones
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS folders_paths_move AFTER UPDATE OF parent_id ON folders "
+        "WHEN old.parent_id IS NOT new.parent_id BEGIN "
+        "DELETE FROM folder_paths "
+        "WHERE descendant_id IN (SELECT descendant_id FROM folder_paths WHERE ancestor_id = new.id) "
+        "AND ancestor_id IN (SELECT ancestor_id FROM folder_paths WHERE descendant_id = new.id AND depth > 0); "
+        "INSERT INTO folder_paths (ancestor_id, descendant_id, depth) "
+        "SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1 "
+        "FROM folder_paths AS above JOIN folder_paths AS below "
+        "WHERE above.descendant_id = new.parent_id AND below.ancestor_id = new.id; END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS folders_paths_delete AFTER DELETE ON folders BEGIN "
+        "DELETE FROM folder_paths WHERE descendant_id = old.id; "
+        "DELETE FROM folder_paths WHERE ancestor_id = old.id; END"
+    )
+
+    # notes.folder_id used to be a free-form number; give each one in use a folder.
+    # A number several users used stays with the user with the most notes in it
+    rows = conn.execute(text(
+        "SELECT folder_id, user_id FROM notes WHERE folder_id IS NOT NULL "
+        "GROUP BY folder_id, user_id ORDER BY folder_id, count(*) DESC, user_id"
+    )).fetchall()
+    kept, moved = {}, []
+    for row in rows:
+        if row.folder_id in kept:
+            moved.append(row)
+        else:
+            kept[row.folder_id] = row.user_id
+    if kept:
+        conn.execute(text("INSERT INTO folders (id, name, user_id) VALUES (:id, :name, :user_id)"),
+                     [{"id": folder_id, "name": f"Folder {folder_id}", "user_id": user_id}
+                      for folder_id, user_id in kept.items()])
+    for row in moved:
+        new_id = conn.execute(text("INSERT INTO folders (name, user_id) VALUES (:name, :user_id) RETURNING id"),
+                              {"name": f"Folder {row.folder_id}", "user_id": row.user_id}).scalar()
+        conn.execute(text("UPDATE notes SET folder_id = :new_id WHERE user_id = :user_id AND folder_id = :old_id"),
+                     {"new_id": new_id, "user_id": row.user_id, "old_id": row.folder_id})
+
+
+# ----------------------------------------------------------------------------------------
+
+def migrate(engine=None):
+    """Apply pending migrations; returns the versions applied"""
+    engine = engine or db.engine
+    applied = []
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        ))
+        done = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    for version, name, fn in MIGRATIONS:
+        if version in done:
+            continue
+        # One transaction per migration so a failure leaves earlier ones recorded
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow().isoformat()}
+            )
+        print(f"Applied migration {version}: {name}")
+        applied.append(version)
+
+    # Refreshes statistics for tables that changed a lot since the last ANALYZE
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+    return applied
+
+
+def schema_is_current(engine=None):
+    """Whether every registered migration has been applied"""
+    engine = engine or db.engine
+    try:
+        with engine.connect() as conn:
+            latest = conn.execute(text("SELECT max(version) FROM schema_migrations")).scalar()
+    except OperationalError:  # no schema_migrations table yet
+        return False
+    return latest == MIGRATIONS[-1][0]
+
+
+if __name__ == "__main__":
+    import models  # noqa: F401  (registers the tables on db.metadata)
+    from config import app
+
+    with app.app_context():
+        migrate()
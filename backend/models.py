@@ -1,27 +1,57 @@
 from enum import Enum
 from config import db
-from sqlalchemy import CheckConstraint
+from compression import CompressedText
+from sqlalchemy import CheckConstraint, select
 # Багато-до-багатьох
+# The composite PK serves lookups by user; the extra index serves lookups by entity
 user_task = db.Table('user_task',
                      db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-                     db.Column('task_id', db.Integer, db.ForeignKey('tasks.id'), primary_key=True)
+                     db.Column('task_id', db.Integer, db.ForeignKey('tasks.id'), primary_key=True),
+                     db.Index('ix_user_task_task_user', 'task_id', 'user_id')
                      )
 
 user_goal = db.Table('user_goal',
                      db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-                     db.Column('goal_id', db.Integer, db.ForeignKey('goals.id'), primary_key=True)
+                     db.Column('goal_id', db.Integer, db.ForeignKey('goals.id'), primary_key=True),
+                     db.Index('ix_user_goal_goal_user', 'goal_id', 'user_id')
                      )
 
 user_habit = db.Table('user_habit',
                       db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-                      db.Column('habit_id', db.Integer, db.ForeignKey('habits.id'), primary_key=True)
+                      db.Column('habit_id', db.Integer, db.ForeignKey('habits.id'), primary_key=True),
+                      db.Index('ix_user_habit_habit_user', 'habit_id', 'user_id')
                       )
 
 user_note = db.Table('user_note',
                      db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-                     db.Column('note_id', db.Integer, db.ForeignKey('notes.id'), primary_key=True)
+                     db.Column('note_id', db.Integer, db.ForeignKey('notes.id'), primary_key=True),
+                     db.Index('ix_user_note_note_user', 'note_id', 'user_id')
                      )
 
+# SQLite caps bound parameters per statement, so IN lists are chunked
+IN_CHUNK_SIZE = 500
+
+
+def user_ids_by(column, ids):
+    """Map each id to its linked user ids with one query per chunk of ids.
+
+    `column` is the entity side of an association table, e.g. `user_task.c.task_id`.
+    """
+    grouped = {item_id: [] for item_id in ids}
+    for statement in user_id_queries(column, list(grouped)):
+        for item_id, user_id in db.session.execute(statement):
+            grouped[item_id].append(user_id)
+    return grouped
+
+
+def user_id_queries(column, ids):
+    """The (item id, user id) SELECTs behind `user_ids_by`, one per chunk of ids"""
+    table = column.table
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        yield (select(column, table.c.user_id)
+               .where(column.in_(ids[start:start + IN_CHUNK_SIZE]))
+               .order_by(column, table.c.user_id))
+
 
 class TaskCategory(Enum):
     WORK = "Work"
@@ -47,6 +77,33 @@ class HabitDays(Enum):
     SA = "Saturday"
 
 
+# Habit schedules are stored as a 7-bit mask, Sunday = bit 0 ... Saturday = bit 6
+DAY_BITS = {day.value: 1 << i for i, day in enumerate(HabitDays)}
+
+
+def days_to_mask(day_names):
+    """Mask for an iterable of day names (or a comma-joined string); unknown names are ignored"""
+    if isinstance(day_names, str):
+        day_names = day_names.split(",")
+    mask = 0
+    for name in day_names:
+        mask |= DAY_BITS.get(name.strip(), 0)
+    return mask
+
+
+def mask_to_days(mask):
+    return [name for name, bit in DAY_BITS.items() if mask & bit]
+
+
+def masks_with_any(mask):
+    """Every 7-bit mask sharing a bit with `mask`.
+
+    SQLite cannot use an index for `days_mask & bit`, but it can for
+    `days_mask IN (...)`, and there are only 128 possible masks.
+    """
+    return [candidate for candidate in range(1 << len(DAY_BITS)) if candidate & mask]
+
+
 class HabitStatus(Enum):
     IN_PROGRESS = "In Progress"
     COMPLETED = "Completed"
@@ -76,23 +133,13 @@ class User(db.Model):
     password = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(20), nullable=True)
     location = db.Column(db.String(200), nullable=True)
-    refresh_token = db.Column(db.String(200), nullable=True)
+    refresh_token = db.Column(db.String(200), nullable=True)  # unused; revocations live in revoked_tokens
 
     tasks = db.relationship('Task', secondary=user_task, back_populates='users')
     goals = db.relationship('Goal', secondary=user_goal, back_populates='users')
     habits = db.relationship('Habit', secondary=user_habit, back_populates='users')
     notes = db.relationship('Note', back_populates='user')  
 
-    def to_json(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "email": self.email,
-            "phoneNumber": self.phone_number,
-            "location": self.location,
-            "tasks": [task.id for task in self.tasks]
-        }
-
 
 class Task(db.Model):
     __tablename__ = 'tasks'
@@ -107,40 +154,47 @@ class Task(db.Model):
     status = db.Column(db.String(20), CheckConstraint("status IN ('Pending', 'In Progress', 'Completed', 'Canceled')"), nullable=True)
     category = db.Column(db.String(20), nullable=True)
 
-    def to_json(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "dateAssigned": self.date_assigned.isoformat() if self.date_assigned else None,
-            "dateDue": self.date_due.isoformat() if self.date_due else None,
-            "users": [user.id for user in self.users],
-            "status": self.status,
-            "category": self.category
-        }
+    # Per-user access goes through user_task; these serve the filter routes
+    __table_args__ = (
+        db.Index('ix_tasks_status_date_due', 'status', 'date_due'),
+        db.Index('ix_tasks_category_date_due', 'category', 'date_due'),
+        db.Index('ix_tasks_date_due', 'date_due'),
+        db.Index('ix_tasks_date_assigned', 'date_assigned'),
+    )
+
+
+# Characters of note content kept in notes.snippet for list views
+NOTE_SNIPPET_LENGTH = 160
+
+
+def note_snippet(content):
+    """The start of `content` with runs of whitespace collapsed, at most NOTE_SNIPPET_LENGTH characters"""
+    if not content:
+        return None
+    return " ".join(content[:NOTE_SNIPPET_LENGTH * 4].split())[:NOTE_SNIPPET_LENGTH]
 
 
 class Note(db.Model):
     __tablename__ = 'notes'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=True)
+    # Only GET /notes/<id> needs the full text; lists read the snippet. Write both through set_content()
+    content = db.deferred(db.Column(CompressedText, nullable=True))
+    snippet = db.Column(db.String(NOTE_SNIPPET_LENGTH), nullable=True)
     folder_id = db.Column(db.Integer, nullable=True) 
     date_created = db.Column(db.DateTime, nullable=True)
     date_updated = db.Column(db.DateTime, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     user = db.relationship('User', back_populates='notes')
 
-    def to_json(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "content": self.content,
-            "folder_id": self.folder_id,  # Додайте це
-            "date_created": self.date_created.isoformat() if self.date_created else None,
-            "date_updated": self.date_updated.isoformat() if self.date_updated else None,
-            "user_id": self.user_id
-        }
+    __table_args__ = (
+        db.Index('ix_notes_user_folder', 'user_id', 'folder_id'),
+    )
+
+    def set_content(self, content):
+        self.content = content
+        self.snippet = note_snippet(content)
+
 
 class Habit(db.Model):
     __tablename__ = 'habits'
@@ -149,17 +203,19 @@ class Habit(db.Model):
     color = db.Column(db.String(8), nullable=False)
     status = db.Column(db.String(200), nullable=False, default='Planned')
     habit_days = db.Column(db.String(200), nullable=False)
+    # Same schedule as habit_days, as a queryable mask; write both through set_days()
+    days_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     users = db.relationship('User', secondary='user_habit', back_populates='habits')
 
-    def to_json(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "color": self.color,
-            "users": [user.id for user in self.users],
-            "status": self.status,
-            "habitDays": self.habit_days
-        }
+    __table_args__ = (
+        db.Index('ix_habits_status', 'status'),
+        db.Index('ix_habits_days_mask', 'days_mask'),
+    )
+
+    def set_days(self, day_names):
+        self.habit_days = ",".join(day_names)
+        self.days_mask = days_to_mask(day_names)
+
 
 class Goal(db.Model):
     __tablename__ = 'goals'
@@ -172,12 +228,107 @@ class Goal(db.Model):
     status = db.Column(db.Enum(GoalStatus), nullable=False, default=GoalStatus.PLANNED)
     period = db.Column(db.Enum(GoalPeriod), nullable=False, default=GoalPeriod.WEEKLY)
 
-    def to_json(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "description": self.description,
-            "users": [user.id for user in self.users],
-            "status": self.status.value,
-            "goalPeriod": self.period.value
-        }
+    __table_args__ = (
+        db.Index('ix_goals_status', 'status'),
+        db.Index('ix_goals_period', 'period'),
+    )
+
+
+class CollectionVersion(db.Model):
+    """Per-user change counter for a collection ("tasks", "notes", ...), used for ETags"""
+    __tablename__ = 'collection_versions'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    collection = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Change(db.Model):
+    """Latest change to an entity as seen by one user; written by triggers, read by /changes.
+
+    There is at most one row per (user, entity, id): a new change deletes
+    the old row and inserts one with the next sequence number.
+    """
+    __tablename__ = 'change_log'
+    seq = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(8), nullable=False)  # "task", "note", "goal" or "habit"
+    entity_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.Integer, nullable=False)  # unix seconds, for compaction
+
+    __table_args__ = (
+        db.Index('ix_change_log_user_seq', 'user_id', 'seq'),
+        db.Index('ix_change_log_entity_user', 'entity', 'entity_id', 'user_id', unique=True),
+        {'sqlite_autoincrement': True},  # sequence numbers are never reused
+    )
+
+
+class ChangeLogHorizon(db.Model):
+    """Single row: compaction removed every change with seq <= horizon"""
+    __tablename__ = 'change_log_horizon'
+    id = db.Column(db.Integer, primary_key=True)
+    horizon = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DashboardCounter(db.Model):
+    """Per-user count of tasks, goals or habits with one value of a column; written by triggers.
+
+    `metric` names the column ("task_status", "goal_period", ...) and `key`
+    its value, '' for NULL. See dashboard.py.
+    """
+    __tablename__ = 'dashboard_counters'
+    user_id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = ({'sqlite_with_rowid': False},)
+
+
+class RevokedToken(db.Model):
+    """A revoked refresh token, kept until it would have expired anyway; see token_store.py.
+
+    Rows are only appended (on logout) and pruned once expired, so each
+    process can pick up revocations from the others by id.
+    """
+    __tablename__ = 'revoked_tokens'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.Integer, nullable=False)  # unix seconds, the token's exp claim
+    revoked_at = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_revoked_tokens_expires_at', 'expires_at'),
+        {'sqlite_autoincrement': True},  # ids are never reused, so "id > last seen" finds every new row
+    )
+
+
+class Folder(db.Model):
+    """A user's note folder; `parent_id` is None at the top level"""
+    __tablename__ = 'folders'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('folders.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date_created = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_folders_user_parent', 'user_id', 'parent_id'),
+    )
+
+
+class FolderPath(db.Model):
+    """Closure table: one row per (ancestor, descendant) folder pair, self included at depth 0.
+
+    Written by triggers on `folders` (migration 11), so subtree and ancestor
+    lookups are single indexed range scans whatever the tree's depth.
+    """
+    __tablename__ = 'folder_paths'
+    ancestor_id = db.Column(db.Integer, primary_key=True)
+    descendant_id = db.Column(db.Integer, primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_folder_paths_descendant_ancestor', 'descendant_id', 'ancestor_id', 'depth'),
+        {'sqlite_with_rowid': False},
+    )
@@ -0,0 +1,161 @@
+"""Keyset pagination and streamed JSON for the collection endpoints.
+
+Without `limit`, `after` or `stream` a collection route keeps returning a
+plain JSON array, so existing clients are unaffected.
+
+    ?limit=50&sort=dateDue&order=asc      -> {"items": [...], "next_cursor": "..."}
+    ?limit=50&after=<next_cursor>         -> the following page
+    ?stream=1                             -> JSON array written incrementally
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app, jsonify, request, Response, stream_with_context
+from sqlalchemy import and_, or_, DateTime
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STREAM_CHUNK_SIZE = 500
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(sort, order, value, row_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, order, value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort, order, column):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, row_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise PaginationError("Invalid cursor.")
+    if cursor_sort != sort or cursor_order != order:
+        raise PaginationError("Cursor does not match the requested sort order.")
+    if not isinstance(row_id, int):
+        raise PaginationError("Invalid cursor.")
+    if value is not None and isinstance(column.type, DateTime):
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise PaginationError("Invalid cursor.")
+    return value, row_id
+
+
+def after_clause(column, id_column, value, row_id, descending):
+    """Rows strictly after (value, row_id); SQLite sorts NULLs first ascending, last descending"""
+    if not descending:
+        if value is None:
+            return or_(and_(column.is_(None), id_column > row_id), column.isnot(None))
+        return or_(column > value, and_(column == value, id_column > row_id))
+    if value is None:
+        return and_(column.is_(None), id_column < row_id)
+    return or_(column < value, and_(column == value, id_column < row_id), column.is_(None))
+
+
+def parse_page_args(sort_keys, default_sort="id", args=None):
+    args = request.args if args is None else args
+    sort = args.get("sort", default_sort)
+    if sort not in sort_keys:
+        raise PaginationError(f"Invalid sort. Valid sort keys are: {list(sort_keys)}")
+
+    order = args.get("order", "asc").lower()
+    if order not in ("asc", "desc"):
+        raise PaginationError("Invalid order. Must be 'asc' or 'desc'.")
+
+    limit = args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError("Invalid limit. Limit must be a number.")
+        if not 1 <= limit <= MAX_LIMIT:
+            raise PaginationError(f"Invalid limit. Must be between 1 and {MAX_LIMIT}.")
+    return sort, order, limit
+
+
+def ordered_page(query, model, sort_keys, default_sort="id", args=None):
+    """Apply sort and `after` cursor from the request; returns (query, sort, order, limit).
+
+    `query` may be a legacy Query or a select(); `args` defaults to request.args.
+    """
+    args = request.args if args is None else args
+    sort, order, limit = parse_page_args(sort_keys, default_sort, args)
+    column = sort_keys[sort]
+    descending = order == "desc"
+
+    after = args.get("after")
+    if after:
+        value, row_id = decode_cursor(after, sort, order, column)
+        query = query.filter(after_clause(column, model.id, value, row_id, descending))
+
+    if column is model.id:
+        ordering = [model.id.desc() if descending else model.id.asc()]
+    elif descending:
+        ordering = [column.desc(), model.id.desc()]
+    else:
+        ordering = [column.asc(), model.id.asc()]
+    return query.order_by(*ordering), sort, order, limit
+
+
+def stream_json_array(query, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield a JSON array chunk by chunk from a server-side cursor"""
+    dumps = current_app.json.dumps
+    rows = iter(query.yield_per(chunk_size))
+    yield "["
+    first = True
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        # One encoder call per chunk; strip the brackets to splice it into the array
+        yield ("" if first else ",") + dumps(serialize(chunk))[1:-1]
+        first = False
+    yield "]"
+
+
+def wants_page(args):
+    return any(arg in args for arg in ("limit", "after", "stream", "sort", "order"))
+
+
+def wants_stream(args):
+    return args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def page_of(rows, limit, sort, order, sort_keys):
+    """Trim the extra row fetched past `limit`; returns (rows, next_cursor)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(sort, order, getattr(last, sort_keys[sort].key), last.id)
+
+
+def list_response(query, model, serialize, sort_keys, default_sort="id"):
+    """Respond with a plain array, a keyset page, or a streamed array depending on the request"""
+    if not wants_page(request.args):
+        return jsonify(serialize(query.order_by(model.id).all())), 200
+
+    try:
+        query, sort, order, limit = ordered_page(query, model, sort_keys, default_sort)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_stream(request.args):
+        if limit is not None:
+            query = query.limit(limit)
+        return Response(stream_with_context(stream_json_array(query, serialize)),
+                        mimetype="application/json"), 200
+
+    limit = limit or DEFAULT_LIMIT
+    # Fetch one extra row to know whether another page exists
+    rows, next_cursor = page_of(query.limit(limit + 1).all(), limit, sort, order, sort_keys)
+    return jsonify({"items": serialize(rows), "next_cursor": next_cursor}), 200
@@ -0,0 +1,128 @@
+"""Password hashing in a bounded process pool.
+
+bcrypt is deliberately slow, so hashing on the request thread lets a
+burst of logins starve every other route. Work goes to a small process
+pool instead; once `queue_limit` hashes are queued or running, new ones
+are rejected straight away with HashingBusy so callers can answer 503.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import bcrypt
+
+import metrics
+
+bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+bcrypt_pool_size = int(os.getenv("BCRYPT_POOL_SIZE", str(os.cpu_count() or 2)))  # 0 = hash inline
+bcrypt_queue_limit = int(os.getenv("BCRYPT_QUEUE_LIMIT", str(max(1, bcrypt_pool_size) * 4)))
+bcrypt_timeout = float(os.getenv("BCRYPT_TIMEOUT", "10"))
+
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated; retry later"""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_cost(hashed):
+    """Cost factor of a `$2b$<cost>$...` hash, or None if unreadable"""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, pool_size=bcrypt_pool_size, queue_limit=bcrypt_queue_limit,
+                 rounds=bcrypt_rounds, timeout=bcrypt_timeout):
+        self.pool_size = pool_size
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Workers are forked from a fresh single-threaded server process, never from this
+                # one: by now the sync threads may be holding locks a plain fork would copy
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["bcrypt"])
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size, mp_context=context)
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        if self.pool_size <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the work finishes, even if this caller timed out waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy()
+
+    def start(self):
+        """Start the workers now rather than on the first hash"""
+        if self.pool_size > 0:
+            executor = self._get_executor()
+            for future in [executor.submit(int, 0) for _ in range(self.pool_size)]:
+                future.result()
+
+    def hash(self, password):
+        with metrics.timed(metrics.bcrypt_duration, "hash"):
+            return self._run(_hash, password.encode("utf-8"), self.rounds).decode("utf-8")
+
+    def check(self, password, hashed):
+        with metrics.timed(metrics.bcrypt_duration, "check"):
+            return self._run(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+hasher = PasswordHasher()
+
+
+def configure(**options):
+    """Replace the module-level hasher, e.g. to change the pool size"""
+    global hasher
+    old, hasher = hasher, PasswordHasher(**options)
+    old.shutdown()
+    return hasher
+
+
+def hash_password(password):
+    return hasher.hash(password)
+
+
+def check_password(password, hashed):
+    return hasher.check(password, hashed)
+
+
+def needs_rehash(hashed):
+    return hasher.needs_rehash(hashed)
@@ -0,0 +1,114 @@
+"""Full-text search over the caller's notes and tasks.
+
+`notes_fts` and `tasks_fts` are FTS5 tables (migration 6) kept in sync by
+triggers, keyed by the note / task id. A search runs one MATCH per kind,
+scoped to the user, and merges the hits by bm25 rank (lower is better).
+
+    /search?q=meeting notes&type=notes,tasks&limit=20&after=<next_cursor>
+"""
+import base64
+import binascii
+import html
+import json
+import re
+
+from sqlalchemy import text
+
+from config import db
+
+KINDS = ("note", "task")
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+SNIPPET_TOKENS = 16
+# Title matches count ten times as much as body matches
+TITLE_WEIGHT = 10.0
+
+# Highlight markers are control characters so the text can be escaped
+# afterwards and the markers turned into <mark> tags safely
+_OPEN, _CLOSE = "\x02", "\x03"
+
+_QUERIES = {
+    "note": (
+        "SELECT 'note' AS kind, notes.id AS id, bm25(notes_fts, :title_weight, 1.0) AS rank, "
+        "highlight(notes_fts, 0, :open, :close) AS title, "
+        "snippet(notes_fts, 1, :open, :close, '…', :tokens) AS snippet "
+        "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+        "WHERE notes_fts MATCH :match AND notes.user_id = :user_id"
+    ),
+    "task": (
+        "SELECT 'task' AS kind, tasks_fts.rowid AS id, bm25(tasks_fts, :title_weight, 1.0) AS rank, "
+        "highlight(tasks_fts, 0, :open, :close) AS title, "
+        "snippet(tasks_fts, 1, :open, :close, '…', :tokens) AS snippet "
+        "FROM tasks_fts JOIN user_task ON user_task.task_id = tasks_fts.rowid "
+        "WHERE tasks_fts MATCH :match AND user_task.user_id = :user_id"
+    ),
+}
+
+
+class SearchError(ValueError):
+    pass
+
+
+def match_expression(q):
+    """FTS5 query for free text: every word must match, the last one as a prefix.
+
+    Words are quoted so FTS5 operators and punctuation in user input are
+    taken literally.
+    """
+    words = [w for w in re.split(r"\s+", q.strip()) if w]
+    if not words:
+        raise SearchError("q must contain at least one word.")
+    quoted = ['"' + w.replace('"', '""') + '"' for w in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def encode_cursor(rank, kind, item_id):
+    raw = json.dumps([rank, kind, item_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, kind, item_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise SearchError("Invalid cursor.")
+    if not isinstance(rank, (int, float)) or kind not in KINDS or not isinstance(item_id, int):
+        raise SearchError("Invalid cursor.")
+    return rank, kind, item_id
+
+
+def _marked(value):
+    if value is None:
+        return None
+    return html.escape(value).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search(user_id, q, kinds=KINDS, limit=DEFAULT_LIMIT, after=None):
+    """One page of hits as (items, next_cursor)"""
+    hits = " UNION ALL ".join(_QUERIES[kind] for kind in KINDS if kind in kinds)
+    params = {
+        "match": match_expression(q), "user_id": user_id, "title_weight": TITLE_WEIGHT,
+        "open": _OPEN, "close": _CLOSE, "tokens": SNIPPET_TOKENS, "limit": limit + 1,
+    }
+    where = ""
+    if after:
+        params["after_rank"], params["after_kind"], params["after_id"] = decode_cursor(after)
+        where = "WHERE (rank, kind, id) > (:after_rank, :after_kind, :after_id) "
+
+    rows = db.session.execute(text(
+        f"SELECT kind, id, rank, title, snippet FROM ({hits}) {where}ORDER BY rank, kind, id LIMIT :limit"
+    ), params).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{
+        "type": row.kind,
+        "id": row.id,
+        "title": _marked(row.title),
+        "snippet": _marked(row.snippet),
+        "score": -row.rank,
+    } for row in rows]
+    next_cursor = encode_cursor(rows[-1].rank, rows[-1].kind, rows[-1].id) if has_more else None
+    return items, next_cursor
@@ -0,0 +1,174 @@
+"""Response serialization: per-model field specs and an orjson-backed JSON provider.
+
+Each model has a `Spec` listing its JSON keys and the attributes they come
+from, compiled once into an itemgetter. Rows become dicts with one C-level
+call per row, datetimes and enums are left as-is for the encoder, and
+linked user ids are loaded for the whole list in one query.
+
+`JSONProvider` replaces Flask's stdlib-json provider so that `jsonify`
+writes bytes straight from orjson. Without orjson installed it falls back
+to the stdlib encoder with the same output format.
+"""
+import json
+from datetime import date
+from enum import Enum
+from operator import attrgetter, itemgetter
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+
+from config import db
+from models import user_ids_by, user_task, user_goal, user_habit
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+
+def _default(value):
+    # orjson handles both natively; this keeps the stdlib fallback identical
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(obj):
+        return json.dumps(obj, default=_default, sort_keys=True, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class JSONProvider(DefaultJSONProvider):
+    """app.json: compact, key-sorted JSON; datetimes as ISO 8601, enums as their value"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+class Spec:
+    def __init__(self, fields, link_column=None):
+        attrs = [attr for _, attr in fields]
+        self.keys = tuple(key for key, _ in fields)  # JSON keys, in order
+        # Loaded column values sit in the instance __dict__; reading them there
+        # skips the instrumented attribute descriptors, which cost ~4x as much
+        self._loaded = itemgetter(*attrs)
+        self._values = attrgetter(*attrs)
+        self.link_column = link_column  # adds "users" from this association column
+
+    def values(self, row):
+        try:
+            return self._loaded(row.__dict__)
+        except KeyError:  # expired or deferred attribute: let the ORM load it
+            return self._values(row)
+
+    def items(self, rows):
+        """Dicts for `rows`, without the linked "users" """
+        keys, values = self.keys, self.values
+        return [dict(zip(keys, values(row))) for row in rows]
+
+    def many(self, rows):
+        items = self.items(rows)
+        if self.link_column is not None:
+            user_ids = user_ids_by(self.link_column, [item["id"] for item in items])
+            for item in items:
+                item["users"] = user_ids[item["id"]]
+        return items
+
+    def one(self, row):
+        return self.many([row])[0]
+
+
+TASK = Spec([
+    ("id", "id"),
+    ("title", "title"),
+    ("description", "description"),
+    ("dateAssigned", "date_assigned"),
+    ("dateDue", "date_due"),
+    ("status", "status"),
+    ("category", "category"),
+], link_column=user_task.c.task_id)
+
+NOTE = Spec([
+    ("id", "id"),
+    ("title", "title"),
+    ("content", "content"),
+    ("folder_id", "folder_id"),
+    ("date_created", "date_created"),
+    ("date_updated", "date_updated"),
+    ("user_id", "user_id"),
+])
+
+# GET /notes?view=summary and the change feed: the snippet column instead of content, which stays deferred
+NOTE_SUMMARY = Spec([
+    ("id", "id"),
+    ("title", "title"),
+    ("snippet", "snippet"),
+    ("folder_id", "folder_id"),
+    ("date_created", "date_created"),
+    ("date_updated", "date_updated"),
+    ("user_id", "user_id"),
+])
+
+GOAL = Spec([
+    ("id", "id"),
+    ("title", "title"),
+    ("description", "description"),
+    ("status", "status"),
+    ("goalPeriod", "period"),
+], link_column=user_goal.c.goal_id)
+
+HABIT = Spec([
+    ("id", "id"),
+    ("title", "title"),
+    ("color", "color"),
+    ("status", "status"),
+    ("habitDays", "habit_days"),
+], link_column=user_habit.c.habit_id)
+
+FOLDER = Spec([
+    ("id", "id"),
+    ("name", "name"),
+    ("parentId", "parent_id"),
+    ("dateCreated", "date_created"),
+])
+
+USER = Spec([
+    ("id", "id"),
+    ("name", "name"),
+    ("email", "email"),
+    ("phoneNumber", "phone_number"),
+    ("location", "location"),
+])
+
+task, tasks = TASK.one, TASK.many
+note, notes = NOTE.one, NOTE.many
+note_summaries = NOTE_SUMMARY.many
+goal, goals = GOAL.one, GOAL.many
+habit, habits = HABIT.one, HABIT.many
+folder, folders = FOLDER.one, FOLDER.many
+
+
+def user(row):
+    data = USER.one(row)
+    # Only the ids are needed, so skip loading full Task rows
+    data["tasks"] = db.session.scalars(select(user_task.c.task_id).where(user_task.c.user_id == row.id)).all()
+    return data
@@ -0,0 +1,173 @@
+"""Slow-query log with EXPLAIN QUERY PLAN capture.
+
+Statements slower than SLOW_QUERY_MS are recorded with their SQL, the
+shape of their bound parameters (types and lengths, never the values),
+duration, the route that issued them and the query plan. The plan is
+captured once per distinct statement text and flags steps that scan a
+table without an index.
+
+Entries go to an in-memory ring buffer served by /debug/slow-queries (to
+ADMIN_EMAILS users only) and, one JSON object per line, to a rotating
+log file. The timing comes from
+`metrics.TimedCursor`, so a fast statement costs one comparison here.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+
+import metrics
+
+slow_query_ms = float(os.getenv("SLOW_QUERY_MS", "100"))  # 0 logs every statement, negative disables
+slow_query_buffer_size = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+slow_query_log = os.getenv("SLOW_QUERY_LOG")  # default: slow_queries.log next to the local database; "" = no file
+slow_query_log_max_bytes = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+slow_query_log_backups = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "3"))
+
+# Statements EXPLAIN can describe; PRAGMA, BEGIN and friends are skipped
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+MAX_PLANS = 1024  # distinct statements whose plans are kept
+
+slow_statements = metrics.Counter("db_slow_statements_total", "Statements over SLOW_QUERY_MS", ("full_scan",))
+
+
+def full_scans(plan):
+    """Plan details like 'SCAN tasks' (no index at all); covering-index and FTS5 MATCH scans are fine"""
+    return [detail for detail in plan if detail.startswith("SCAN")
+            and " USING " not in detail and " VIRTUAL TABLE INDEX " not in detail]
+
+
+def _shape(value):
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shape(parameters, many=False):
+    """Types (and lengths for text and blobs) of bound parameters, without their values"""
+    if many:
+        rows = parameters if isinstance(parameters, (list, tuple)) else []
+        return {"rows": len(rows), "first": parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: _shape(value) for name, value in parameters.items()}
+    return [_shape(value) for value in parameters]
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=slow_query_ms, buffer_size=slow_query_buffer_size, log_path=None,
+                 max_bytes=slow_query_log_max_bytes, backups=slow_query_log_backups):
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._entries = deque(maxlen=buffer_size)
+        self._plans = {}  # statement text -> (plan details, full-scan details)
+        self._lock = threading.Lock()
+        self._logger = None
+        self.recorded = 0
+
+    def install(self):
+        """Route statements over the threshold from `metrics.TimedCursor` to this log"""
+        if self.threshold_ms < 0:
+            return
+        metrics.watch_slow_statements(self.threshold_ms / 1000, self.record)
+
+    def plan(self, cursor, sql, parameters):
+        """EXPLAIN QUERY PLAN for `sql`, run once per distinct statement on the cursor's connection"""
+        with self._lock:
+            cached = self._plans.get(sql)
+        if cached is not None:
+            return cached
+        if not sql.lstrip()[:7].upper().startswith(EXPLAINABLE):
+            return None
+        try:
+            # A plain cursor, so the EXPLAIN itself is not timed and reported
+            rows = sqlite3.Cursor(cursor.connection).execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+            details = [row[-1] for row in rows]
+            cached = (details, full_scans(details))
+        except sqlite3.Error as e:
+            return ([f"EXPLAIN failed: {e}"], [])
+        with self._lock:
+            if len(self._plans) >= MAX_PLANS:
+                del self._plans[next(iter(self._plans))]
+            self._plans[sql] = cached
+        return cached
+
+    def record(self, cursor, sql, parameters, elapsed, many=False):
+        """Called by `metrics.TimedCursor` for each statement over the threshold"""
+        try:
+            explain_parameters = parameters
+            if many:
+                explain_parameters = parameters[0] if isinstance(parameters, (list, tuple)) and parameters else ()
+            planned = self.plan(cursor, sql, explain_parameters)
+            plan, scans = planned if planned is not None else (None, [])
+            entry = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round(elapsed * 1000, 3),
+                "method": request.method if has_request_context() else None,
+                "route": self._route() if has_request_context() else None,
+                "sql": sql,
+                "params": parameter_shape(parameters, many),
+                "plan": plan,
+                "full_scan": bool(scans),
+                "scans": scans,
+            }
+            with self._lock:
+                self._entries.append(entry)
+                self.recorded += 1
+            slow_statements.inc(str(bool(scans)).lower())
+            logger = self._get_logger()
+            if logger is not None:
+                logger.warning(json.dumps(entry, default=str))
+        except Exception as e:
+            # Never let diagnostics break the statement that triggered them
+            print(f"Slow-query log error: {e}")
+
+    @staticmethod
+    def _route():
+        rule = request.url_rule
+        return rule.rule if rule is not None else "unmatched"
+
+    def _get_logger(self):
+        # The file is opened on the first slow statement, so idle processes create none
+        if not self.log_path:
+            return None
+        with self._lock:
+            if self._logger is None:
+                logger = logging.getLogger("slow_queries")
+                logger.propagate = False
+                handler = RotatingFileHandler(self.log_path, maxBytes=self.max_bytes,
+                                              backupCount=self.backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                self._logger = logger
+            return self._logger
+
+    def entries(self, limit=None):
+        """Buffered entries, newest first"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit is not None else entries
+
+    def status(self, limit=None):
+        with self._lock:
+            plans = len(self._plans)
+        return {
+            "threshold_ms": self.threshold_ms,
+            "recorded": self.recorded,
+            "plans_cached": plans,
+            "log_path": self.log_path,
+            "entries": self.entries(limit),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
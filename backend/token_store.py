@@ -0,0 +1,150 @@
+"""Refresh-token revocation, checked on every @jwt_required(refresh=True) route.
+
+Logout appends the token's `jti` to `revoked_tokens`; nothing is written on
+login. Each process keeps a Bloom filter over every unexpired revocation,
+so the common check, a token that was never revoked, is a few bit lookups
+with no query. A hit is confirmed against the table once and then
+remembered in an in-memory denylist, so false positives cost one indexed
+lookup and memory stays at the filter's fixed size however many tokens
+are revoked.
+
+A background thread adds rows other processes appended (ids only grow)
+every TOKEN_REFRESH_INTERVAL seconds, and every TOKEN_PRUNE_INTERVAL
+seconds deletes revocations whose token has expired anyway and rebuilds
+the filter, which cannot forget keys.
+
+Access tokens are short-lived and are not checked.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from config import app, db, jwt
+from models import RevokedToken
+
+token_refresh_interval = float(os.getenv("TOKEN_REFRESH_INTERVAL", "5"))  # seconds
+token_prune_interval = float(os.getenv("TOKEN_PRUNE_INTERVAL", "3600"))  # seconds
+# 128 KiB; under 1% false positives up to about 100k live revocations
+token_bloom_bits = int(os.getenv("TOKEN_BLOOM_BITS", str(1 << 20)))
+token_bloom_hashes = int(os.getenv("TOKEN_BLOOM_HASHES", "7"))
+
+
+class BloomFilter:
+    """Set membership with false positives but no false negatives; cannot remove keys.
+
+    Positions come from the builtin str hash, which is only stable within a
+    process; the filter is never persisted or shared.
+    """
+
+    def __init__(self, bits=token_bloom_bits, hashes=token_bloom_hashes):
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, key):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        array = self._array
+        for position in self._positions(key):
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class TokenStore:
+    def __init__(self, refresh_interval=token_refresh_interval, prune_interval=token_prune_interval):
+        self.refresh_interval = refresh_interval
+        self.prune_interval = prune_interval
+        self._bloom = BloomFilter()
+        self._denied = {}  # confirmed revoked jti -> expires_at
+        self._last_id = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def is_revoked(self, jti):
+        if not self._loaded:
+            self.refresh()
+        if jti not in self._bloom:
+            return False
+        if jti in self._denied:
+            return True
+        with db.engine.connect() as conn:
+            expires_at = conn.scalar(select(RevokedToken.expires_at).where(RevokedToken.jti == jti))
+        if expires_at is None:
+            return False  # false positive
+        self._denied[jti] = expires_at
+        return True
+
+    def revoke(self, jti, user_id, expires_at):
+        """Record the revocation and commit; revoking twice is a no-op"""
+        db.session.execute(insert(RevokedToken).values(
+            jti=jti, user_id=user_id, expires_at=int(expires_at), revoked_at=int(time.time())
+        ).on_conflict_do_nothing(index_elements=["jti"]))
+        db.session.commit()
+        with self._lock:
+            self._bloom.add(jti)
+            self._denied[jti] = int(expires_at)
+
+    def refresh(self):
+        """Add revocations appended since the last call, by this or any other process"""
+        # Own connection: this runs inside the JWT check, before the route touches its session
+        with self._lock, db.engine.connect() as conn:
+            for row_id, jti in conn.execute(select(RevokedToken.id, RevokedToken.jti)
+                                            .where(RevokedToken.id > self._last_id)):
+                self._bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._loaded = True
+            self._ensure_started()
+
+    def prune(self):
+        """Delete revocations of tokens that have expired anyway and rebuild the filter; returns the count"""
+        now = int(time.time())
+        result = db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        db.session.commit()
+        with self._lock, db.engine.connect() as conn:
+            bloom = BloomFilter(self._bloom.bits, self._bloom.hashes)
+            for row_id, jti in conn.execute(select(RevokedToken.id, RevokedToken.jti)):
+                bloom.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._bloom = bloom
+            self._denied = {jti: expires_at for jti, expires_at in self._denied.items() if expires_at >= now}
+        return result.rowcount
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="token-store", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        next_prune = time.monotonic()
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                with app.app_context():
+                    self.refresh()
+                    if time.monotonic() >= next_prune:
+                        pruned = self.prune()
+                        if pruned:
+                            print(f"Pruned {pruned} expired token revocations")
+                        next_prune = time.monotonic() + self.prune_interval
+            except Exception as e:
+                print(f"Token store refresh failed: {e}")
+
+
+store = TokenStore()
+
+
+@jwt.token_in_blocklist_loader
+def token_revoked(jwt_header, jwt_payload):
+    return jwt_payload.get("type") == "refresh" and store.is_revoked(jwt_payload["jti"])
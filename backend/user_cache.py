@@ -0,0 +1,112 @@
+"""Cache for the JWT identity -> User lookup that almost every route does.
+
+Two layers: a per-request memo on `flask.g`, so one request never loads
+the same user twice, and a process-wide LRU with a TTL holding the row's
+column values. Cached rows are attached to the current session with
+merge(load=False), so no SELECT is issued and relationships still lazy-load.
+
+Routes that change a user row must call `invalidate(user_id)`.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+from sqlalchemy.orm import make_transient_to_detached
+
+from config import db
+from models import User
+
+user_cache_size = int(os.getenv("USER_CACHE_SIZE", "1024"))
+user_cache_ttl = float(os.getenv("USER_CACHE_TTL", "60"))  # seconds
+
+
+class UserCache:
+    def __init__(self, max_size=user_cache_size, ttl=user_cache_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user id -> (expires_at, column values)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id, values):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+user_cache = UserCache()
+
+_columns = [column.key for column in User.__table__.columns]
+
+
+def row_values(user):
+    """Column values of a loaded User, as stored in the cache"""
+    return {key: getattr(user, key) for key in _columns}
+
+
+def get_user(user_id):
+    """User for `user_id` (int or numeric string), or None if it does not exist"""
+    user_id = int(user_id)
+    memo = g.setdefault("_users", {})
+    if user_id in memo:
+        return memo[user_id]
+
+    values = user_cache.get(user_id)
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        user = db.session.merge(user, load=False)
+    else:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user_cache.put(user_id, row_values(user))
+
+    memo[user_id] = user
+    return user
+
+
+def invalidate(user_id):
+    """Drop a user from both cache layers after its row changed"""
+    user_id = int(user_id)
+    user_cache.invalidate(user_id)
+    g.pop("_users", None)
@@ -0,0 +1,73 @@
+"""Per-user collection versions backing ETag / If-None-Match on the list routes.
+
+Write routes call `bump()` inside their transaction for every user whose
+view of the collection changed. List routes call `conditional()`, which
+reads one row from `collection_versions` and answers 304 without touching
+the entity tables when the client's ETag is still current.
+"""
+import zlib
+
+from flask import request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from config import db
+from models import CollectionVersion, user_ids_by
+
+TASKS = "tasks"
+NOTES = "notes"
+GOALS = "goals"
+HABITS = "habits"
+
+
+def bump(collection, user_ids):
+    """Increment the collection version for each user; flushed with the caller's commit"""
+    user_ids = sorted({int(user_id) for user_id in user_ids})
+    if not user_ids:
+        return
+    statement = insert(CollectionVersion).values(version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CollectionVersion.user_id, CollectionVersion.collection],
+        set_={"version": CollectionVersion.version + 1}
+    )
+    db.session.execute(statement, [{"user_id": user_id, "collection": collection} for user_id in user_ids])
+
+
+def bump_linked(collection, link_column, item_ids):
+    """Bump every user linked to the given items through an association table"""
+    grouped = user_ids_by(link_column, item_ids)
+    bump(collection, {user_id for user_ids in grouped.values() for user_id in user_ids})
+
+
+def version_query(user_id, collection):
+    return select(CollectionVersion.version).where(
+        CollectionVersion.user_id == user_id, CollectionVersion.collection == collection
+    )
+
+
+def current_version(user_id, collection):
+    return db.session.scalar(version_query(user_id, collection)) or 0
+
+
+def format_etag(collection, user_id, version, query_string):
+    # The query string is part of the tag since pages and filters differ in content
+    return f"{collection}-{user_id}-v{version}-{zlib.crc32(query_string):08x}"
+
+
+def etag_for(user_id, collection, variant=""):
+    # `variant` tags what the route resolved beyond the query string, e.g. the weekday `today` meant
+    query_string = request.query_string + (f"#{variant}".encode() if variant else b"")
+    return format_etag(collection, user_id, current_version(user_id, collection), query_string)
+
+
+def conditional(user_id, collection, build, variant=""):
+    """Answer 304 if If-None-Match holds the current ETag, else tag the response from `build()`"""
+    etag = etag_for(user_id, collection, variant)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    response, status = build()
+    response.set_etag(etag)
+    return response, status
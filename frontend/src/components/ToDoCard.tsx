@@ -3,8 +3,19 @@ import { useApiClient } from '@/api/useApiClient';
 import TaskItem from './TaskItem';
 import type { Task } from '@/lib/types';
 
+// The tasks part of GET /dashboard/summary
+interface TaskCounts {
+  total: number;
+  byStatus: Record<string, number>;
+  byCategory: Record<string, number>;
+}
+
+// "Pending" in this card means anything not completed
+const NOT_COMPLETED = 'Pending,In Progress,Canceled';
+
 function ToDoCard() {
   const [tasks, setTasks] = useState<Task[]>([]);
+  const [counts, setCounts] = useState<TaskCounts | null>(null);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState<'all' | 'pending' | 'completed'>('all');
   const [categoryFilter, setCategoryFilter] = useState<string>('all');
@@ -16,17 +27,32 @@ function ToDoCard() {
   });
   const apiClient = useApiClient();
 
+  const searchParams = () => {
+    const params = new URLSearchParams();
+    if (filter === 'pending') params.set('status', NOT_COMPLETED);
+    if (filter === 'completed') params.set('status', 'Completed');
+    if (categoryFilter !== 'all') params.set('category', categoryFilter);
+    return params.toString();
+  };
+
+  // The server filters (/tasks/search); totals and the category list come from /dashboard/summary
   const fetchTasks = async () => {
     try {
-      setLoading(true);
-      const response = await apiClient.get('http://127.0.0.1:5000/tasks');
-      
+      const [response, summaryResponse] = await Promise.all([
+        apiClient.get(`http://127.0.0.1:5000/tasks/search?${searchParams()}`),
+        apiClient.get('http://127.0.0.1:5000/dashboard/summary'),
+      ]);
+
       if (response.ok) {
         const tasksData = await response.json();
         setTasks(tasksData);
       } else {
         console.error('Failed to fetch tasks');
       }
+      if (summaryResponse.ok) {
+        const summary = await summaryResponse.json();
+        setCounts(summary.tasks);
+      }
     } catch (error) {
       console.error('Error fetching tasks:', error);
     } finally {
@@ -39,9 +65,8 @@ function ToDoCard() {
       const response = await apiClient.put(`http://127.0.0.1:5000/tasks/${taskId}`, { status: newStatus });
       
       if (response.ok) {
-        setTasks(prev => prev.map(task => 
-          task.id === taskId ? { ...task, status: newStatus as Task['status'] } : task
-        ));
+        // The task may no longer match the filter
+        fetchTasks();
       }
     } catch (error) {
       console.error('Error updating task:', error);
@@ -55,7 +80,7 @@ function ToDoCard() {
       const response = await apiClient.delete(`http://127.0.0.1:5000/tasks/${taskId}`);
       
       if (response.ok) {
-        setTasks(prev => prev.filter(task => task.id !== taskId));
+        fetchTasks();
       }
     } catch (error) {
       console.error('Error deleting task:', error);
@@ -84,11 +109,7 @@ function ToDoCard() {
       const response = await apiClient.put(`http://127.0.0.1:5000/tasks/${editingTask.id}`, updateData);
       
       if (response.ok) {
-        setTasks(prev => prev.map(task => 
-          task.id === editingTask.id 
-            ? { ...task, ...updateData }
-            : task
-        ));
+        fetchTasks();
         setEditingTask(null);
         setEditForm({ title: '', description: '', category: '' });
       } else {
@@ -106,19 +127,11 @@ function ToDoCard() {
 
   useEffect(() => {
     fetchTasks();
-  }, []);
-
-  const filteredTasks = tasks.filter(task => {
-    const statusMatch = filter === 'all' || 
-      (filter === 'pending' && task.status !== 'Completed') ||
-      (filter === 'completed' && task.status === 'Completed');
-    
-    const categoryMatch = categoryFilter === 'all' || task.category === categoryFilter;
-    
-    return statusMatch && categoryMatch;
-  });
+  }, [filter, categoryFilter]);
 
-  const categories = ['all', ...Array.from(new Set(tasks.map(task => task.category).filter(Boolean)))];
+  const categories = ['all', ...Object.keys(counts?.byCategory ?? {})
+    .filter(category => category !== 'unset' && (counts?.byCategory[category] ?? 0) > 0)];
+  const completedCount = counts?.byStatus['Completed'] ?? 0;
 
   if (loading) {
     return (
@@ -140,7 +153,7 @@ function ToDoCard() {
       <div className="flex justify-between items-center mb-6">
         <h2 className="text-xl font-semibold">My Tasks</h2>
         <div className="text-sm text-gray-500">
-          {filteredTasks.length} task{filteredTasks.length !== 1 ? 's' : ''}
+          {tasks.length} task{tasks.length !== 1 ? 's' : ''}
         </div>
       </div>
 
@@ -236,13 +249,13 @@ function ToDoCard() {
 
       {/* Tasks */}
       <div className="space-y-3">
-        {filteredTasks.length === 0 ? (
+        {tasks.length === 0 ? (
           <div className="text-center py-8 text-gray-500">
             <p>No tasks found</p>
             <p className="text-sm">Create your first task to get started!</p>
           </div>
         ) : (
-          filteredTasks.map(task => (
+          tasks.map(task => (
             <TaskItem
               key={task.id}
               task={task}
@@ -255,11 +268,11 @@ function ToDoCard() {
       </div>
 
       {/* Stats */}
-      {tasks.length > 0 && (
+      {counts && counts.total > 0 && (
         <div className="mt-6 pt-4 border-t border-gray-100">
           <div className="flex justify-between text-sm text-gray-600">
-            <span>Completed: {tasks.filter(t => t.status === 'Completed').length}</span>
-            <span>Pending: {tasks.filter(t => t.status !== 'Completed').length}</span>
+            <span>Completed: {completedCount}</span>
+            <span>Pending: {counts.total - completedCount}</span>
           </div>
         </div>
       )}